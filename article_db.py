@@ -0,0 +1,402 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+文章数据库
+把采集的文章写入SQLite，按来源和发布时间建索引，并用FTS5对标题、摘要和正文建立全文索引
+"""
+
+import os
+import sys
+import json
+import time
+import sqlite3
+import logging
+import argparse
+import datetime
+import threading
+from email.utils import parsedate_to_datetime
+
+from url_index import url_key
+
+logger = logging.getLogger(__name__)
+
+
+def _published_ts(published):
+    """把RSS或ISO格式的发布时间转换为时间戳，无法解析时为None"""
+    if not published:
+        return None
+    try:
+        value = parsedate_to_datetime(published)
+    except (TypeError, ValueError):
+        try:
+            value = datetime.datetime.fromisoformat(published.replace('Z', '+00:00'))
+        except ValueError:
+            return None
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=datetime.timezone.utc)
+    return value.timestamp()
+
+
+def _bigrams(*values):
+    """把文本拆成二元组索引使用的词
+
+    连续的非空白字符中每两个相邻字符组成一个二元组，每段最后一个字符单独成为一个词，
+    去重后编码为UTF-8的十六进制，避免分词器再拆分标点和中文。
+    """
+    tokens = {}
+    for value in values:
+        for run in (value or '').lower().split():
+            for i in range(len(run) - 1):
+                tokens[run[i:i + 2]] = None
+            tokens[run[-1]] = None
+    return ' '.join(token.encode('utf-8').hex() for token in tokens)
+
+
+# FTS5查询中有特殊含义的字符和关键字
+_FTS_SYNTAX_CHARS = '"*:()^{}'
+_FTS_KEYWORDS = {'AND', 'OR', 'NOT', 'NEAR'}
+
+
+def _is_bare_term(term):
+    """判断查询中的词是否只是普通的词，不是FTS5的运算符、列过滤或前缀等语法"""
+    return (
+        term not in _FTS_KEYWORDS and term[0] not in '+-'
+        and not any(c in term for c in _FTS_SYNTAX_CHARS)
+    )
+
+
+def _bigram_query(terms):
+    """把少于3个字符的词转换为二元组索引的查询，单个字符用前缀匹配以该字符开头的二元组"""
+    return ' '.join(
+        term.lower().encode('utf-8').hex() + ('*' if len(term) == 1 else '') for term in terms
+    )
+
+
+def _date_ts(value):
+    """把命令行中的 YYYY-MM-DD 日期转换为时间戳"""
+    return datetime.datetime.strptime(value, '%Y-%m-%d').replace(tzinfo=datetime.timezone.utc).timestamp()
+
+
+class ArticleDatabase:
+    """基于SQLite的文章库和全文索引
+
+    articles 表以规范化URL的哈希去重，按来源和发布时间建索引；
+    articles_fts 是以 articles 为外部内容表的FTS5索引，由触发器同步。
+    trigram分词器无法匹配少于3个字符的词（例如两个字的中文词），这些词通过
+    articles_bigram 中的二元组索引查找；二元组由注册到连接上的 bigrams() 函数在触发器中生成，
+    因此只能通过本类写入 articles 表。
+    写入先缓存在内存中，满 ARTICLE_DB_BATCH 篇或调用 flush() 时在一个事务中批量写入。
+    """
+
+    def __init__(self, path=None, batch_size=None, tokenizer=None):
+        """初始化文章库
+
+        Args:
+            path: 数据库文件路径，默认使用ARTICLE_DB_PATH
+            batch_size: 每个事务批量写入的文章数
+            tokenizer: FTS5分词器，默认为trigram，可以对中文做子串搜索
+        """
+        self.path = path or os.getenv('ARTICLE_DB_PATH') or 'articles.db'
+        self.batch_size = batch_size or int(os.getenv('ARTICLE_DB_BATCH', '200'))
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._pending = []
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._conn.execute('PRAGMA temp_store=MEMORY')
+        self._conn.execute('PRAGMA mmap_size=268435456')
+        self._conn.create_function('bigrams', 3, _bigrams, deterministic=True)
+        self._create_schema(tokenizer or os.getenv('ARTICLE_DB_TOKENIZER', 'trigram'))
+
+    def _create_schema(self, tokenizer):
+        with self._conn:
+            self._conn.execute('''
+                CREATE TABLE IF NOT EXISTS articles (
+                    id INTEGER PRIMARY KEY,
+                    url_hash BLOB NOT NULL UNIQUE,
+                    url TEXT NOT NULL,
+                    source_name TEXT,
+                    source TEXT,
+                    title TEXT,
+                    published TEXT,
+                    published_ts REAL,
+                    summary TEXT,
+                    text TEXT,
+                    authors TEXT,
+                    top_image TEXT,
+                    error TEXT,
+                    scraped_at REAL NOT NULL
+                )
+            ''')
+            self._conn.execute('CREATE INDEX IF NOT EXISTS idx_articles_source_name ON articles(source_name, published_ts)')
+            self._conn.execute('CREATE INDEX IF NOT EXISTS idx_articles_source ON articles(source, published_ts)')
+            self._conn.execute('CREATE INDEX IF NOT EXISTS idx_articles_published_ts ON articles(published_ts)')
+
+            exists = self._conn.execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'articles_fts'"
+            ).fetchone()
+            if not exists:
+                try:
+                    self._conn.execute(f'''
+                        CREATE VIRTUAL TABLE articles_fts USING fts5(
+                            title, summary, text, content='articles', content_rowid='id', tokenize='{tokenizer}'
+                        )
+                    ''')
+                except sqlite3.OperationalError as e:
+                    # 较旧的SQLite没有trigram分词器
+                    logger.warning(f'FTS5分词器 {tokenizer} 不可用: {str(e)}，使用unicode61')
+                    self._conn.execute('''
+                        CREATE VIRTUAL TABLE articles_fts USING fts5(
+                            title, summary, text, content='articles', content_rowid='id', tokenize='unicode61'
+                        )
+                    ''')
+
+            self._conn.executescript('''
+                CREATE TRIGGER IF NOT EXISTS articles_ai AFTER INSERT ON articles BEGIN
+                    INSERT INTO articles_fts(rowid, title, summary, text) VALUES (new.id, new.title, new.summary, new.text);
+                END;
+                CREATE TRIGGER IF NOT EXISTS articles_ad AFTER DELETE ON articles BEGIN
+                    INSERT INTO articles_fts(articles_fts, rowid, title, summary, text)
+                    VALUES ('delete', old.id, old.title, old.summary, old.text);
+                END;
+                CREATE TRIGGER IF NOT EXISTS articles_au AFTER UPDATE ON articles BEGIN
+                    INSERT INTO articles_fts(articles_fts, rowid, title, summary, text)
+                    VALUES ('delete', old.id, old.title, old.summary, old.text);
+                    INSERT INTO articles_fts(rowid, title, summary, text) VALUES (new.id, new.title, new.summary, new.text);
+                END;
+            ''')
+
+            # 二元组索引只用于判断文章是否包含短词，不保存内容、位置和列长度
+            exists = self._conn.execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'articles_bigram'"
+            ).fetchone()
+            if not exists:
+                self._conn.execute('''
+                    CREATE VIRTUAL TABLE articles_bigram USING fts5(
+                        tokens, content='', detail='none', columnsize=0, tokenize='ascii'
+                    )
+                ''')
+                count = self._conn.execute('''
+                    INSERT INTO articles_bigram(rowid, tokens) SELECT id, bigrams(title, summary, text) FROM articles
+                ''').rowcount
+                if count > 0:
+                    logger.info(f'已为 {count} 篇文章建立二元组索引')
+
+            self._conn.executescript('''
+                CREATE TRIGGER IF NOT EXISTS articles_bigram_ai AFTER INSERT ON articles BEGIN
+                    INSERT INTO articles_bigram(rowid, tokens) VALUES (new.id, bigrams(new.title, new.summary, new.text));
+                END;
+                CREATE TRIGGER IF NOT EXISTS articles_bigram_ad AFTER DELETE ON articles BEGIN
+                    INSERT INTO articles_bigram(articles_bigram, rowid, tokens)
+                    VALUES ('delete', old.id, bigrams(old.title, old.summary, old.text));
+                END;
+                CREATE TRIGGER IF NOT EXISTS articles_bigram_au AFTER UPDATE ON articles BEGIN
+                    INSERT INTO articles_bigram(articles_bigram, rowid, tokens)
+                    VALUES ('delete', old.id, bigrams(old.title, old.summary, old.text));
+                    INSERT INTO articles_bigram(rowid, tokens) VALUES (new.id, bigrams(new.title, new.summary, new.text));
+                END;
+            ''')
+
+    def add(self, article, source_name=None):
+        """缓存一篇文章，积累到批量大小时写入数据库
+
+        Args:
+            article: 文章字典
+            source_name: 采集来源名称（data下的目录名）
+        """
+        url = article.get('link')
+        if not url:
+            return
+
+        row = (
+            url_key(url), url, source_name, article.get('source'), article.get('title'),
+            article.get('published'), _published_ts(article.get('published')),
+            article.get('summary'), article.get('text'),
+            json.dumps(article.get('authors') or [], ensure_ascii=False),
+            article.get('top_image'), article.get('error'), time.time()
+        )
+        with self._lock:
+            self._pending.append(row)
+            if len(self._pending) >= self.batch_size:
+                self._flush_locked()
+
+    def add_many(self, articles, source_name=None):
+        """批量写入文章
+
+        Args:
+            articles: 文章字典的可迭代对象
+            source_name: 采集来源名称
+
+        Returns:
+            int: 写入的文章数
+        """
+        count = 0
+        for article in articles:
+            self.add(article, source_name)
+            count += 1
+        self.flush()
+        return count
+
+    def flush(self):
+        """把缓存的文章写入数据库"""
+        with self._lock:
+            self._flush_locked()
+
+    def _flush_locked(self):
+        if not self._pending:
+            return
+        with self._conn:
+            # 正文为空的失败记录不覆盖已有的成功记录，内容没有变化时不重建全文索引
+            self._conn.executemany('''
+                INSERT INTO articles (
+                    url_hash, url, source_name, source, title, published, published_ts,
+                    summary, text, authors, top_image, error, scraped_at
+                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT(url_hash) DO UPDATE SET
+                    source_name = excluded.source_name, source = excluded.source, title = excluded.title,
+                    published = excluded.published, published_ts = excluded.published_ts,
+                    summary = excluded.summary, text = excluded.text, authors = excluded.authors,
+                    top_image = excluded.top_image, error = excluded.error, scraped_at = excluded.scraped_at
+                WHERE (excluded.text != '' OR articles.text IS NULL OR articles.text = '')
+                  AND (excluded.title IS NOT articles.title OR excluded.summary IS NOT articles.summary
+                       OR excluded.text IS NOT articles.text OR excluded.error IS NOT articles.error
+                       OR excluded.published IS NOT articles.published)
+            ''', self._pending)
+        self._pending = []
+
+    def search(self, query=None, source=None, since=None, until=None, limit=20):
+        """搜索文章
+
+        Args:
+            query: FTS5查询表达式，为空时只按条件过滤；所有词都是普通的词（没有运算符、引号、列过滤等语法）时，
+                各词之间为AND关系，少于3个字符的词通过二元组索引匹配；含有FTS5语法时原样交给FTS5
+            source: 采集来源名称或文章来源
+            since: 发布时间下限（时间戳）
+            until: 发布时间上限（时间戳）
+            limit: 最多返回的文章数
+
+        Returns:
+            list: 文章字典，有查询时按相关度排序，否则按发布时间倒序
+        """
+        conditions = []
+        params = []
+        if source:
+            conditions.append('(a.source_name = ? OR a.source = ?)')
+            params.extend([source, source])
+        if since is not None:
+            conditions.append('a.published_ts >= ?')
+            params.append(since)
+        if until is not None:
+            conditions.append('a.published_ts < ?')
+            params.append(until)
+
+        # trigram分词器无法匹配少于3个字符的词（例如两个字的中文词），改用二元组索引
+        # 只有全部是普通的词时才改写，否则 climate NOT ab 之类的表达式会被拆坏
+        terms = query.split() if query else []
+        short_terms = [term for term in terms if len(term) < 3]
+        if short_terms and all(_is_bare_term(term) for term in terms):
+            conditions.append('a.id IN (SELECT rowid FROM articles_bigram WHERE articles_bigram MATCH ?)')
+            params.append(_bigram_query(short_terms))
+            query = ' '.join(f'"{term}"' for term in terms if len(term) >= 3)
+
+        if query:
+            sql = f'''
+                SELECT a.url, a.source_name, a.source, a.title, a.published,
+                       snippet(articles_fts, 2, '[', ']', '…', 16) AS snippet
+                FROM articles_fts JOIN articles a ON a.id = articles_fts.rowid
+                WHERE articles_fts MATCH ? {''.join(' AND ' + c for c in conditions)}
+                ORDER BY bm25(articles_fts, 10.0, 3.0, 1.0) LIMIT ?
+            '''
+            params = [query] + params + [limit]
+        else:
+            sql = f'''
+                SELECT a.url, a.source_name, a.source, a.title, a.published, substr(a.summary, 1, 80) AS snippet
+                FROM articles a {'WHERE ' + ' AND '.join(conditions) if conditions else ''}
+                ORDER BY a.published_ts DESC LIMIT ?
+            '''
+            params = params + [limit]
+
+        self.flush()
+        with self._lock:
+            return [dict(row) for row in self._conn.execute(sql, params)]
+
+    def __len__(self):
+        self.flush()
+        with self._lock:
+            return self._conn.execute('SELECT COUNT(*) FROM articles').fetchone()[0]
+
+    def optimize(self):
+        """合并全文索引的段，批量导入后调用可以加快查询"""
+        self.flush()
+        with self._lock, self._conn:
+            self._conn.execute("INSERT INTO articles_fts(articles_fts) VALUES ('optimize')")
+
+    def close(self):
+        """写入缓存的文章并关闭数据库连接"""
+        self.flush()
+        with self._lock:
+            self._conn.close()
+
+
+def main():
+    """命令行入口"""
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+
+    parser = argparse.ArgumentParser(description='文章数据库')
+    parser.add_argument('--db', default=None, help='数据库文件路径，默认使用ARTICLE_DB_PATH')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    import_parser = subparsers.add_parser('import', help='导入data目录中已保存的文章')
+    import_parser.add_argument('data_dir', nargs='?', default='data', help='数据根目录')
+
+    search_parser = subparsers.add_parser('search', help='搜索文章')
+    search_parser.add_argument('query', nargs='?', default=None, help='FTS5查询表达式')
+    search_parser.add_argument('--source', help='采集来源名称或文章来源')
+    search_parser.add_argument('--since', help='发布日期下限 YYYY-MM-DD')
+    search_parser.add_argument('--until', help='发布日期上限 YYYY-MM-DD（不含）')
+    search_parser.add_argument('--limit', type=int, default=20, help='最多返回的文章数')
+
+    args = parser.parse_args()
+    db = ArticleDatabase(args.db)
+
+    try:
+        if args.command == 'import':
+            from storage import iter_partitions, iter_source_dir
+            from body_store import BodyStore
+
+            start = time.perf_counter()
+            count = 0
+            bodies = BodyStore(os.path.join(args.data_dir, 'bodies'))
+            for _, source_name, source_dir in iter_partitions(args.data_dir):
+                count += db.add_many(iter_source_dir(source_dir, source_name, bodies), source_name)
+            db.optimize()
+            logger.info(f'导入 {count} 篇文章，耗时 {time.perf_counter() - start:.1f} 秒，数据库共 {len(db)} 篇')
+            return 0
+
+        start = time.perf_counter()
+        results = db.search(
+            args.query, source=args.source,
+            since=_date_ts(args.since) if args.since else None,
+            until=_date_ts(args.until) if args.until else None,
+            limit=args.limit
+        )
+        for row in results:
+            print(f'{row["published"] or "":<32} {row["source_name"] or "":<16} {row["title"]}')
+            print(f'    {row["url"]}')
+            if row['snippet']:
+                print(f'    {" ".join(row["snippet"].split())}')
+        print(f'共 {len(results)} 条结果，耗时 {(time.perf_counter() - start) * 1000:.1f} 毫秒')
+        return 0
+    except sqlite3.OperationalError as e:
+        logger.error(f'查询失败: {str(e)}')
+        return 1
+    finally:
+        db.close()
+
+
+if __name__ == '__main__':
+    sys.exit(main())
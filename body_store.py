@@ -0,0 +1,395 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+文章正文存储
+正文按内容哈希只保存一份，用zstd（已安装zstandard时）或zlib配合训练出的字典压缩，
+文章记录中只保留 text_hash
+"""
+
+import os
+import re
+import sys
+import json
+import zlib
+import random
+import hashlib
+import logging
+import argparse
+import threading
+from collections import Counter
+
+from url_index import content_hash
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+logger = logging.getLogger(__name__)
+
+# 正文文件头：魔数、压缩方式（s为zstd，z为zlib）和16位字典ID（无字典时为0）
+MAGIC = b'NSB1'
+NO_DICT = '0' * 16
+
+# zlib的窗口只有32KB，字典再大也用不上
+ZLIB_DICT_SIZE = 32 * 1024
+
+# 拆分句子用于统计常见片段
+_SEGMENT_RE = re.compile(r'[^。！？!?\.\n]+[。！？!?\.\n]?')
+
+
+def _build_zlib_dictionary(samples, size=ZLIB_DICT_SIZE):
+    """从样本中挑出在多篇正文中重复出现的句子，拼成zlib预置字典
+
+    越常见的句子放在越靠后的位置，zlib引用距离更近的内容时编码更短。
+    """
+    counts = Counter()
+    for sample in samples:
+        segments = {segment.strip() for segment in _SEGMENT_RE.findall(sample)}
+        counts.update(segment for segment in segments if 8 <= len(segment) <= 300)
+
+    common = [(count * len(segment.encode('utf-8')), segment) for segment, count in counts.items() if count > 1]
+    chosen = []
+    total = 0
+    for _, segment in sorted(common, reverse=True):
+        data = segment.encode('utf-8')
+        if total + len(data) > size:
+            continue
+        chosen.append(data)
+        total += len(data)
+    return b''.join(reversed(chosen))
+
+
+class BodyStore:
+    """按内容寻址的压缩正文存储
+
+    每段正文保存为 <root>/<哈希前两位>/<哈希>.body，相同的正文只写一次，root通常是 data/bodies。
+    字典保存为 <root>/dict/<字典ID>.dict，当前使用的字典记录在 <root>/dict/current.json；
+    正文文件头中记录了压缩时使用的字典，重新训练字典后旧文件仍然可以读取。
+    还没有字典时，写入的正文达到 BODY_DICT_MIN_SAMPLES 篇后在后台线程中训练一次字典，
+    训练失败时等正文数量翻倍后再试，不阻塞写入。
+    """
+
+    def __init__(self, root, codec=None, level=None, on_write=None):
+        """初始化正文存储
+
+        Args:
+            root: 存储目录
+            codec: 压缩方式，zstd或zlib，默认在安装了zstandard时使用zstd
+            level: 压缩级别
+            on_write: 写入新的正文或字典文件后调用的函数，参数为文件路径
+        """
+        self.root = root
+        self.on_write = on_write
+        self.codec = codec or os.getenv('BODY_CODEC') or ('zstd' if zstandard is not None else 'zlib')
+        if self.codec == 'zstd' and zstandard is None:
+            logger.warning('没有安装zstandard，正文改用zlib压缩')
+            self.codec = 'zlib'
+        self.level = level or int(os.getenv('BODY_LEVEL', '19' if self.codec == 'zstd' else '9'))
+        self.min_samples = int(os.getenv('BODY_DICT_MIN_SAMPLES', '200'))
+
+        self._lock = threading.Lock()
+        self._dicts = {}
+        self._dict_id = self._current_dict_id()
+
+        # 还没有字典时已保存的正文数，第一次写入时才统计，只读的使用者不需要遍历正文目录
+        self._untrained = None
+        self._train_threshold = self.min_samples
+        self._trainer = None
+
+    # 字典
+
+    def _dict_dir(self):
+        return os.path.join(self.root, 'dict')
+
+    def _current_dict_id(self):
+        path = os.path.join(self._dict_dir(), 'current.json')
+        if not os.path.exists(path):
+            return NO_DICT
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                current = json.load(f)
+        except Exception as e:
+            logger.warning(f'读取当前正文字典失败: {path}, 错误: {str(e)}')
+            return NO_DICT
+        return current.get(self.codec, NO_DICT)
+
+    def _dictionary(self, dict_id):
+        if dict_id == NO_DICT:
+            return None
+        data = self._dicts.get(dict_id)
+        if data is None:
+            with open(os.path.join(self._dict_dir(), f'{dict_id}.dict'), 'rb') as f:
+                data = self._dicts[dict_id] = f.read()
+        return data
+
+    def train(self, samples, size=None):
+        """用样本正文训练新的压缩字典，之后写入的正文都使用该字典
+
+        Args:
+            samples: 正文字符串列表
+            size: 字典大小（字节）
+
+        Returns:
+            str: 新字典的ID，样本不足时为None
+        """
+        samples = [sample for sample in samples if sample]
+        if len(samples) < 10:
+            return None
+
+        if self.codec == 'zstd':
+            size = size or int(os.getenv('BODY_DICT_SIZE', str(112 * 1024)))
+            try:
+                data = zstandard.train_dictionary(size, [sample.encode('utf-8') for sample in samples]).as_bytes()
+            except zstandard.ZstdError as e:
+                logger.warning(f'训练zstd字典失败: {str(e)}')
+                return None
+        else:
+            data = _build_zlib_dictionary(samples, min(size or ZLIB_DICT_SIZE, ZLIB_DICT_SIZE))
+        if not data:
+            return None
+
+        dict_id = hashlib.sha256(data).hexdigest()[:16]
+        os.makedirs(self._dict_dir(), exist_ok=True)
+        path = os.path.join(self._dict_dir(), f'{dict_id}.dict')
+        if not os.path.exists(path):
+            self._write_atomic(path, data)
+
+        current_path = os.path.join(self._dict_dir(), 'current.json')
+        current = {}
+        if os.path.exists(current_path):
+            with open(current_path, 'r', encoding='utf-8') as f:
+                current = json.load(f)
+        current[self.codec] = dict_id
+        self._write_atomic(current_path, json.dumps(current, indent=4).encode('utf-8'))
+
+        with self._lock:
+            self._dicts[dict_id] = data
+            self._dict_id = dict_id
+        logger.info(f'已用 {len(samples)} 篇正文训练 {self.codec} 字典 {dict_id}，大小 {len(data)} 字节')
+        return dict_id
+
+    def train_from_store(self, max_samples=2000):
+        """用随机抽取的已保存正文训练新的压缩字典
+
+        Args:
+            max_samples: 最多使用的样本数
+
+        Returns:
+            str: 新字典的ID，样本不足时为None
+        """
+        digests = list(self.iter_bodies())
+        random.shuffle(digests)
+        return self.train([self.get(digest) for digest in digests[:max_samples]])
+
+    # 读写
+
+    def _path(self, digest):
+        return os.path.join(self.root, digest[:2], f'{digest}.body')
+
+    def _write_atomic(self, path, data):
+        tmp_path = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+        if self.on_write is not None:
+            self.on_write(path)
+
+    def _compress(self, data):
+        with self._lock:
+            dict_id = self._dict_id
+        dictionary = self._dictionary(dict_id)
+
+        if self.codec == 'zstd':
+            compressor = zstandard.ZstdCompressor(
+                level=self.level, dict_data=zstandard.ZstdCompressionDict(dictionary) if dictionary else None
+            )
+            return b's', dict_id, compressor.compress(data)
+
+        compressor = zlib.compressobj(self.level, zdict=dictionary) if dictionary else zlib.compressobj(self.level)
+        return b'z', dict_id, compressor.compress(data) + compressor.flush()
+
+    def put(self, text):
+        """保存一段正文
+
+        Args:
+            text: 正文
+
+        Returns:
+            str: 正文的内容哈希，正文为空时为None
+        """
+        if not text:
+            return None
+
+        digest = content_hash(text)
+        path = self._path(digest)
+        if os.path.exists(path):
+            return digest
+
+        codec, dict_id, payload = self._compress(text.encode('utf-8'))
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._write_atomic(path, MAGIC + codec + dict_id.encode('ascii') + payload)
+
+        # 还没有字典时，已保存的正文足够多就在后台用它们训练字典
+        if dict_id == NO_DICT and self.min_samples:
+            self._count_untrained()
+        return digest
+
+    def _count_untrained(self):
+        with self._lock:
+            if self._dict_id != NO_DICT or (self._trainer is not None and self._trainer.is_alive()):
+                return
+            if self._untrained is None:
+                self._untrained = sum(1 for _ in self.iter_bodies())
+            else:
+                self._untrained += 1
+            if self._untrained < self._train_threshold:
+                return
+            self._trainer = threading.Thread(target=self._train_background, name='body-dict-train', daemon=True)
+            self._trainer.start()
+
+    def _train_background(self):
+        try:
+            dict_id = self.train_from_store()
+        except Exception as e:
+            logger.warning(f'自动训练正文字典失败: {str(e)}')
+            dict_id = None
+        if dict_id is None:
+            with self._lock:
+                self._train_threshold = max(self._train_threshold, self._untrained or 0) * 2
+            logger.info(f'正文字典暂未训练成功，正文达到 {self._train_threshold} 篇后重试')
+
+    def wait_training(self, timeout=None):
+        """等待后台的字典训练结束，进程退出前调用可以避免训练被中断"""
+        trainer = self._trainer
+        if trainer is not None:
+            trainer.join(timeout)
+
+    def get(self, digest):
+        """读取一段正文
+
+        Args:
+            digest: 内容哈希
+
+        Returns:
+            str: 正文，不存在时为None
+        """
+        path = self._path(digest)
+        if not os.path.exists(path):
+            return None
+        with open(path, 'rb') as f:
+            data = f.read()
+
+        if data[:4] != MAGIC:
+            raise ValueError(f'无法识别的正文文件: {path}')
+        codec, dict_id, payload = data[4:5], data[5:21].decode('ascii'), data[21:]
+        dictionary = self._dictionary(dict_id)
+
+        if codec == b's':
+            if zstandard is None:
+                raise ImportError(f'读取 {path} 需要安装zstandard: pip install zstandard')
+            decompressor = zstandard.ZstdDecompressor(
+                dict_data=zstandard.ZstdCompressionDict(dictionary) if dictionary else None
+            )
+            return decompressor.decompress(payload).decode('utf-8')
+
+        decompressor = zlib.decompressobj(zdict=dictionary) if dictionary else zlib.decompressobj()
+        return (decompressor.decompress(payload) + decompressor.flush()).decode('utf-8')
+
+    def files(self, digest):
+        """返回读取一段正文需要的文件：正文文件，以及压缩时使用的字典文件
+
+        Args:
+            digest: 内容哈希
+
+        Returns:
+            list: 文件路径，正文不存在时为空列表
+        """
+        path = self._path(digest)
+        try:
+            with open(path, 'rb') as f:
+                header = f.read(21)
+        except FileNotFoundError:
+            return []
+
+        dict_id = header[5:21].decode('ascii', 'replace')
+        if header[:4] != MAGIC or dict_id == NO_DICT:
+            return [path]
+        return [path, os.path.join(self._dict_dir(), f'{dict_id}.dict')]
+
+    def externalize(self, article):
+        """返回正文替换为 text_hash 的文章副本"""
+        if 'text' not in article:
+            return article
+        record = dict(article)
+        record['text_hash'] = self.put(record.pop('text'))
+        return record
+
+    def hydrate(self, article):
+        """返回根据 text_hash 恢复了正文的文章副本，没有 text_hash 的文章原样返回"""
+        if 'text_hash' not in article:
+            return article
+        record = dict(article)
+        digest = record.pop('text_hash')
+        record['text'] = (self.get(digest) or '') if digest else ''
+        return record
+
+    def iter_bodies(self):
+        """遍历已保存正文的内容哈希"""
+        if not os.path.isdir(self.root):
+            return
+        for prefix in sorted(os.listdir(self.root)):
+            directory = os.path.join(self.root, prefix)
+            if len(prefix) != 2 or not os.path.isdir(directory):
+                continue
+            for filename in sorted(os.listdir(directory)):
+                if filename.endswith('.body'):
+                    yield filename[:-len('.body')]
+
+
+def main():
+    """命令行入口"""
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+
+    parser = argparse.ArgumentParser(description='文章正文存储')
+    parser.add_argument('--data-dir', default='data', help='数据根目录，正文保存在其中的bodies目录')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    train_parser = subparsers.add_parser('train', help='用已保存的正文训练新的压缩字典')
+    train_parser.add_argument('--samples', type=int, default=2000, help='最多使用的样本数')
+
+    subparsers.add_parser('migrate', help='把数据目录中JSON Lines文件里的正文移到正文存储，迁移期间不要运行采集')
+    subparsers.add_parser('stats', help='统计正文数量和压缩率')
+
+    args = parser.parse_args()
+    store = BodyStore(os.path.join(args.data_dir, 'bodies'))
+
+    if args.command == 'train':
+        return 0 if store.train_from_store(args.samples) else 1
+
+    if args.command == 'migrate':
+        from storage import iter_partitions, jsonl_segments, iter_jsonl
+
+        for _, source_name, source_dir in iter_partitions(args.data_dir):
+            for path in jsonl_segments(source_dir, source_name):
+                tmp_path = f'{path}.tmp'
+                with open(tmp_path, 'w', encoding='utf-8') as f:
+                    for article in iter_jsonl(path):
+                        f.write(json.dumps(store.externalize(article), ensure_ascii=False, separators=(',', ':')) + '\n')
+                os.replace(tmp_path, path)
+                logger.info(f'已迁移 {path}')
+        store.wait_training()
+        return 0
+
+    count = raw = stored = 0
+    for digest in store.iter_bodies():
+        count += 1
+        raw += len(store.get(digest).encode('utf-8'))
+        stored += os.path.getsize(store._path(digest))
+    print(f'正文 {count} 篇，原始 {raw} 字节，压缩后 {stored} 字节，压缩率 {stored / raw if raw else 0:.1%}')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
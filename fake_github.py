@@ -0,0 +1,344 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+本地GitHub API替身
+在内存中实现 github_sync.py 用到的contents API和Git Data API（blob、tree、commit、ref），
+并可以模拟主限流和次级限流，把GITHUB_API_URL指向它即可离线测试同步，不需要真实的仓库和令牌
+"""
+
+import sys
+import json
+import time
+import base64
+import hashlib
+import logging
+import argparse
+import threading
+from collections import Counter
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+logger = logging.getLogger(__name__)
+
+
+def _blob_sha(data):
+    return hashlib.sha1(b'blob %d\0' % len(data) + data).hexdigest()
+
+
+def _object_sha(kind, obj):
+    return hashlib.sha1(f'{kind} {json.dumps(obj, sort_keys=True)}'.encode('utf-8')).hexdigest()
+
+
+class FakeRepository:
+    """内存中的单分支仓库
+
+    tree保存为 路径 -> blob SHA 的扁平映射，不区分子目录；所有请求路径中的仓库名都指向同一个仓库。
+    """
+
+    def __init__(self, branch='main', empty=False):
+        self.lock = threading.Lock()
+        self.blobs = {}
+        self.trees = {}
+        self.commits = {}
+        self.refs = {}
+        self.calls = Counter()
+        if not empty:
+            readme = b'# news\n'
+            self.blobs[_blob_sha(readme)] = readme
+            tree = self.add_tree({'README.md': _blob_sha(readme)})
+            self.refs[branch] = self.add_commit('初始提交', tree, [])
+
+    def add_tree(self, files):
+        sha = _object_sha('tree', files)
+        self.trees[sha] = files
+        return sha
+
+    def add_commit(self, message, tree, parents):
+        commit = {'message': message, 'tree': tree, 'parents': parents}
+        sha = _object_sha('commit', commit)
+        self.commits[sha] = commit
+        return sha
+
+    def head_files(self, branch):
+        head = self.refs.get(branch)
+        return dict(self.trees[self.commits[head]['tree']]) if head else {}
+
+
+class RateLimits:
+    """模拟GitHub的限流
+
+    主限流：每个窗口（window秒）最多limit个请求，每个响应都带 X-RateLimit-* 头，用完后返回403。
+    次级限流：同时进行的请求超过max_concurrent个时返回403和 Retry-After。
+    """
+
+    def __init__(self, limit=0, window=3600, max_concurrent=0, retry_after=1):
+        self.limit = limit
+        self.window = window
+        self.max_concurrent = max_concurrent
+        self.retry_after = retry_after
+        self.lock = threading.Lock()
+        self.active = 0
+        self.used = 0
+        self.reset_at = time.time() + window
+        self.rejected = Counter()
+
+    def enter(self):
+        """开始一个请求
+
+        Returns:
+            tuple: (响应头, 拒绝原因)，未被拒绝时原因为None
+        """
+        with self.lock:
+            now = time.time()
+            if now >= self.reset_at:
+                self.used = 0
+                self.reset_at = now + self.window
+            self.active += 1
+
+            headers = {}
+            if self.limit:
+                if self.used >= self.limit:
+                    self.rejected['primary'] += 1
+                    return self._headers(), 'primary'
+                self.used += 1
+                headers = self._headers()
+            if self.max_concurrent and self.active > self.max_concurrent:
+                self.rejected['secondary'] += 1
+                headers['Retry-After'] = str(self.retry_after)
+                return headers, 'secondary'
+            return headers, None
+
+    def _headers(self):
+        return {
+            'X-RateLimit-Limit': str(self.limit),
+            'X-RateLimit-Remaining': str(self.limit - self.used),
+            'X-RateLimit-Reset': str(int(self.reset_at))
+        }
+
+    def leave(self):
+        with self.lock:
+            self.active -= 1
+
+
+class _Handler(BaseHTTPRequestHandler):
+    repository = None
+    limits = None
+    branch = 'main'
+    latency = 0.0
+
+    def log_message(self, format, *args):
+        logger.debug(format, *args)
+
+    def _send(self, status, body):
+        data = json.dumps(body).encode('utf-8')
+        self.send_response(status)
+        for name, value in self._limit_headers.items():
+            self.send_header(name, value)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _body(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        return json.loads(self.rfile.read(length)) if length else {}
+
+    def _dispatch(self, method):
+        # /repos/<owner>/<repo>/<rest>
+        path = self.path.split('?', 1)[0]
+        self._limit_headers = {}
+        if path == '/_stats':
+            with self.repository.lock:
+                return self._send(200, {
+                    'calls': dict(self.repository.calls),
+                    'rejected': dict(self.limits.rejected),
+                    'refs': dict(self.repository.refs)
+                })
+
+        parts = path.strip('/').split('/', 3)
+        if len(parts) < 4 or parts[0] != 'repos':
+            return self._send(404, {'message': 'Not Found'})
+
+        self._limit_headers, rejected = self.limits.enter()
+        try:
+            if self.latency:
+                time.sleep(self.latency)
+            if rejected:
+                # 读掉请求体，保持连接可以继续使用
+                self.rfile.read(int(self.headers.get('Content-Length') or 0))
+            if rejected == 'primary':
+                return self._send(403, {'message': 'API rate limit exceeded'})
+            if rejected == 'secondary':
+                return self._send(403, {'message': 'You have exceeded a secondary rate limit'})
+            return self._handle(method, parts[3])
+        finally:
+            self.limits.leave()
+
+    def _handle(self, method, rest):
+        repository = self.repository
+        with repository.lock:
+            kind = rest.split('/', 2)[1] if rest.startswith('git/') else rest.split('/', 1)[0]
+            repository.calls[f'{method} {kind}'] += 1
+
+            if rest.startswith('contents/'):
+                return self._contents(method, rest[len('contents/'):])
+            if rest.startswith('git/'):
+                # 与GitHub一致：空仓库不支持Git Data API
+                if not repository.refs:
+                    return self._send(409, {'message': 'Git Repository is empty.'})
+                return self._git(method, rest[len('git/'):])
+        return self._send(404, {'message': 'Not Found'})
+
+    def _contents(self, method, repo_path):
+        repository = self.repository
+        files = repository.head_files(self.branch)
+        if method == 'GET':
+            if repo_path not in files:
+                return self._send(404, {'message': 'Not Found'})
+            return self._send(200, {'path': repo_path, 'sha': files[repo_path]})
+
+        if method != 'PUT':
+            return self._send(405, {'message': 'Method Not Allowed'})
+        body = self._body()
+        current = files.get(repo_path)
+        if current and body.get('sha') != current:
+            return self._send(409, {'message': f'{repo_path} does not match {body.get("sha")}'})
+        if not current and body.get('sha'):
+            return self._send(422, {'message': f'{repo_path} does not exist'})
+
+        data = base64.b64decode(body['content'])
+        sha = _blob_sha(data)
+        repository.blobs[sha] = data
+        files[repo_path] = sha
+        head = repository.refs.get(self.branch)
+        repository.refs[self.branch] = repository.add_commit(
+            body.get('message', ''), repository.add_tree(files), [head] if head else []
+        )
+        return self._send(200 if current else 201, {'content': {'path': repo_path, 'sha': sha}})
+
+    def _git(self, method, rest):
+        repository = self.repository
+
+        if method == 'POST' and rest == 'blobs':
+            body = self._body()
+            data = base64.b64decode(body['content']) if body.get('encoding') == 'base64' else body['content'].encode('utf-8')
+            sha = _blob_sha(data)
+            repository.blobs[sha] = data
+            return self._send(201, {'sha': sha})
+
+        if method == 'POST' and rest == 'trees':
+            body = self._body()
+            base = body.get('base_tree')
+            if base and base not in repository.trees:
+                return self._send(422, {'message': 'base_tree not found'})
+            files = dict(repository.trees[base]) if base else {}
+            for entry in body['tree']:
+                if entry.get('sha') is None:
+                    files.pop(entry['path'], None)
+                elif entry['sha'] not in repository.blobs:
+                    return self._send(422, {'message': f'blob {entry["sha"]} not found'})
+                else:
+                    files[entry['path']] = entry['sha']
+            return self._send(201, {'sha': repository.add_tree(files)})
+
+        if method == 'POST' and rest == 'commits':
+            body = self._body()
+            if body['tree'] not in repository.trees or any(p not in repository.commits for p in body['parents']):
+                return self._send(422, {'message': 'tree or parent not found'})
+            sha = repository.add_commit(body['message'], body['tree'], body['parents'])
+            return self._send(201, {'sha': sha, 'tree': {'sha': body['tree']}})
+
+        if method == 'GET' and rest.startswith('commits/'):
+            commit = repository.commits.get(rest[len('commits/'):])
+            if commit is None:
+                return self._send(404, {'message': 'Not Found'})
+            return self._send(200, {'sha': rest[len('commits/'):], 'tree': {'sha': commit['tree']}, 'parents': [
+                {'sha': parent} for parent in commit['parents']
+            ]})
+
+        if method == 'GET' and rest.startswith('ref/heads/'):
+            head = repository.refs.get(rest[len('ref/heads/'):])
+            if head is None:
+                return self._send(404, {'message': 'Not Found'})
+            return self._send(200, {'ref': f'refs/{rest[len("ref/"):]}', 'object': {'sha': head, 'type': 'commit'}})
+
+        if method == 'POST' and rest == 'refs':
+            body = self._body()
+            branch = body['ref'][len('refs/heads/'):]
+            if branch in repository.refs:
+                return self._send(422, {'message': 'Reference already exists'})
+            repository.refs[branch] = body['sha']
+            return self._send(201, {'ref': body['ref'], 'object': {'sha': body['sha']}})
+
+        if method == 'PATCH' and rest.startswith('refs/heads/'):
+            branch = rest[len('refs/heads/'):]
+            body = self._body()
+            commit = repository.commits.get(body['sha'])
+            if commit is None or branch not in repository.refs:
+                return self._send(422, {'message': 'Reference does not exist'})
+            # 只检查直接父提交，足以判断是否为快进更新
+            if not body.get('force') and repository.refs[branch] not in commit['parents']:
+                return self._send(422, {'message': 'Update is not a fast forward'})
+            repository.refs[branch] = body['sha']
+            return self._send(200, {'ref': f'refs/heads/{branch}', 'object': {'sha': body['sha']}})
+
+        return self._send(404, {'message': 'Not Found'})
+
+    def do_GET(self):
+        self._dispatch('GET')
+
+    def do_POST(self):
+        self._dispatch('POST')
+
+    def do_PUT(self):
+        self._dispatch('PUT')
+
+    def do_PATCH(self):
+        self._dispatch('PATCH')
+
+
+def serve(port=8770, host='127.0.0.1', branch='main', empty=False, latency=0.0, limits=None):
+    """创建本地API服务器，调用 serve_forever() 开始处理请求
+
+    Args:
+        limits: RateLimits，默认不限流
+
+    Returns:
+        ThreadingHTTPServer: 服务器，仓库可以通过 server.repository 访问
+    """
+    repository = FakeRepository(branch, empty)
+    handler = type('Handler', (_Handler,), {
+        'repository': repository, 'limits': limits or RateLimits(), 'branch': branch, 'latency': latency
+    })
+    server = ThreadingHTTPServer((host, port), handler)
+    server.repository = repository
+    return server
+
+
+def main():
+    """命令行入口"""
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+
+    parser = argparse.ArgumentParser(description='本地GitHub API替身，用于离线测试同步')
+    parser.add_argument('--port', type=int, default=8770, help='监听端口')
+    parser.add_argument('--branch', default='main', help='分支名')
+    parser.add_argument('--empty', action='store_true', help='从空仓库开始')
+    parser.add_argument('--latency', type=float, default=0.0, help='每个请求模拟的网络延迟（秒）')
+    parser.add_argument('--rate-limit', type=int, default=0, help='每个窗口允许的请求数，0表示不限制')
+    parser.add_argument('--rate-window', type=float, default=3600, help='主限流窗口（秒）')
+    parser.add_argument('--max-concurrent', type=int, default=0, help='超过该并发数时触发次级限流，0表示不限制')
+    parser.add_argument('--retry-after', type=int, default=1, help='次级限流返回的 Retry-After（秒）')
+    args = parser.parse_args()
+
+    limits = RateLimits(args.rate_limit, args.rate_window, args.max_concurrent, args.retry_after)
+    server = serve(args.port, branch=args.branch, empty=args.empty, latency=args.latency, limits=limits)
+    logger.info(f'本地GitHub API已启动: http://127.0.0.1:{args.port}，请求统计: /_stats')
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,69 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+RSS源条件请求缓存
+在多次运行之间保存每个RSS源的ETag和Last-Modified
+"""
+
+import os
+import json
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+
+class FeedValidatorStore:
+    """RSS源验证信息(ETag/Last-Modified)的持久化存储"""
+
+    def __init__(self, path=None):
+        """初始化存储
+
+        Args:
+            path: JSON文件路径，默认保存在STATE_DIR目录下
+        """
+        self.path = path or os.path.join(os.getenv('STATE_DIR', 'state'), 'feed_validators.json')
+        self._lock = threading.Lock()
+        self._validators = {}
+
+        if os.path.exists(self.path):
+            try:
+                with open(self.path, 'r', encoding='utf-8') as f:
+                    self._validators = json.load(f)
+            except Exception as e:
+                logger.warning(f'读取RSS验证信息失败: {self.path}, 错误: {str(e)}')
+
+    def get(self, url):
+        """获取RSS源上次保存的验证信息
+
+        Args:
+            url: RSS源URL
+
+        Returns:
+            dict: 包含etag和modified的字典，没有记录时为空字典
+        """
+        with self._lock:
+            return dict(self._validators.get(url, {}))
+
+    def update(self, url, etag=None, modified=None):
+        """保存RSS源最新的验证信息并写入磁盘
+
+        Args:
+            url: RSS源URL
+            etag: 服务器返回的ETag
+            modified: 服务器返回的Last-Modified
+        """
+        with self._lock:
+            if etag or modified:
+                self._validators[url] = {'etag': etag, 'modified': modified}
+            else:
+                self._validators.pop(url, None)
+            self._save()
+
+    def _save(self):
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        tmp_path = f'{self.path}.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self._validators, f, ensure_ascii=False, indent=4)
+        os.replace(tmp_path, self.path)
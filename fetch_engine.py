@@ -0,0 +1,522 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+异步文章抓取引擎
+所有采集方法共用同一个事件循环、连接池和并发信号量
+"""
+
+import os
+import time
+import queue
+import asyncio
+import logging
+import itertools
+import functools
+import threading
+import multiprocessing
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+import requests
+from requests.adapters import HTTPAdapter
+from politeness import HostScheduler, host_of
+
+logger = logging.getLogger(__name__)
+
+
+class _ConnectCounter:
+    """线程安全的TCP连接建立计数器"""
+
+    def __init__(self):
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def increment(self):
+        with self._lock:
+            self.count += 1
+
+
+def _counting_pool_class(pool_cls, counter):
+    """生成在每次真正建立连接时计数的连接池类"""
+
+    class CountingConnection(pool_cls.ConnectionCls):
+        def connect(self):
+            counter.increment()
+            super().connect()
+
+    return type(pool_cls.__name__, (pool_cls,), {'ConnectionCls': CountingConnection})
+
+
+class PooledSession(requests.Session):
+    """按主机复用keep-alive连接的HTTP会话"""
+
+    def __init__(self, pool_per_host, pool_hosts, timeout=None, scheduler=None):
+        """初始化连接池
+
+        Args:
+            pool_per_host: 每个主机保留的最大连接数
+            pool_hosts: 连接池最多缓存的主机数
+            timeout: 默认的 (连接超时, 读取超时) 秒数
+            scheduler: 按主机限速的调度器，所有请求发出前都要经过它
+        """
+        super().__init__()
+        self.timeout = timeout
+        self.scheduler = scheduler
+        adapter = HTTPAdapter(pool_connections=pool_hosts, pool_maxsize=pool_per_host)
+        self._connects = _ConnectCounter()
+        adapter.poolmanager.pool_classes_by_scheme = {
+            scheme: _counting_pool_class(pool_cls, self._connects)
+            for scheme, pool_cls in adapter.poolmanager.pool_classes_by_scheme.items()
+        }
+        self.mount('http://', adapter)
+        self.mount('https://', adapter)
+        from newspaper import Config
+        self.headers['User-Agent'] = Config().browser_user_agent
+
+    def request(self, method, url, **kwargs):
+        # 没有显式指定超时的请求使用会话的默认超时，避免慢站点无限期占用连接
+        if kwargs.get('timeout') is None:
+            kwargs['timeout'] = self.timeout
+        if self.scheduler is None:
+            return super().request(method, url, **kwargs)
+        with self.scheduler.slot(host_of(url)):
+            return super().request(method, url, **kwargs)
+
+    def connection_stats(self):
+        """统计连接复用情况
+
+        Returns:
+            dict: 请求数、新建连接数和连接复用率
+        """
+        total_requests = 0
+        for adapter in set(self.adapters.values()):
+            pools = adapter.poolmanager.pools
+            for key in pools.keys():
+                total_requests += pools[key].num_requests
+        total_connections = self._connects.count
+
+        reused = max(total_requests - total_connections, 0)
+        return {
+            'requests': total_requests,
+            'connections': total_connections,
+            'reuse_rate': reused / total_requests if total_requests else 0.0
+        }
+
+
+class _PooledRequests:
+    """替换newspaper.network中的requests模块，使newspaper.build的站点抓取走连接池"""
+
+    exceptions = requests.exceptions
+    utils = requests.utils
+
+    def __init__(self, session):
+        self._session = session
+
+    def get(self, url, **kwargs):
+        # 使用会话统一配置的超时代替newspaper自带的超时
+        kwargs['timeout'] = self._session.timeout
+        return self._session.get(url, **kwargs)
+
+
+class FetchEngine:
+    """基于asyncio的文章抓取引擎
+
+    事件循环运行在独立的后台线程中，同步代码通过 fetch_articles 提交任务。
+    下载在IO线程池中执行，下载得到的HTML放入有界队列，
+    由进程池（默认每个CPU核一个进程）完成newspaper的正文提取。
+    """
+
+    def __init__(self, max_concurrency=None, per_host=None, max_per_run=None, parse_workers=None):
+        """初始化抓取引擎
+
+        Args:
+            max_concurrency: 同时进行的最大下载数
+            per_host: 单个主机的最大并发下载数
+            max_per_run: 每轮采集最多下载的文章数，0表示不限制
+            parse_workers: 解析进程数
+
+        超时配置从环境变量读取：FETCH_CONNECT_TIMEOUT、FETCH_READ_TIMEOUT为单次请求的
+        连接和读取超时，ARTICLE_BUDGET为单篇文章下载加解析的总时长上限，0表示不限制。
+        """
+        self.max_concurrency = max_concurrency or int(os.getenv('FETCH_WORKERS', '32'))
+        self.per_host = per_host or int(os.getenv('FETCH_PER_HOST', '2'))
+        self.max_per_run = max_per_run if max_per_run is not None else int(os.getenv('FETCH_MAX_PER_RUN', '0'))
+        self.parse_workers = parse_workers or int(os.getenv('PARSE_WORKERS') or os.cpu_count() or 1)
+        self.parse_queue_size = int(os.getenv('PARSE_QUEUE_SIZE') or self.parse_workers * 4)
+
+        timeout = (float(os.getenv('FETCH_CONNECT_TIMEOUT', '5')), float(os.getenv('FETCH_READ_TIMEOUT', '20')))
+        self.article_budget = float(os.getenv('ARTICLE_BUDGET', '60')) or None
+
+        # 所有请求都经过按主机限速的调度器，并共用一个连接池，每个主机的连接数与并发上限一致
+        self.scheduler = HostScheduler(max_connections=self.per_host)
+        self.session = PooledSession(
+            self.per_host, int(os.getenv('HTTP_POOL_HOSTS', '100')), timeout=timeout, scheduler=self.scheduler
+        )
+        # newspaper较重，创建引擎时才导入
+        from newspaper import network
+        self._network = network
+        self._original_network_requests = network.requests
+        network.requests = _PooledRequests(self.session)
+
+        self._io_executor = ThreadPoolExecutor(max_workers=self.max_concurrency, thread_name_prefix='fetch-io')
+        # 解析是CPU密集型任务，使用spawn方式创建进程，避免fork时复制后台线程持有的锁
+        self._parse_executor = ProcessPoolExecutor(
+            max_workers=self.parse_workers, mp_context=multiprocessing.get_context('spawn'),
+            initializer=_init_parse_worker, initargs=(os.getpid(),)
+        )
+
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, name='fetch-engine', daemon=True)
+        self._thread.start()
+
+        # 信号量只在事件循环线程中创建和使用
+        self._global_semaphore = None
+        self._run_fetch_count = 0
+        self.timeouts = 0
+
+    def reset_run(self):
+        """重置本轮采集的下载计数和超时计数"""
+        self._run_fetch_count = 0
+        self.timeouts = 0
+
+    def run(self, coro):
+        """在引擎的事件循环中执行协程并等待结果"""
+        return asyncio.run_coroutine_threadsafe(coro, self._loop).result()
+
+    def fetch_articles(self, urls, deadline=None):
+        """并发下载并解析多篇文章
+
+        Args:
+            urls: 文章URL列表
+            deadline: time.monotonic()时间的截止点，到期后取消剩余任务
+
+        Returns:
+            list: 与urls顺序一致的文章内容列表，失败项为None，超时项带有error字段；
+                内容中的url为跟随重定向后的最终地址
+        """
+        results = [None] * len(urls)
+        for index, content in self.iter_articles(urls, deadline):
+            results[index] = content
+        return results
+
+    def iter_articles(self, urls, deadline=None):
+        """并发下载并解析多篇文章，每篇完成后立即产出
+
+        已完成但尚未被取走的结果最多PARSE_QUEUE_SIZE篇，调用方处理得慢时
+        解析和下载会随之暂停，内存占用只与同时处理中的文章数有关。
+
+        Args:
+            urls: 文章URL列表
+            deadline: time.monotonic()时间的截止点，到期后取消剩余任务
+
+        Yields:
+            tuple: (在urls中的下标, 文章内容)，按完成顺序产出，失败项的内容为None，
+                超时项的内容为 {'url': url, 'error': 'timeout'}
+        """
+        if not urls:
+            return
+
+        results = queue.Queue()
+        slots = []
+        pending = set(range(len(urls)))
+
+        async def produce():
+            slots.append(asyncio.Semaphore(self.parse_queue_size))
+
+            async def emit(index, content):
+                await slots[0].acquire()
+                results.put((index, content))
+
+            await self._fetch_all(urls, emit)
+
+        future = asyncio.run_coroutine_threadsafe(produce(), self._loop)
+        try:
+            while pending:
+                wait = 0.5 if deadline is None else min(0.5, deadline - time.monotonic())
+                if wait <= 0:
+                    # 超出来源的总时长，剩余文章全部记为超时
+                    future.cancel()
+                    logger.warning(f'超出来源抓取时限，取消剩余 {len(pending)} 篇文章')
+                    for index in sorted(pending):
+                        yield index, self._timed_out(urls[index])
+                    return
+                try:
+                    item = results.get(timeout=wait)
+                except queue.Empty:
+                    if future.done() and results.empty():
+                        future.result()
+                        return
+                    continue
+                pending.discard(item[0])
+                self._loop.call_soon_threadsafe(slots[0].release)
+                yield item
+            future.result()
+        finally:
+            # 调用方提前停止迭代时取消剩余的下载和解析
+            future.cancel()
+
+    def _timed_out(self, url):
+        """记录一次超时并返回超时的文章内容"""
+        self.timeouts += 1
+        logger.warning(f'抓取文章超时: {url}')
+        return {'url': url, 'error': 'timeout'}
+
+    def resolve_urls(self, urls):
+        """并发解析跳转链接的最终地址，只发送HEAD等轻量请求
+
+        Args:
+            urls: 跳转链接列表
+
+        Returns:
+            list: 与urls顺序一致的最终URL列表，解析失败项为None
+        """
+        if not urls:
+            return []
+        return self.run(self._resolve_all(urls))
+
+    def fetch_feed(self, url, etag=None, modified=None):
+        """通过连接池下载并解析RSS源，支持条件请求
+
+        Args:
+            url: RSS源URL
+            etag: 上次请求返回的ETag
+            modified: 上次请求返回的Last-Modified
+
+        Returns:
+            feedparser.FeedParserDict: 解析结果，status为304时没有entries
+        """
+        import feedparser
+
+        headers = {}
+        if etag:
+            headers['If-None-Match'] = etag
+        if modified:
+            headers['If-Modified-Since'] = modified
+
+        response = self.session.get(url, headers=headers)
+        if response.status_code == 304:
+            feed = feedparser.FeedParserDict(entries=[], feed=feedparser.FeedParserDict())
+        else:
+            response.raise_for_status()
+            feed = feedparser.parse(response.content, response_headers=dict(response.headers))
+
+        # 与feedparser直接请求URL时的结果字段保持一致
+        feed['status'] = response.status_code
+        feed['etag'] = response.headers.get('ETag', etag)
+        feed['modified'] = response.headers.get('Last-Modified', modified)
+        return feed
+
+    def close(self):
+        """停止事件循环并关闭线程池和连接池"""
+        if self._loop.is_closed():
+            return
+        self._network.requests = self._original_network_requests
+        self.session.close()
+        self.run(_cancel_pending_tasks())
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+        self._loop.close()
+        self._io_executor.shutdown(wait=False)
+        self._parse_executor.shutdown(wait=True, cancel_futures=True)
+
+    async def _fetch_all(self, urls, emit):
+        # 下载与解析之间的有界队列，解析跟不上时下载会等待
+        queue = asyncio.Queue(maxsize=self.parse_queue_size)
+
+        extractors = [
+            asyncio.create_task(self._extract_worker(queue, emit))
+            for _ in range(min(self.parse_workers, len(urls)))
+        ]
+        try:
+            # 按主机轮流发起下载，避免同一主机的文章集中排在前面
+            await asyncio.gather(*(
+                self._download_one(index, urls[index], queue, emit) for index in _interleave_by_host(urls)
+            ))
+            for _ in extractors:
+                await queue.put(None)
+            await asyncio.gather(*extractors)
+        finally:
+            for task in extractors:
+                task.cancel()
+
+    async def _extract_worker(self, queue, emit):
+        """从队列取出HTML，交给进程池提取正文"""
+        loop = asyncio.get_running_loop()
+        while True:
+            item = await queue.get()
+            if item is None:
+                return
+            index, url, html, deadline = item
+            try:
+                timeout = None if deadline is None else deadline - loop.time()
+                if timeout is not None and timeout <= 0:
+                    raise asyncio.TimeoutError()
+                content = await asyncio.wait_for(
+                    loop.run_in_executor(self._parse_executor, extract_article, url, html), timeout
+                )
+            except asyncio.TimeoutError:
+                content = self._timed_out(url)
+            except Exception as e:
+                logger.error(f'提取文章内容失败: {url}, 错误: {str(e)}')
+                content = None
+            await emit(index, content)
+
+    async def _resolve_all(self, urls):
+        return await asyncio.gather(*(self._resolve_one(url) for url in urls))
+
+    async def _resolve_one(self, url):
+        try:
+            return await self._run_admitted(url, self._resolve)
+        except Exception as e:
+            logger.warning(f'解析跳转链接失败: {url}, 错误: {str(e)}')
+            return None
+
+    def _resolve(self, url, host):
+        with self.scheduler.admitted(host):
+            response = self.session.head(url, allow_redirects=True)
+            if response.status_code in (403, 405, 501):
+                # 部分站点不支持HEAD，改用不读取正文的GET
+                response = self.session.get(url, stream=True)
+                response.close()
+        response.raise_for_status()
+        return response.url
+
+    async def _run_admitted(self, url, func, timeout=None):
+        """先在调度器中按主机排队获得许可，再占用全局并发名额，然后在IO线程中执行 func(url, host)
+
+        超时后立即抛出 asyncio.TimeoutError，但线程中的请求无法中止，主机许可和全局并发名额
+        保留到请求真正结束时才归还，否则同一主机会在旧请求仍占着连接时开始新的下载，超出FETCH_PER_HOST。
+        """
+        loop = asyncio.get_running_loop()
+        host = host_of(url)
+        await self.scheduler.acquire_async(host)
+        try:
+            if self._global_semaphore is None:
+                self._global_semaphore = asyncio.Semaphore(self.max_concurrency)
+            await self._global_semaphore.acquire()
+        except BaseException:
+            self.scheduler.release(host)
+            raise
+
+        semaphore = self._global_semaphore
+
+        def release(_=None):
+            semaphore.release()
+            self.scheduler.release(host)
+
+        try:
+            future = loop.run_in_executor(self._io_executor, func, url, host)
+        except BaseException:
+            release()
+            raise
+        future.add_done_callback(release)
+        # shield：超时或取消时不取消线程对应的future，归还许可的回调在请求结束后才执行
+        return await asyncio.wait_for(asyncio.shield(future), timeout)
+
+    def _reserve_fetch(self):
+        if self.max_per_run and self._run_fetch_count >= self.max_per_run:
+            return False
+        self._run_fetch_count += 1
+        return True
+
+    async def _download_one(self, index, url, queue, emit):
+        """下载单篇文章并把HTML放入解析队列，失败时直接产出None"""
+        if not self._reserve_fetch():
+            logger.warning(f'已达到本轮采集上限 {self.max_per_run}，跳过: {url}')
+            await emit(index, None)
+            return
+
+        loop = asyncio.get_running_loop()
+        started = []
+
+        def download(url, host):
+            # 单篇文章的时限从真正开始下载时计算，下载和解析共用
+            started.append(loop.time())
+            return self._download(url, host)
+
+        try:
+            final_url, html = await self._run_admitted(url, download, self.article_budget)
+        except asyncio.TimeoutError:
+            await emit(index, self._timed_out(url))
+            return
+        except Exception as e:
+            logger.error(f'下载文章失败: {url}, 错误: {str(e)}')
+            await emit(index, None)
+            return
+        deadline = None if self.article_budget is None else started[0] + self.article_budget
+        await queue.put((index, final_url, html, deadline))
+
+    def _download(self, url, host):
+        with self.scheduler.admitted(host):
+            response = self.session.get(url)
+        response.raise_for_status()
+        return response.url, self._network.get_html_2XX_only(url, response=response)
+
+
+async def _cancel_pending_tasks():
+    """取消事件循环中仍在运行的任务并等待其结束"""
+    tasks = [task for task in asyncio.all_tasks() if task is not asyncio.current_task()]
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+
+
+def _interleave_by_host(urls):
+    """按主机轮流排列URL的下标"""
+    groups = {}
+    for index, url in enumerate(urls):
+        groups.setdefault(host_of(url), []).append(index)
+    return [index for batch in itertools.zip_longest(*groups.values()) for index in batch if index is not None]
+
+
+def _init_parse_worker(parent_pid):
+    """解析进程的初始化函数，父进程退出后解析进程随之退出
+
+    父进程被强制结束时来不及关闭进程池，解析进程会一直阻塞在任务队列上，
+    因此由后台线程定期检查父进程是否还在。
+    """
+    def watch():
+        while os.getppid() == parent_pid:
+            time.sleep(1)
+        os._exit(0)
+
+    threading.Thread(target=watch, name='parent-watch', daemon=True).start()
+
+
+@functools.lru_cache(maxsize=None)
+def _article_config():
+    """解析进程使用的newspaper配置
+
+    解析阶段只处理已下载的HTML，不下载图片：newspaper默认会在parse()中请求图片来挑选头图，
+    这些请求绕过了连接池、主机调度和超时设置。头图直接使用页面中声明的图片地址。
+    """
+    from newspaper import Config
+
+    config = Config()
+    config.fetch_images = False
+    return config
+
+
+def extract_article(url, html):
+    """从HTML中提取文章正文，在解析进程中执行
+
+    Args:
+        url: 文章的最终URL
+        html: 文章HTML
+
+    Returns:
+        dict: 精简后的文章记录，发布日期为ISO格式字符串
+    """
+    from newspaper import Article
+
+    news_article = Article(url, config=_article_config())
+    news_article.download(input_html=html)
+    news_article.parse()
+    return {
+        'url': url,
+        'title': news_article.title,
+        'text': news_article.text,
+        'authors': news_article.authors,
+        'top_image': news_article.top_image,
+        'summary': news_article.summary,
+        'publish_date': news_article.publish_date.isoformat() if news_article.publish_date else None
+    }
@@ -0,0 +1,266 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+基于git命令的增量同步
+只暂存采集写入记录中的文件，提交后推送；可以按月份把数据分到不同的git仓库，避免单个仓库无限增长
+"""
+
+import os
+import re
+import sys
+import time
+import logging
+import argparse
+import datetime
+import subprocess
+
+from write_log import WriteLog
+
+logger = logging.getLogger(__name__)
+
+# 路径中按日期命名的目录，用于确定文件所属的月份
+_MONTH_RE = re.compile(r'(?:^|/)(\d{4}-\d{2})-\d{2}(?:/|$)')
+
+# 同步的数据文件类型，与 github_sync.py 一致
+SYNC_SUFFIXES = ('.json', '.jsonl', '.csv', '.body', '.dict')
+
+
+class GitSync:
+    """用git命令增量提交和推送数据文件
+
+    不分片时使用工作目录所在的git仓库。按月分片时，每个月份使用 <shard_dir>/<月份>.git 作为
+    独立的git目录，工作目录仍是当前目录；文件路径中有日期目录时按该日期归属月份。
+    正文和字典等没有日期的文件随引用它们的文章记录归属月份，同一个正文被多个月份引用时
+    会提交到每个月份的仓库，每个分片都能独立读取；没有引用方的文件按修改时间归属月份。
+    """
+
+    def __init__(self, work_tree='.', remote='origin', branch=None, shard_by_month=None, shard_dir=None,
+                 shard_remote=None):
+        """初始化同步工具
+
+        Args:
+            work_tree: 工作目录
+            remote: 不分片时推送的远程仓库名
+            branch: 分支名，默认使用GITHUB_BRANCH
+            shard_by_month: 是否按月分片，默认使用GIT_SHARD_BY_MONTH
+            shard_dir: 分片git目录的存放目录，默认使用GIT_SHARD_DIR
+            shard_remote: 分片的远程仓库地址模板，{month} 替换为月份，默认使用GIT_SHARD_REMOTE，为空时只提交不推送
+        """
+        self.work_tree = os.path.abspath(work_tree)
+        self.remote = remote
+        self.branch = branch or os.getenv('GITHUB_BRANCH', 'main')
+        if shard_by_month is None:
+            shard_by_month = os.getenv('GIT_SHARD_BY_MONTH', '0') == '1'
+        self.shard_by_month = shard_by_month
+        self.shard_dir = os.path.abspath(shard_dir or os.getenv('GIT_SHARD_DIR', 'git_shards'))
+        self.shard_remote = shard_remote if shard_remote is not None else os.getenv('GIT_SHARD_REMOTE', '')
+
+        # 推送失败的分片，下次同步时即使没有新提交也重新推送
+        self._unpushed = set()
+
+        # 本次运行中已检查过的分片
+        self._ready = set()
+
+    def _git(self, shard, *args, input=None):
+        command = ['git']
+        if shard is not None:
+            command += [f'--git-dir={self._git_dir(shard)}', f'--work-tree={self.work_tree}']
+        process = subprocess.run(
+            command + list(args), cwd=self.work_tree, input=input, capture_output=True
+        )
+        return process.returncode, process.stdout.decode('utf-8', 'replace'), process.stderr.decode('utf-8', 'replace')
+
+    def _git_dir(self, shard):
+        return os.path.join(self.shard_dir, f'{shard}.git')
+
+    def _init_shard(self, shard):
+        """创建分片的git目录，并从工作目录的仓库复制提交者身份"""
+        if shard in self._ready:
+            return True
+        git_dir = self._git_dir(shard)
+        if not os.path.isdir(git_dir) and not self._create_shard(shard, git_dir):
+            return False
+        self._copy_identity(shard, git_dir)
+        self._ready.add(shard)
+        return True
+
+    def _create_shard(self, shard, git_dir):
+        os.makedirs(self.shard_dir, exist_ok=True)
+        commands = [
+            ['init', '--bare', '-q', git_dir],
+            ['--git-dir=' + git_dir, 'symbolic-ref', 'HEAD', f'refs/heads/{self.branch}'],
+            ['--git-dir=' + git_dir, 'config', 'core.bare', 'false'],
+            ['--git-dir=' + git_dir, 'config', 'status.showUntrackedFiles', 'no']
+        ]
+        if self.shard_remote:
+            commands.append(['--git-dir=' + git_dir, 'remote', 'add', 'origin', self.shard_remote.format(month=shard)])
+        for args in commands:
+            code, _, err = self._git(None, *args)
+            if code != 0:
+                logger.error(f'创建分片 {shard} 失败: git {" ".join(args)}\n{err}')
+                return False
+        logger.info(f'已创建分片仓库: {git_dir}')
+        return True
+
+    def _copy_identity(self, shard, git_dir):
+        """分片没有提交者身份时使用工作目录仓库的 user.name 和 user.email，
+        没有全局git身份的主机上分片也能提交"""
+        for key in ('user.name', 'user.email'):
+            code, _, _ = self._git(None, '--git-dir=' + git_dir, 'config', '--get', key)
+            if code == 0:
+                continue
+            code, value, _ = self._git(None, 'config', '--get', key)
+            if code != 0 or not value.strip():
+                logger.warning(f'工作目录的仓库没有设置 {key}，分片 {shard} 可能无法提交')
+                continue
+            self._git(None, '--git-dir=' + git_dir, 'config', key, value.strip())
+
+    def _shard_of(self, rel_path):
+        match = _MONTH_RE.search(rel_path)
+        if match:
+            return match.group(1)
+        return time.strftime('%Y-%m', time.localtime(os.path.getmtime(os.path.join(self.work_tree, rel_path))))
+
+    def _relpath(self, path):
+        return os.path.relpath(os.path.abspath(path), self.work_tree).replace('\\', '/')
+
+    def _group(self, paths):
+        """把文件按分片分组，只保留工作目录中存在的数据文件
+
+        Args:
+            paths: 文件路径，或 (文件路径, 引用它的数据文件路径)
+
+        Returns:
+            dict: 分片（不分片时为None）到相对路径列表的映射
+        """
+        groups = {}
+        for item in paths:
+            path, ref = item if isinstance(item, tuple) else (item, None)
+            rel_path = self._relpath(path)
+            if rel_path.startswith('../') or not rel_path.endswith(SYNC_SUFFIXES):
+                continue
+            if not os.path.isfile(os.path.join(self.work_tree, rel_path)):
+                logger.debug(f'文件已不存在，跳过: {rel_path}')
+                continue
+
+            shard = None
+            if self.shard_by_month:
+                rel_ref = self._relpath(ref) if ref else None
+                # 被引用的文件归属引用方所在的月份
+                shard = self._shard_of(rel_ref if rel_ref and _MONTH_RE.search(rel_ref) else rel_path)
+            groups.setdefault(shard, {})[rel_path] = None
+        return {shard: list(rel_paths) for shard, rel_paths in groups.items()}
+
+    def sync(self, paths, message=None):
+        """暂存、提交并推送指定的文件
+
+        文件列表通过标准输入传给 git add --pathspec-from-file，不受命令行长度限制，
+        git也只检查这些文件，不扫描整个数据目录。
+
+        Args:
+            paths: 文件路径列表，被引用的文件可以是 (文件路径, 引用它的数据文件路径)
+            message: 提交信息
+
+        Returns:
+            bool: 全部分片都提交并推送成功时为True；推送失败的分片下次同步时即使没有新提交也会重新推送
+        """
+        message = message or f'自动更新: {datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")}'
+        success = True
+        committed = set()
+
+        for shard, rel_paths in sorted(self._group(paths).items(), key=lambda item: item[0] or ''):
+            name = shard or '主仓库'
+            if shard is not None and not self._init_shard(shard):
+                success = False
+                continue
+
+            code, _, err = self._git(
+                shard, 'add', '--pathspec-from-file=-', '--pathspec-file-nul',
+                input=''.join(f'{path}\0' for path in rel_paths).encode('utf-8')
+            )
+            if code != 0:
+                logger.error(f'{name} 暂存文件失败: {err}')
+                success = False
+                continue
+
+            # 暂存区与HEAD相同（文件没有变化）时不提交
+            code, _, _ = self._git(shard, 'diff', '--cached', '--quiet')
+            if code == 0:
+                continue
+            code, _, err = self._git(shard, 'commit', '-q', '--no-status', '-m', message)
+            if code != 0:
+                logger.error(f'{name} 提交失败: {err}')
+                success = False
+                continue
+            logger.info(f'{name} 已提交 {len(rel_paths)} 个文件')
+            committed.add(shard)
+
+        for shard in sorted(committed | self._unpushed, key=lambda shard: shard or ''):
+            if not self._push(shard):
+                success = False
+        return success
+
+    def _push(self, shard):
+        name = shard or '主仓库'
+        if shard is not None and not self.shard_remote:
+            return True
+        remote = 'origin' if shard is not None else self.remote
+
+        # git push 默认就是thin pack，只发送远端没有的对象
+        code, _, err = self._git(shard, 'push', '-q', remote, f'HEAD:refs/heads/{self.branch}')
+        if code != 0:
+            logger.error(f'{name} 推送失败，下次同步时重试: {err}')
+            self._unpushed.add(shard)
+            return False
+        self._unpushed.discard(shard)
+        return True
+
+    def sync_pending(self, write_log=None):
+        """同步写入记录中的文件，成功后清除这些记录
+
+        Returns:
+            int: 同步的文件数
+
+        Raises:
+            RuntimeError: 提交或推送失败，记录保留到下次同步
+        """
+        write_log = write_log or WriteLog()
+        batch, paths = write_log.take()
+        if not self.sync(paths):
+            raise RuntimeError(f'{len(paths)} 个文件的提交或推送失败，下次同步时重试')
+        write_log.done(batch)
+        return len(paths)
+
+
+def iter_data_files(data_dir='data'):
+    """遍历数据目录中需要同步的文件"""
+    for root, dirs, files in os.walk(data_dir):
+        dirs.sort()
+        for file in sorted(files):
+            if file.endswith(SYNC_SUFFIXES):
+                yield os.path.join(root, file)
+
+
+def main():
+    """命令行入口"""
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+
+    parser = argparse.ArgumentParser(description='用git增量同步采集的数据文件')
+    parser.add_argument('--all', action='store_true', help='同步数据目录中的全部文件，而不只是写入记录中的文件')
+    parser.add_argument('--data-dir', default='data', help='数据根目录，与 --all 一起使用')
+    args = parser.parse_args()
+
+    syncer = GitSync()
+    if args.all:
+        return 0 if syncer.sync(list(iter_data_files(args.data_dir))) else 1
+    try:
+        syncer.sync_pending()
+    except RuntimeError as e:
+        logger.error(str(e))
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
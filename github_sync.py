@@ -12,22 +12,107 @@ import base64
 import requests
 import logging
 import datetime
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from dotenv import load_dotenv
-
-# 配置日志
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler("github_sync.log"),
-        logging.StreamHandler()
-    ]
-)
+from sync_manifest import SyncManifest
+from rate_limit import GitHubRateLimiter, RateLimitExceeded
 
 logger = logging.getLogger(__name__)
 
-# 加载环境变量
-load_dotenv()
+# 单个tree请求中最多包含的文件数，超过时分多次创建并以前一个tree为基础
+TREE_CHUNK_SIZE = 500
+
+# 分支在提交过程中被其他人更新时的最大重试次数
+MAX_REF_RETRIES = 3
+
+# GitHub拒绝超过100MB的文件
+GITHUB_FILE_LIMIT = 100 * 1024 * 1024
+
+# 每次读取并编码的原始字节数，是3的倍数，分块编码的结果可以直接拼接
+ENCODE_CHUNK_SIZE = 3 * 64 * 1024
+
+
+class Base64JsonBody:
+    """把文件内容以base64流式写入JSON请求体的只读文件对象
+    
+    请求体为 fields 序列化后的JSON对象，再加上 key 字段，值是文件内容的base64编码。
+    文件按块读取和编码，内存占用与文件大小无关；长度可以预先算出，requests据此设置Content-Length。
+    限流重试前通过 seek(0) 回到开头重新发送。
+    """
+    
+    def __init__(self, path, fields, key='content'):
+        """初始化请求体
+        
+        Args:
+            path: 本地文件路径
+            fields: 其他JSON字段
+            key: 存放base64内容的字段名
+        """
+        self.path = path
+        head = json.dumps(fields, ensure_ascii=False)[:-1]
+        self._prefix = f'{head}{", " if fields else ""}"{key}": "'.encode('utf-8')
+        self._suffix = b'"}'
+        size = os.path.getsize(path)
+        self._length = len(self._prefix) + (size + 2) // 3 * 4 + len(self._suffix)
+        self._file = None
+        self.seek(0)
+    
+    def __len__(self):
+        return self._length
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *exc_info):
+        self.close()
+    
+    def _pieces(self):
+        yield self._prefix
+        with open(self.path, 'rb') as f:
+            self._file = f
+            for chunk in iter(lambda: f.read(ENCODE_CHUNK_SIZE), b''):
+                yield base64.b64encode(chunk)
+        self._file = None
+        yield self._suffix
+    
+    def read(self, size=-1):
+        """读取请求体
+        
+        Args:
+            size: 最多读取的字节数，负数表示读取全部
+            
+        Returns:
+            bytes: 请求体内容，读完时为空
+        """
+        while size < 0 or len(self._buffer) < size:
+            piece = next(self._iterator, None)
+            if piece is None:
+                break
+            self._buffer += piece
+        if size < 0:
+            size = len(self._buffer)
+        data = bytes(self._buffer[:size])
+        del self._buffer[:size]
+        self._position += len(data)
+        return data
+    
+    def tell(self):
+        return self._position
+    
+    def seek(self, offset, whence=0):
+        """只支持回到开头"""
+        if offset != 0 or whence != 0:
+            raise OSError('Base64JsonBody只支持 seek(0)')
+        self.close()
+        self._iterator = self._pieces()
+        self._buffer = bytearray()
+        self._position = 0
+        return 0
+    
+    def close(self):
+        iterator = getattr(self, '_iterator', None)
+        if iterator is not None:
+            iterator.close()
 
 class GitHubSync:
     """GitHub同步工具类"""
@@ -41,69 +126,228 @@ class GitHubSync:
             logger.error('GitHub配置不完整，请检查.env文件')
             raise ValueError('GitHub配置不完整')
             
-        self.api_url = f'https://api.github.com/repos/{self.repo}/contents'
+        # GITHUB_API_URL可以指向本地的 fake_github.py，用于离线测试
+        api_base = os.getenv('GITHUB_API_URL', 'https://api.github.com').rstrip('/')
+        self.repo_url = f'{api_base}/repos/{self.repo}'
+        self.api_url = f'{self.repo_url}/contents'
+        self.branch = os.getenv('GITHUB_BRANCH', 'main')
         self.headers = {
             'Authorization': f'token {self.token}',
             'Accept': 'application/vnd.github.v3+json'
         }
         
+        # batch: 所有变化的文件合成一次提交（Git Data API）；contents: 每个文件单独提交
+        self.mode = os.getenv('GITHUB_SYNC_MODE', 'batch')
+        self.workers = int(os.getenv('GITHUB_SYNC_WORKERS', '8'))
+        
+        # 超过该大小的文件改用blob API上传
+        self.contents_max_bytes = int(float(os.getenv('GITHUB_CONTENTS_MAX_MB', '1')) * 1024 * 1024)
+        self.session = requests.Session()
+        self.session.headers.update(self.headers)
+        
+        # 按GitHub返回的限流头调整并发数，被限流时暂停所有请求
+        self.limiter = GitHubRateLimiter(self.workers)
+        
+        # 已上传文件的blob SHA，只上传有变化的文件
+        self.manifest = SyncManifest(self.repo)
+        
         logger.info(f'GitHub同步工具初始化完成，仓库: {self.repo}')
     
-    def upload_file(self, local_path, repo_path):
+    def upload_file(self, local_path, repo_path, remote_sha=None):
         """上传文件到GitHub
         
         Args:
             local_path: 本地文件路径
             repo_path: 仓库中的路径
+            remote_sha: 远端文件当前的SHA，已知时不再查询远端
             
         Returns:
-            bool: 是否上传成功
+            str: 上传后远端文件的SHA，失败时为None
         """
         try:
-            # 读取文件内容
-            with open(local_path, 'r', encoding='utf-8') as f:
-                content = f.read()
+            message = f'更新文件: {repo_path} - {datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")}'
+            size = os.path.getsize(local_path)
+            if size > GITHUB_FILE_LIMIT:
+                logger.error(f'文件超过GitHub的100MB限制，跳过: {local_path}')
+                return None
                 
-            # 检查文件是否已存在
-            file_exists = False
-            file_sha = None
+            # 大文件用blob API上传，单独提交
+            if size > self.contents_max_bytes:
+                logger.info(f'文件较大（{size} 字节），改用blob API上传: {repo_path}')
+                return self.commit_files([(local_path, repo_path, None)], message)[repo_path]
+                
+            # 清单中没有记录时检查文件是否已存在
+            file_sha = remote_sha
+            if file_sha is None:
+                file_sha = self._get_remote_sha(repo_path)
             
-            try:
-                response = requests.get(f'{self.api_url}/{repo_path}', headers=self.headers)
-                if response.status_code == 200:
-                    file_exists = True
-                    file_sha = response.json()['sha']
-            except Exception as e:
-                logger.debug(f'检查文件存在时出错: {str(e)}')
-            
-            # 准备请求数据
-            data = {
-                'message': f'更新文件: {repo_path} - {datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")}',
-                'content': base64.b64encode(content.encode('utf-8')).decode('utf-8')
-            }
-            
-            if file_exists:
-                data['sha'] = file_sha
+            # 准备请求数据，文件内容按字节读取并流式编码，二进制文件也可以上传
+            fields = {'message': message}
+            if file_sha:
+                fields['sha'] = file_sha
                 logger.info(f'更新文件: {repo_path}')
             else:
                 logger.info(f'创建文件: {repo_path}')
             
             # 发送请求
-            response = requests.put(f'{self.api_url}/{repo_path}', headers=self.headers, json=data)
+            with Base64JsonBody(local_path, fields) as body:
+                response = self._request(
+                    'PUT', f'{self.api_url}/{repo_path}', data=body, headers={'Content-Type': 'application/json'}
+                )
+            
+            # 清单中的SHA已过期（远端文件被其他方式修改过），重新查询后再试一次
+            if response.status_code in [409, 422] and remote_sha is not None:
+                logger.warning(f'远端文件已变化，重新查询: {repo_path}')
+                return self.upload_file(local_path, repo_path)
             
             if response.status_code in [200, 201]:
                 logger.info(f'成功上传文件: {repo_path}')
-                return True
+                return response.json()['content']['sha']
             else:
                 logger.error(f'上传文件失败: {repo_path}, 状态码: {response.status_code}, 响应: {response.text}')
-                return False
+                return None
                 
+        except RateLimitExceeded:
+            raise
         except Exception as e:
             logger.error(f'上传文件异常: {local_path} -> {repo_path}, 错误: {str(e)}')
-            return False
+            return None
+    
+    def _get_remote_sha(self, repo_path):
+        """查询远端文件的SHA，文件不存在时为None"""
+        try:
+            response = self._request('GET', f'{self.api_url}/{repo_path}')
+            if response.status_code == 200:
+                return response.json()['sha']
+        except RateLimitExceeded:
+            raise
+        except Exception as e:
+            logger.debug(f'检查文件存在时出错: {str(e)}')
+        return None
+    
+    def _request(self, method, url, **kwargs):
+        """经过限流器发送请求"""
+        return self.limiter.request(self.session, method, url, **kwargs)
+    
+    def _git(self, method, path, **kwargs):
+        """调用Git Data API，失败时抛出异常"""
+        response = self._request(method, f'{self.repo_url}/git/{path}', **kwargs)
+        if response.status_code >= 400:
+            raise requests.HTTPError(
+                f'{method} git/{path} 失败, 状态码: {response.status_code}, 响应: {response.text}', response=response
+            )
+        return response.json()
+    
+    def _create_blob(self, local_path):
+        with Base64JsonBody(local_path, {'encoding': 'base64'}) as body:
+            return self._git('POST', 'blobs', data=body, headers={'Content-Type': 'application/json'})['sha']
+    
+    def commit_files(self, files, message=None):
+        """用Git Data API把多个文件合成一次提交
+        
+        并发创建blob，再创建tree、commit并更新分支引用。分支在此期间被更新时，
+        以新的分支头为基础重新创建tree和commit，已创建的blob不需要重新上传。
+        创建的blob随时记录在清单中，同步中断（例如限流）后再次调用时只上传剩下的文件。
+        
+        Args:
+            files: (本地路径, 仓库路径, 本地blob SHA) 元组列表，SHA未知时为None
+            message: 提交信息
+            
+        Returns:
+            dict: 仓库路径到blob SHA的映射
+            
+        Raises:
+            requests.HTTPError: API请求失败
+            RateLimitExceeded: 限流需要等待的时间过长
+        """
+        if not files:
+            return {}
+            
+        message = message or f'自动更新: {len(files)} 个文件 - {datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")}'
+        
+        # 上次中断前已经创建的blob直接使用
+        blobs = {}
+        pending = []
+        for local_path, repo_path, sha in files:
+            if sha and self.manifest.uploaded_sha(repo_path) == sha:
+                blobs[repo_path] = sha
+            else:
+                pending.append((local_path, repo_path))
+        if blobs:
+            logger.info(f'{len(blobs)} 个文件的blob已在上次同步中创建')
+        
+        # 并发创建blob，并发数由限流器控制
+        error = None
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            futures = {executor.submit(self._create_blob, local_path): repo_path for local_path, repo_path in pending}
+            for future in as_completed(futures):
+                try:
+                    sha = future.result()
+                except Exception as e:
+                    error = error or e
+                    continue
+                repo_path = futures[future]
+                blobs[repo_path] = sha
+                self.manifest.mark_uploaded(repo_path, sha)
+                if len(blobs) % 50 == 0:
+                    self.manifest.save()
+        if error is not None:
+            logger.warning(f'已创建 {len(blobs)}/{len(files)} 个blob，下次同步时继续')
+            raise error
+        logger.info(f'已创建 {len(pending)} 个blob')
+        
+        entries = [
+            {'path': repo_path, 'mode': '100644', 'type': 'blob', 'sha': sha}
+            for repo_path, sha in blobs.items()
+        ]
+        
+        for attempt in range(MAX_REF_RETRIES):
+            head = self._branch_head()
+            tree = self._git('GET', f'commits/{head}')['tree']['sha'] if head else None
+            
+            # 在当前分支头的tree上叠加变化的文件
+            for start in range(0, len(entries), TREE_CHUNK_SIZE):
+                data = {'tree': entries[start:start + TREE_CHUNK_SIZE]}
+                if tree:
+                    data['base_tree'] = tree
+                try:
+                    tree = self._git('POST', 'trees', json=data)['sha']
+                except requests.HTTPError as e:
+                    # 长时间没有提交的blob可能已被远端清理，下次同步时重新上传
+                    if e.response is not None and e.response.status_code == 422:
+                        self.manifest.forget_uploaded()
+                    raise
+                
+            commit = self._git('POST', 'commits', json={
+                'message': message, 'tree': tree, 'parents': [head] if head else []
+            })['sha']
+            
+            try:
+                if head:
+                    self._git('PATCH', f'refs/heads/{self.branch}', json={'sha': commit, 'force': False})
+                else:
+                    self._git('POST', 'refs', json={'ref': f'refs/heads/{self.branch}', 'sha': commit})
+            except requests.HTTPError as e:
+                # 分支已被其他提交更新（不是快进）或已被创建，以新的分支头为基础重新提交
+                if e.response is not None and e.response.status_code == 422 and attempt + 1 < MAX_REF_RETRIES:
+                    logger.warning(f'分支 {self.branch} 已被更新，重新提交')
+                    continue
+                raise
+                
+            logger.info(f'已提交 {len(blobs)} 个文件到 {self.branch}: {commit}')
+            return blobs
+    
+    def _branch_head(self):
+        """分支当前指向的提交SHA，分支不存在时为None"""
+        try:
+            return self._git('GET', f'ref/heads/{self.branch}')['object']['sha']
+        except requests.HTTPError as e:
+            if e.response is not None and e.response.status_code == 404:
+                return None
+            raise
     
     def sync_directory(self, local_dir, repo_dir=''):
-        """同步整个目录到GitHub
+        """同步整个目录到GitHub，只上传与清单记录不同的文件
         
         Args:
             local_dir: 本地目录路径
@@ -116,12 +360,13 @@ class GitHubSync:
             logger.error(f'本地目录不存在: {local_dir}')
             return 0
             
-        success_count = 0
+        changed_files = []
+        unchanged_count = 0
         
         for root, dirs, files in os.walk(local_dir):
             for file in files:
-                # 只同步JSON和CSV文件
-                if not (file.endswith('.json') or file.endswith('.csv')):
+                # 只同步文章数据文件、压缩正文和压缩字典
+                if not file.endswith(('.json', '.jsonl', '.csv', '.body', '.dict')):
                     continue
                     
                 local_path = os.path.join(root, file)
@@ -133,15 +378,81 @@ class GitHubSync:
                 else:
                     repo_path = rel_path.replace('\\', '/')
                 
-                # 上传文件
-                if self.upload_file(local_path, repo_path):
-                    success_count += 1
+                # 内容与上次上传的一致时跳过
+                changed, local_sha, stat = self.manifest.changed(local_path, repo_path)
+                if not changed:
+                    self.manifest.record(repo_path, local_sha, stat)
+                    unchanged_count += 1
+                    continue
+                changed_files.append((local_path, repo_path, local_sha, stat))
+                
+        try:
+            if self.mode == 'batch':
+                success_count = self._sync_batch(changed_files)
+            else:
+                success_count = self._sync_each(changed_files)
+        finally:
+            self.manifest.save()
         
-        logger.info(f'成功同步 {success_count} 个文件到GitHub')
+        logger.info(f'成功同步 {success_count} 个文件到GitHub，{unchanged_count} 个文件没有变化')
+        return success_count
+    
+    def _sync_batch(self, changed_files):
+        try:
+            blobs = self.commit_files([
+                (local_path, repo_path, local_sha) for local_path, repo_path, local_sha, _ in changed_files
+            ])
+        except RateLimitExceeded as e:
+            logger.warning(f'{str(e)}，停止本次同步，下次同步时从中断处继续')
+            return 0
+        except requests.HTTPError as e:
+            # 空仓库不支持Git Data API，先用contents API逐个上传，创建出第一个提交
+            if e.response is not None and e.response.status_code == 409:
+                logger.warning('仓库为空，改为逐个文件上传')
+                return self._sync_each(changed_files)
+            logger.error(f'批量提交失败: {str(e)}')
+            return 0
+        except Exception as e:
+            logger.error(f'批量提交异常: {str(e)}')
+            return 0
+            
+        for _, repo_path, _, stat in changed_files:
+            self.manifest.record(repo_path, blobs[repo_path], stat)
+        return len(blobs)
+    
+    def _sync_each(self, changed_files):
+        # contents API的每次上传都是一次提交，同一分支上并发提交会互相冲突，因此逐个上传
+        success_count = 0
+        for local_path, repo_path, _, stat in changed_files:
+            try:
+                remote_sha = self.upload_file(local_path, repo_path, self.manifest.remote_sha(repo_path))
+            except RateLimitExceeded as e:
+                logger.warning(f'{str(e)}，停止本次同步，下次同步时从中断处继续')
+                break
+            if remote_sha:
+                self.manifest.record(repo_path, remote_sha, stat)
+                success_count += 1
+                
+                # 定期保存清单，中途退出后已上传的文件不会重复上传
+                if success_count % 50 == 0:
+                    self.manifest.save()
         return success_count
 
 def main():
     """主函数"""
+    # 配置日志
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+        handlers=[
+            logging.FileHandler("github_sync.log"),
+            logging.StreamHandler()
+        ]
+    )
+    
+    # 加载环境变量
+    load_dotenv()
+    
     try:
         # 初始化同步工具
         syncer = GitHubSync()
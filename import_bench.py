@@ -0,0 +1,121 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+导入耗时基准
+在全新的解释器中分别导入各个模块，统计导入耗时，并检查导入时是否加载了较重的依赖或产生了副作用
+"""
+
+import os
+import sys
+import json
+import argparse
+import tempfile
+import subprocess
+import statistics
+
+# 默认测量的模块
+DEFAULT_MODULES = ['news_scraper', 'scheduler', 'github_sync', 'git_sync', 'fetch_engine', 'storage']
+
+# 只应在第一次使用时导入的依赖
+HEAVY_MODULES = ['newspaper', 'pygooglenews', 'feedparser', 'pandas', 'pyarrow', 'dateparser', 'nltk']
+
+# 子进程在导入模块前写到标准错误的标记，之前的输出是解释器启动时的导入
+_MARKER = '-- import_bench --'
+
+# 子进程中执行的测量代码
+_PROBE = '''
+import sys, json, time
+sys.stderr.write('{marker}\\n')
+sys.stderr.flush()
+start = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - start
+print(json.dumps({{'ms': elapsed * 1000, 'heavy': [name for name in {heavy!r} if name in sys.modules]}}))
+'''
+
+
+def _slowest_imports(stderr, top):
+    """解析 -X importtime 的输出，返回累计耗时最长的顶层导入，不包括解释器启动时的导入"""
+    rows = []
+    for line in stderr.split(_MARKER, 1)[-1].splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = [part.strip() for part in line[len('import time:'):].split('|')]
+        if not name.startswith(' '):
+            rows.append((int(cumulative), name.strip()))
+    return sorted(rows, reverse=True)[:top]
+
+
+def measure(module, repeat=5, top=5):
+    """在全新的解释器中多次导入模块
+
+    子进程在空的临时目录中运行，导入后目录中出现任何文件都视为副作用。
+
+    Args:
+        module: 模块名
+        repeat: 重复次数
+        top: 返回累计耗时最长的几个顶层导入
+
+    Returns:
+        dict: 耗时中位数和最小值（毫秒）、导入的重依赖、产生的文件和最慢的顶层导入
+    """
+    root = os.path.dirname(os.path.abspath(__file__))
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [root, os.environ.get('PYTHONPATH')])))
+    probe = _PROBE.format(module=module, heavy=HEAVY_MODULES, marker=_MARKER)
+
+    times = []
+    result = None
+    for _ in range(repeat):
+        with tempfile.TemporaryDirectory() as cwd:
+            process = subprocess.run(
+                [sys.executable, '-X', 'importtime', '-c', probe], cwd=cwd, env=env, capture_output=True, text=True
+            )
+            if process.returncode != 0:
+                raise RuntimeError(f'导入 {module} 失败:\n{process.stderr[-2000:]}')
+            result = json.loads(process.stdout.strip().splitlines()[-1])
+            result['files'] = sorted(os.listdir(cwd))
+            result['slowest'] = _slowest_imports(process.stderr, top)
+            times.append(result['ms'])
+
+    result['ms'] = statistics.median(times)
+    result['min_ms'] = min(times)
+    return result
+
+
+def main():
+    """命令行入口"""
+    parser = argparse.ArgumentParser(description='测量模块的冷启动导入耗时')
+    parser.add_argument('modules', nargs='*', default=DEFAULT_MODULES, help='要测量的模块')
+    parser.add_argument('--repeat', type=int, default=5, help='每个模块重复测量的次数')
+    parser.add_argument('--budget-ms', type=float, default=0, help='导入耗时中位数的上限（毫秒），超过时返回非零，0表示不检查')
+    parser.add_argument('--top', type=int, default=5, help='列出累计耗时最长的几个顶层导入')
+    parser.add_argument('--json', action='store_true', help='以JSON格式输出结果')
+    args = parser.parse_args()
+
+    results = {module: measure(module, args.repeat, args.top) for module in args.modules}
+    failed = False
+    for module, result in results.items():
+        problems = []
+        if result['heavy']:
+            problems.append(f'导入了 {", ".join(result["heavy"])}')
+        if result['files']:
+            problems.append(f'创建了 {", ".join(result["files"])}')
+        if args.budget_ms and result['ms'] > args.budget_ms:
+            problems.append(f'超过 {args.budget_ms:.0f} 毫秒')
+        result['problems'] = problems
+        failed = failed or bool(problems)
+
+        if not args.json:
+            print(f'{module:<16} 中位数 {result["ms"]:7.1f} 毫秒  最小 {result["min_ms"]:7.1f} 毫秒'
+                  + (f'  问题: {"；".join(problems)}' if problems else ''))
+            for cumulative, name in result['slowest']:
+                print(f'    {cumulative / 1000:7.1f} 毫秒  {name}')
+
+    if args.json:
+        print(json.dumps(results, ensure_ascii=False, indent=4))
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,124 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+定时任务运行器
+在后台线程中运行定时任务，同一任务不会重叠运行，下一次运行时间从任务实际结束时开始计算
+"""
+
+import time
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+
+class _Job:
+    """单个定时任务的状态"""
+
+    __slots__ = ('name', 'func', 'interval', 'next_run', 'thread', 'last_start', 'last_finish')
+
+    def __init__(self, name, func, interval, next_run):
+        self.name = name
+        self.func = func
+        self.interval = interval
+        self.next_run = next_run
+        self.thread = None
+        self.last_start = None
+        self.last_finish = None
+
+
+class JobRunner:
+    """不阻塞的定时任务运行器
+
+    每个任务在独立的后台线程中运行，主循环只负责检查到期时间：
+    - 同一任务同时只有一次运行，运行期间到期的触发直接跳过
+    - 任务停滞期间错过的多次运行合并为一次
+    - 下一次运行时间 = 本次实际结束时间 + 间隔，运行时间超过间隔也不会连续堆积
+    """
+
+    def __init__(self):
+        self._jobs = {}
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+
+    def add(self, name, func, interval, run_now=True):
+        """添加定时任务
+
+        Args:
+            name: 任务名称
+            func: 无参数的任务函数
+            interval: 两次运行之间的间隔（秒），从上一次结束时开始计算
+            run_now: 是否在下一次检查时立即运行
+        """
+        next_run = time.monotonic() if run_now else time.monotonic() + interval
+        with self._lock:
+            self._jobs[name] = _Job(name, func, interval, next_run)
+
+    def run_pending(self, now=None):
+        """启动所有已到期且没有在运行的任务
+
+        Returns:
+            list: 本次启动的任务名称
+        """
+        now = now or time.monotonic()
+        started = []
+        with self._lock:
+            for job in self._jobs.values():
+                if job.thread is not None or job.next_run > now:
+                    continue
+
+                missed = int((now - job.next_run) // job.interval) if job.interval else 0
+                if missed:
+                    logger.warning(f'任务 {job.name} 错过了 {missed} 次运行，合并为一次')
+
+                job.last_start = now
+                job.thread = threading.Thread(target=self._run, args=(job,), name=f'job-{job.name}', daemon=True)
+                job.thread.start()
+                started.append(job.name)
+        return started
+
+    def _run(self, job):
+        try:
+            job.func()
+        except Exception as e:
+            logger.error(f'任务 {job.name} 执行失败: {str(e)}')
+        finally:
+            finish = time.monotonic()
+            with self._lock:
+                job.thread = None
+                job.last_finish = finish
+                job.next_run = finish + job.interval
+
+            # 下一次运行从结束时开始计算，运行时间长不会造成堆积，只作为调试信息
+            elapsed = finish - job.last_start
+            if elapsed > job.interval:
+                logger.debug(f'任务 {job.name} 运行了 {elapsed:.0f} 秒，超过间隔 {job.interval:.0f} 秒')
+
+    def run_forever(self, tick=1):
+        """循环检查并启动到期任务，直到调用 stop()
+
+        Args:
+            tick: 检查间隔（秒）
+        """
+        while not self._stopped.is_set():
+            self.run_pending()
+            self._stopped.wait(tick)
+
+    def stop(self, wait=True, timeout=None):
+        """停止检查新的任务，并等待正在运行的任务结束
+
+        Args:
+            wait: 是否等待正在运行的任务
+            timeout: 最长等待秒数，None表示一直等待
+        """
+        self._stopped.set()
+        if not wait:
+            return
+
+        with self._lock:
+            threads = [job.thread for job in self._jobs.values() if job.thread is not None]
+        deadline = None if timeout is None else time.monotonic() + timeout
+        for thread in threads:
+            remaining = None if deadline is None else max(0, deadline - time.monotonic())
+            thread.join(remaining)
@@ -7,36 +7,143 @@
 """
 
 import os
-import json
+import time
+import itertools
+import collections
+import calendar
 import datetime
-import feedparser
-import newspaper
-from newspaper import Article
-import requests
-from pygooglenews import GoogleNews
+import functools
 from dotenv import load_dotenv
-import pandas as pd
-import time
 import logging
-
-# 配置日志
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler("scraper.log"),
-        logging.StreamHandler()
-    ]
-)
+from fetch_engine import FetchEngine
+from feed_cache import FeedValidatorStore
+from url_index import SeenUrlIndex, RedirectCache, canonicalize_url, content_hash
+from storage import ArticleSink, JsonlSink
+from run_journal import RunJournal
+from write_log import WriteLog
+from article_db import ArticleDatabase
+from body_store import BodyStore
 
 logger = logging.getLogger(__name__)
 
-# 加载环境变量
-load_dotenv()
-
-# 创建数据目录
+# 数据目录
 data_dir = 'data'
-os.makedirs(data_dir, exist_ok=True)
+
+def init(log_file='scraper.log'):
+    """配置日志、加载环境变量并创建数据目录
+    
+    导入本模块时不做这些事，命令行入口和 scheduler.init() 会调用它，作为库使用时按需调用。
+    
+    Args:
+        log_file: 日志文件路径
+    """
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+        handlers=[
+            logging.FileHandler(log_file),
+            logging.StreamHandler()
+        ]
+    )
+    load_dotenv()
+    os.makedirs(data_dir, exist_ok=True)
+
+def _entry_times(entries):
+    """提取RSS条目的发布时间戳（UTC秒），无法解析的条目忽略"""
+    times = []
+    for entry in entries:
+        parsed = entry.get('published_parsed') or entry.get('updated_parsed')
+        if parsed:
+            times.append(calendar.timegm(parsed))
+    return times
+
+# 预定义的新闻源配置
+PREDEFINED_SOURCES = {
+    'cnn': {
+        'link': 'http://edition.cnn.com/',
+        'rss': 'http://rss.cnn.com/rss/edition.rss'
+    },
+    'bbc': {
+        'link': 'http://www.bbc.com/',
+        'rss': 'http://feeds.bbci.co.uk/news/rss.xml'
+    },
+    'theguardian': {
+        'link': 'https://www.theguardian.com/international',
+        'rss': 'https://www.theguardian.com/international/rss'
+    },
+    'xinhua': {
+        'link': 'http://www.xinhuanet.com/',
+        'rss': 'http://www.xinhuanet.com/english/rss/chinarss.xml'
+    }
+}
+
+# Google News的主题采集任务，可以添加更多主题
+GOOGLE_NEWS_TOPICS = ['business', 'technology', 'health']
+
+def configured_sources():
+    """按环境变量NEWS_SOURCES从预定义的新闻源中选出要采集的新闻源
+    
+    Returns:
+        tuple: (新闻源名称到配置的映射, 未知的新闻源名称列表)
+    """
+    sources = {}
+    unknown = []
+    for source in os.getenv('NEWS_SOURCES', 'cnn,bbc,theguardian').split(','):
+        source = source.strip()
+        if source in PREDEFINED_SOURCES:
+            sources[source] = PREDEFINED_SOURCES[source]
+        else:
+            unknown.append(source)
+    return sources, unknown
+
+def _job_names(news_sources, topics):
+    names = []
+    for source_name, source_info in news_sources.items():
+        if 'rss' in source_info:
+            names.append(source_name)
+        else:
+            logger.warning(f'{source_name} 没有配置RSS源')
+            
+    names.append('google_news_top')
+    names.extend(f'google_news_{topic}' for topic in topics)
+    return names
+
+def job_names():
+    """根据配置返回全部采集任务的名称，与 NewsScraperAutomation.job_names() 一致
+    
+    只读取环境变量，不创建抓取引擎、数据库连接等资源，调度器检查到期来源时使用。
+    """
+    return _job_names(configured_sources()[0], GOOGLE_NEWS_TOPICS)
+
+def _in_order(indexed_articles):
+    """将 (下标, 文章) 按下标排序后返回文章列表"""
+    return [article for _, article in sorted(indexed_articles, key=lambda item: item[0])]
+
+@functools.lru_cache(maxsize=None)
+def _pooled_google_news_class():
+    """返回通过抓取引擎连接池请求Google News RSS的GoogleNews子类，第一次调用时才导入pygooglenews"""
+    import feedparser
+    from pygooglenews import GoogleNews
+    
+    class PooledGoogleNews(GoogleNews):
+        """通过抓取引擎的连接池请求Google News RSS"""
+        
+        def __init__(self, session, lang='en', country='US'):
+            super().__init__(lang=lang, country=country)
+            self.session = session
+            
+        def _GoogleNews__parse_feed(self, feed_url, proxies=None, scraping_bee=None):
+            if proxies or scraping_bee:
+                return super()._GoogleNews__parse_feed(feed_url, proxies=proxies, scraping_bee=scraping_bee)
+                
+            r = self.session.get(feed_url)
+            if 'https://news.google.com/rss/unsupported' in r.url:
+                raise Exception('This feed is not available')
+                
+            d = feedparser.parse(r.content, response_headers=dict(r.headers))
+            return dict((k, d[k]) for k in ('feed', 'entries'))
+            
+    return PooledGoogleNews
 
 class NewsScraperAutomation:
     """自动化新闻采集工具类"""
@@ -45,44 +152,208 @@ class NewsScraperAutomation:
         """初始化新闻采集器"""
         self.news_sources = {}
         self.load_news_sources()
-        self.gn = GoogleNews(lang='zh', country='CN')  # 可根据需要修改语言和国家
+        
+        # 所有采集方法共用的抓取引擎和连接池
+        self.engine = FetchEngine()
+        
+        # Google News客户端，第一次使用时才创建，见 gn
+        self._gn = None
+        
+        # RSS源的ETag/Last-Modified，用于条件请求
+        self.feed_validators = FeedValidatorStore()
+        
+        # 历次运行已采集过的文章URL
+        self.seen_urls = SeenUrlIndex()
+        
+        # Google News跳转链接到发布方URL的解析缓存
+        self.redirects = RedirectCache()
+        
+        # 写入过的数据文件，同步到GitHub时只提交这些文件
+        self.write_log = WriteLog()
+        
+        # 按内容哈希保存的压缩正文，文章记录中只保留text_hash，BODY_STORE=0时正文直接写在记录中
+        self.body_store = (
+            BodyStore(os.path.join(data_dir, 'bodies'), on_write=self.write_log.add)
+            if os.getenv('BODY_STORE', '1') != '0' else None
+        )
+        
+        # 带全文索引的文章库，ARTICLE_DB_PATH设为空时不写入
+        self.article_db = ArticleDatabase() if os.getenv('ARTICLE_DB_PATH', 'articles.db') else None
+        
+        # 单轮运行内按规范化URL缓存的文章内容，只在run()期间启用；
+        # 启用正文存储时缓存中只保留text_hash，最多保留RUN_CACHE_SIZE篇，超出后淘汰最久未使用的
+        self._run_contents = None
+        self.run_cache_size = int(os.getenv('RUN_CACHE_SIZE', '1000'))
+        
+        # 运行日志和从日志恢复的文章URL，只在run()期间启用
+        self._journal = None
+        self._resumed_urls = set()
+        
+        # Google News的主题采集任务
+        self.google_news_topics = list(GOOGLE_NEWS_TOPICS)
+        
+        # 单个来源的抓取总时长上限（秒），0表示不限制
+        self.source_budget = float(os.getenv('SOURCE_BUDGET', '300')) or None
+        
+        # 文章存储格式：jsonl为按天追加的JSON Lines文件，json为每次运行一个JSON和CSV文件
+        self.storage_format = os.getenv('STORAGE_FORMAT', 'jsonl')
+        if self.storage_format not in ('jsonl', 'json'):
+            logger.warning(f'未知的存储格式: {self.storage_format}，使用jsonl')
+            self.storage_format = 'jsonl'
+        
+    @property
+    def gn(self):
+        """Google News客户端，第一次使用时创建"""
+        if self._gn is None:
+            self._gn = _pooled_google_news_class()(self.engine.session, lang='zh', country='CN')  # 可根据需要修改语言和国家
+        return self._gn
         
     def load_news_sources(self):
         """从配置文件加载新闻源"""
-        # 从环境变量或配置文件加载新闻源
-        sources_str = os.getenv('NEWS_SOURCES', 'cnn,bbc,theguardian')
-        sources = sources_str.split(',')
-        
-        # 预定义的新闻源配置
-        predefined_sources = {
-            'cnn': {
-                'link': 'http://edition.cnn.com/',
-                'rss': 'http://rss.cnn.com/rss/edition.rss'
-            },
-            'bbc': {
-                'link': 'http://www.bbc.com/',
-                'rss': 'http://feeds.bbci.co.uk/news/rss.xml'
-            },
-            'theguardian': {
-                'link': 'https://www.theguardian.com/international',
-                'rss': 'https://www.theguardian.com/international/rss'
-            },
-            'xinhua': {
-                'link': 'http://www.xinhuanet.com/',
-                'rss': 'http://www.xinhuanet.com/english/rss/chinarss.xml'
-            }
-        }
-        
-        # 加载配置的新闻源
-        for source in sources:
-            source = source.strip()
-            if source in predefined_sources:
-                self.news_sources[source] = predefined_sources[source]
-            else:
-                logger.warning(f'未知的新闻源: {source}')
+        sources, unknown = configured_sources()
+        for source in unknown:
+            logger.warning(f'未知的新闻源: {source}')
+        self.news_sources.update(sources)
         
         logger.info(f'已加载 {len(self.news_sources)} 个新闻源')
     
+    def close(self):
+        """释放抓取引擎、URL索引、跳转缓存和文章库占用的资源"""
+        self.engine.close()
+        if self.body_store is not None:
+            self.body_store.wait_training()
+        self.seen_urls.close()
+        self.redirects.close()
+        if self.article_db is not None:
+            self.article_db.close()
+    
+    def _skip_seen(self, items, get_url=lambda item: item):
+        """过滤掉之前运行中已经采集过的条目
+        
+        Args:
+            items: 条目列表
+            get_url: 从条目中取出文章URL的函数
+            
+        Returns:
+            list: 尚未采集过的条目
+        """
+        unseen = [
+            item for item in items
+            if canonicalize_url(get_url(item)) not in self._resumed_urls
+            and (self._run_cached(get_url(item)) or not self.seen_urls.contains(get_url(item)))
+        ]
+        if len(unseen) < len(items):
+            logger.info(f'跳过 {len(items) - len(unseen)} 篇已采集过的文章')
+        return unseen
+    
+    def _resolve_links(self, urls):
+        """将跳转链接解析为发布方URL，优先使用缓存
+        
+        Args:
+            urls: 跳转链接列表
+            
+        Returns:
+            list: 与urls顺序一致的URL列表，解析失败时保留原链接
+        """
+        resolved = self.redirects.get_many(urls)
+        pending = list(dict.fromkeys(url for url in urls if url not in resolved))
+        
+        if pending:
+            logger.info(f'解析 {len(pending)} 个跳转链接，缓存命中 {len(urls) - len(pending)} 个')
+            results = self.engine.resolve_urls(pending)
+            new_pairs = [(url, target) for url, target in zip(pending, results) if target]
+            self.redirects.put_many(new_pairs)
+            resolved.update(new_pairs)
+            
+        return [resolved.get(url, url) for url in urls]
+    
+    def _run_cached(self, url):
+        """判断文章在本轮运行中是否已经抓取过"""
+        return self._run_contents is not None and canonicalize_url(url) in self._run_contents
+    
+    def _cache_content(self, key, content):
+        """把抓取结果放入本轮运行的缓存，正文转存到正文存储"""
+        if content is not None and content.get('text') and self.body_store is not None:
+            content = dict(content)
+            content['text_hash'] = self.body_store.put(content.pop('text'))
+        self._run_contents[key] = content
+        self._run_contents.move_to_end(key)
+        while len(self._run_contents) > self.run_cache_size:
+            self._run_contents.popitem(last=False)
+    
+    def _cached_content(self, key):
+        """从本轮运行的缓存中取出抓取结果，并从正文存储恢复正文"""
+        content = self._run_contents[key]
+        self._run_contents.move_to_end(key)
+        if content is not None and self.body_store is not None:
+            content = self.body_store.hydrate(content)
+        return content
+    
+    def _source_deadline(self):
+        """计算当前来源的抓取截止时间"""
+        return None if self.source_budget is None else time.monotonic() + self.source_budget
+    
+    def _iter_contents(self, urls, deadline=None):
+        """并发抓取文章内容，同一轮运行中每篇文章只下载一次
+        
+        多个Google News主题或RSS源中出现的同一篇文章，会复用第一次抓取的结果；
+        已从缓存中淘汰的文章在其他来源中按已采集过跳过。
+        
+        Args:
+            urls: 文章URL列表
+            deadline: 来源的抓取截止时间
+            
+        Yields:
+            tuple: (在urls中的下标, 文章内容)，按完成顺序产出，失败项的内容为None
+        """
+        if self._run_contents is None:
+            yield from self.engine.iter_articles(urls, deadline)
+            return
+            
+        keys = [canonicalize_url(url) for url in urls]
+        pending = {}
+        for index, key in enumerate(keys):
+            if key not in self._run_contents:
+                pending.setdefault(key, []).append(index)
+                
+        if len(pending) < len(urls):
+            logger.info(f'本轮运行中已抓取过 {len(urls) - len(pending)} 篇文章，直接复用')
+            
+        for index, key in enumerate(keys):
+            if key not in pending:
+                yield index, self._cached_content(key)
+                
+        pending_keys = list(pending)
+        for i, content in self.engine.iter_articles([urls[pending[key][0]] for key in pending_keys], deadline):
+            key = pending_keys[i]
+            self._cache_content(key, content)
+            # 同时以重定向后的最终地址登记，其他来源直接引用发布方URL时也能命中
+            if content is not None and not content.get('error'):
+                final_key = canonicalize_url(content['url'])
+                if final_key not in self._run_contents:
+                    self._cache_content(final_key, content)
+            for index in pending[key]:
+                yield index, content
+    
+    def _apply_content(self, article, content):
+        """将提取到的正文内容合并到文章记录中"""
+        if content is None or content.get('error'):
+            article['text'] = ''
+            article['authors'] = []
+            article['top_image'] = ''
+            if content is not None:
+                # 超时等非异常的失败原因记录在文章中
+                article['error'] = content['error']
+            return
+            
+        article['text'] = content['text']
+        article['authors'] = content['authors']
+        article['top_image'] = content['top_image']
+        
+        # 如果newspaper能提取到发布日期，优先使用
+        if content['publish_date']:
+            article['published'] = content['publish_date']
+    
     def scrape_from_rss(self, source_name, rss_url, limit=10):
         """从RSS源抓取新闻
         
@@ -92,18 +363,45 @@ class NewsScraperAutomation:
             limit: 最大抓取数量
             
         Returns:
-            list: 抓取的新闻列表
+            list: 抓取的新闻列表，保持RSS中的顺序
         """
+        return _in_order(self._iter_rss(source_name, rss_url, limit))
+    
+    def iter_from_rss(self, source_name, rss_url, limit=10):
+        """从RSS源抓取新闻，每篇文章完成后立即产出
+        
+        Args:
+            source_name: 新闻源名称
+            rss_url: RSS源URL
+            limit: 最大抓取数量
+            
+        Yields:
+            dict: 抓取完成的文章，按完成顺序产出
+        """
+        for _, article in self._iter_rss(source_name, rss_url, limit):
+            yield article
+    
+    def _iter_rss(self, source_name, rss_url, limit, stats=None):
         logger.info(f'从 {source_name} RSS源抓取新闻')
-        articles = []
+        deadline = self._source_deadline()
+        count = 0
         
         try:
-            feed = feedparser.parse(rss_url)
+            validators = self.feed_validators.get(rss_url)
+            feed = self.engine.fetch_feed(rss_url, etag=validators.get('etag'), modified=validators.get('modified'))
             
-            for i, entry in enumerate(feed.entries):
-                if i >= limit:
-                    break
-                    
+            if feed.status == 304:
+                logger.info(f'{source_name} RSS源自上次采集以来没有更新，跳过')
+                return
+                
+            entries = self._skip_seen(feed.entries[:limit], lambda entry: entry.link)
+            articles = []
+            
+            if stats is not None:
+                stats['entry_times'] = _entry_times(feed.entries)
+                stats['new_items'] = len(entries)
+            
+            for entry in entries:
                 article = {}
                 article['title'] = entry.title
                 article['link'] = entry.link
@@ -123,35 +421,32 @@ class NewsScraperAutomation:
                     article['summary'] = ''
                     
                 article['source'] = source_name
-                
-                # 使用newspaper库提取完整内容
-                try:
-                    news_article = Article(entry.link)
-                    news_article.download()
-                    news_article.parse()
-                    
-                    article['text'] = news_article.text
-                    article['authors'] = news_article.authors
-                    article['top_image'] = news_article.top_image
-                    
-                    # 如果newspaper能提取到发布日期，优先使用
-                    if news_article.publish_date:
-                        article['published'] = news_article.publish_date.isoformat()
-                        
-                except Exception as e:
-                    logger.error(f'提取文章内容失败: {entry.link}, 错误: {str(e)}')
-                    article['text'] = ''
-                    article['authors'] = []
-                    article['top_image'] = ''
-                
                 articles.append(article)
+            
+            # 使用newspaper库并发提取完整内容
+            failed = 0
+            for index, content in self._iter_contents([entry.link for entry in entries], deadline):
+                article, articles[index] = articles[index], None
+                self._apply_content(article, content)
+                if content is None or content.get('error'):
+                    failed += 1
+                count += 1
                 logger.debug(f'已抓取文章: {article["title"]}')
+                yield index, article
+                
+            # 全部文章都抓取成功后才保存验证信息；有失败或超时的文章时保留旧的验证信息，
+            # 下次运行不会得到304，失败的文章没有登记为已采集，会重新抓取
+            if failed:
+                logger.info(f'{source_name} 有 {failed} 篇文章抓取失败，不更新RSS源的验证信息')
+            else:
+                self.feed_validators.update(rss_url, feed.etag, feed.modified)
                 
         except Exception as e:
             logger.error(f'从 {source_name} 抓取失败: {str(e)}')
+            if stats is not None:
+                stats['error'] = str(e)
             
-        logger.info(f'从 {source_name} 成功抓取 {len(articles)} 篇文章')
-        return articles
+        logger.info(f'从 {source_name} 成功抓取 {count} 篇文章')
     
     def scrape_from_google_news(self, query=None, topic=None, location=None, limit=10):
         """从Google News抓取新闻
@@ -163,9 +458,28 @@ class NewsScraperAutomation:
             limit: 最大抓取数量
             
         Returns:
-            list: 抓取的新闻列表
+            list: 抓取的新闻列表，保持Google News中的顺序
         """
-        articles = []
+        return _in_order(self._iter_google_news(query, topic, location, limit))
+    
+    def iter_from_google_news(self, query=None, topic=None, location=None, limit=10):
+        """从Google News抓取新闻，每篇文章完成后立即产出
+        
+        Args:
+            query: 搜索关键词
+            topic: 主题类别
+            location: 地理位置
+            limit: 最大抓取数量
+            
+        Yields:
+            dict: 抓取完成的文章，按完成顺序产出
+        """
+        for _, article in self._iter_google_news(query, topic, location, limit):
+            yield article
+    
+    def _iter_google_news(self, query, topic, location, limit, stats=None):
+        deadline = self._source_deadline()
+        count = 0
         
         try:
             if query:
@@ -181,45 +495,41 @@ class NewsScraperAutomation:
                 logger.info('从Google News获取热门新闻')
                 results = self.gn.top_news()
             
-            for i, entry in enumerate(results['entries']):
-                if i >= limit:
-                    break
-                    
+            entries = results['entries'][:limit]
+            articles = []
+            
+            # 先把Google News跳转链接解析为发布方URL，再按真实地址去重
+            links = self._resolve_links([entry.link for entry in entries])
+            
+            for entry, link in zip(entries, links):
                 article = {}
                 article['title'] = entry.title
-                article['link'] = entry.link
+                article['link'] = link
                 article['published'] = entry.published
                 article['summary'] = entry.summary
                 article['source'] = entry.source.title if hasattr(entry, 'source') else 'Google News'
-                
-                # 使用newspaper库提取完整内容
-                try:
-                    news_article = Article(entry.link)
-                    news_article.download()
-                    news_article.parse()
-                    
-                    article['text'] = news_article.text
-                    article['authors'] = news_article.authors
-                    article['top_image'] = news_article.top_image
-                    
-                    # 如果newspaper能提取到发布日期，优先使用
-                    if news_article.publish_date:
-                        article['published'] = news_article.publish_date.isoformat()
-                        
-                except Exception as e:
-                    logger.error(f'提取文章内容失败: {entry.link}, 错误: {str(e)}')
-                    article['text'] = ''
-                    article['authors'] = []
-                    article['top_image'] = ''
-                
                 articles.append(article)
+                
+            articles = self._skip_seen(articles, lambda article: article['link'])
+            
+            if stats is not None:
+                stats['entry_times'] = _entry_times(results['entries'])
+                stats['new_items'] = len(articles)
+            
+            # 使用newspaper库并发提取完整内容
+            for index, content in self._iter_contents([article['link'] for article in articles], deadline):
+                article, articles[index] = articles[index], None
+                self._apply_content(article, content)
+                count += 1
                 logger.debug(f'已抓取文章: {article["title"]}')
+                yield index, article
                 
         except Exception as e:
             logger.error(f'从Google News抓取失败: {str(e)}')
+            if stats is not None:
+                stats['error'] = str(e)
             
-        logger.info(f'从Google News成功抓取 {len(articles)} 篇文章')
-        return articles
+        logger.info(f'从Google News成功抓取 {count} 篇文章')
     
     def scrape_from_website(self, url, limit=5):
         """直接从网站抓取新闻
@@ -231,50 +541,62 @@ class NewsScraperAutomation:
         Returns:
             list: 抓取的新闻列表
         """
+        return _in_order(self._iter_website(url, limit))
+    
+    def iter_from_website(self, url, limit=5):
+        """直接从网站抓取新闻，每篇文章完成后立即产出
+        
+        Args:
+            url: 网站URL
+            limit: 最大抓取数量
+            
+        Yields:
+            dict: 抓取完成的文章，按完成顺序产出
+        """
+        for _, article in self._iter_website(url, limit):
+            yield article
+    
+    def _iter_website(self, url, limit):
         logger.info(f'从网站抓取: {url}')
-        articles = []
+        deadline = self._source_deadline()
+        count = 0
         
         try:
             # 使用newspaper库抓取网站
+            import newspaper
             news_site = newspaper.build(url, memoize_articles=False)
             
-            for i, article_url in enumerate(news_site.article_urls()):
-                if i >= limit:
-                    break
-                    
-                try:
-                    news_article = Article(article_url)
-                    news_article.download()
-                    news_article.parse()
-                    
-                    article = {}
-                    article['title'] = news_article.title
-                    article['link'] = article_url
-                    article['text'] = news_article.text
-                    article['authors'] = news_article.authors
-                    article['top_image'] = news_article.top_image
-                    
-                    # 设置发布日期
-                    if news_article.publish_date:
-                        article['published'] = news_article.publish_date.isoformat()
-                    else:
-                        article['published'] = datetime.datetime.now().isoformat()
-                        
-                    article['source'] = url
-                    article['summary'] = news_article.summary
+            article_urls = self._skip_seen(news_site.article_urls()[:limit])
+            
+            for index, content in self._iter_contents(article_urls, deadline):
+                # 提取失败或超时的文章直接跳过
+                if content is None or content.get('error'):
+                    continue
                     
-                    articles.append(article)
-                    logger.debug(f'已抓取文章: {article["title"]}')
+                article = {}
+                article['title'] = content['title']
+                article['link'] = article_urls[index]
+                article['text'] = content['text']
+                article['authors'] = content['authors']
+                article['top_image'] = content['top_image']
+                
+                # 设置发布日期
+                if content['publish_date']:
+                    article['published'] = content['publish_date']
+                else:
+                    article['published'] = datetime.datetime.now().isoformat()
                     
-                except Exception as e:
-                    logger.error(f'提取文章内容失败: {article_url}, 错误: {str(e)}')
+                article['source'] = url
+                article['summary'] = content['summary']
+                
+                count += 1
+                logger.debug(f'已抓取文章: {article["title"]}')
+                yield index, article
                     
-            logger.info(f'从 {url} 成功抓取 {len(articles)} 篇文章')
+            logger.info(f'从 {url} 成功抓取 {count} 篇文章')
             
         except Exception as e:
             logger.error(f'从 {url} 抓取失败: {str(e)}')
-            
-        return articles
     
     def save_articles(self, articles, source_name):
         """保存抓取的文章
@@ -287,66 +609,189 @@ class NewsScraperAutomation:
             logger.warning(f'没有从 {source_name} 抓取到文章')
             return
             
-        # 创建按日期和来源的目录
-        today = datetime.datetime.now().strftime('%Y-%m-%d')
-        source_dir = os.path.join(data_dir, today, source_name)
-        os.makedirs(source_dir, exist_ok=True)
+        self.save_stream(articles, source_name)
+    
+    def save_stream(self, articles, source_name):
+        """边抓取边保存文章，每篇文章完成后立即写入文件
         
-        # 保存为JSON文件
-        filename = os.path.join(source_dir, f'{source_name}_{int(time.time())}.json')
+        Args:
+            articles: 文章的可迭代对象，通常是 iter_from_* 返回的生成器
+            source_name: 来源名称
+            
+        Returns:
+            int: 保存的文章数量
+        """
+        # 打开文件时就加入写入记录，进程被强制结束时写了一部分的文件也会在下次同步
+        if self.storage_format == 'jsonl':
+            sink = JsonlSink(data_dir, source_name, on_open=self.write_log.add)
+        else:
+            def on_open(json_path, csv_path):
+                # 在创建文件之前记录路径，中途退出后可以找到写了一半的文件
+                if self._journal is not None:
+                    self._journal.record_files(source_name, [json_path, csv_path])
+                self.write_log.add(json_path, csv_path)
+            sink = ArticleSink(data_dir, source_name, on_open)
+            
+        # 已记录的正文和字典文件 -> 引用它们的数据文件
+        body_refs = {}
+        with sink:
+            for article in articles:
+                record = self.body_store.externalize(article) if self.body_store is not None else article
+                sink.write(record)
+                
+                # 每次引用都记录正文和字典，按月分片同步时随文章记录进入同一个月份的仓库，
+                # 即使正文在之前的月份已经保存过；同一个数据文件中重复的引用只记录一次
+                if self.body_store is not None and record.get('text_hash'):
+                    refs = [
+                        (path, sink.paths[-1]) for path in self.body_store.files(record['text_hash'])
+                        if body_refs.get(path) != sink.paths[-1]
+                    ]
+                    body_refs.update(refs)
+                    self.write_log.add_refs(refs)
+                
+                # 记录成功提取正文的文章，之后的运行不再重复抓取
+                if article.get('text'):
+                    self.seen_urls.add(article['link'], content_hash(article['text']))
+                    
+                # 写入文章库，按批量大小在一个事务中提交
+                if self.article_db is not None:
+                    self.article_db.add(article, source_name)
+                    
+                # 记录到运行日志，进程中途退出后可以恢复
+                if self._journal is not None:
+                    self._journal.record_article(source_name, record)
+            
+        if self.article_db is not None:
+            self.article_db.flush()
+        return sink.count
+    
+    def job_names(self):
+        """返回全部采集任务的名称，每个任务对应data下的一个来源目录
         
-        with open(filename, 'w', encoding='utf-8') as f:
-            json.dump(articles, f, ensure_ascii=False, indent=4)
+        Returns:
+            list: 任务名称列表，包括RSS源名称和 google_news_<主题>
+        """
+        return _job_names(self.news_sources, self.google_news_topics)
+    
+    def run_job(self, name, limit=10):
+        """执行单个采集任务并保存结果
+        
+        Args:
+            name: 任务名称，见 job_names()
+            limit: 最大抓取数量
             
-        logger.info(f'已保存 {len(articles)} 篇文章到 {filename}')
+        Returns:
+            dict: 任务统计，包括保存的文章数(saved)、新条目数(new_items)、
+                源中所有条目的发布时间戳(entry_times)，以及抓取来源失败时的错误信息(error)
+        """
+        if self._journal is not None and self._journal.finished(name) is not None:
+            logger.info(f'{name} 在上次中断前已完成，跳过')
+            return self._journal.finished(name)
+            
+        stats = {'saved': 0, 'new_items': 0, 'entry_times': [], 'error': None}
+        resumed = self._resume_job(name)
         
-        # 同时保存为CSV格式方便查看
+        if name in self.news_sources:
+            articles = self._iter_rss(name, self.news_sources[name]['rss'], limit, stats)
+        elif name == 'google_news_top':
+            articles = self._iter_google_news(None, None, None, limit, stats)
+        elif name.startswith('google_news_'):
+            articles = self._iter_google_news(None, name[len('google_news_'):], None, limit, stats)
+        else:
+            logger.warning(f'未知的采集任务: {name}')
+            stats['error'] = '未知的采集任务'
+            return stats
+            
         try:
-            # 提取主要字段
-            df_data = []
-            for article in articles:
-                df_data.append({
-                    'title': article.get('title', ''),
-                    'published': article.get('published', ''),
-                    'source': article.get('source', ''),
-                    'link': article.get('link', ''),
-                    'summary': article.get('summary', '')[:100] + '...' if article.get('summary', '') else ''
-                })
-                
-            if df_data:
-                df = pd.DataFrame(df_data)
-                csv_filename = os.path.join(source_dir, f'{source_name}_{int(time.time())}.csv')
-                df.to_csv(csv_filename, index=False, encoding='utf-8')
-                logger.info(f'已保存CSV格式到 {csv_filename}')
-        except Exception as e:
-            logger.error(f'保存CSV失败: {str(e)}')
+            stats['saved'] = self.save_stream(itertools.chain(resumed, (article for _, article in articles)), name)
+        finally:
+            self._resumed_urls = set()
+            
+        if self._journal is not None:
+            self._journal.finish(name, stats)
+        return stats
+    
+    def _resume_job(self, name):
+        """从运行日志恢复来源在上次中断前已保存的文章
+        
+        恢复的文章不再重复抓取。追加写入的存储中这些文章已经在文件里，
+        只需重新写入文章库（上次退出时可能还在批量缓存中）；
+        其他存储上次写了一半的数据文件会被删除，恢复的文章重新写入本次的文件和文章库。
+        日志中的正文已外置为 text_hash，恢复时从正文存储中取回，文章库的全文索引才有正文。
+        
+        Returns:
+            list: 需要重新写入的文章
+        """
+        if self._journal is None:
+            return []
+            
+        resumed = self._journal.articles(name)
+        if not resumed:
+            return []
+            
+        self._resumed_urls = {canonicalize_url(article['link']) for article in resumed}
+        logger.info(f'从运行日志恢复 {name} 的 {len(resumed)} 篇文章')
+        if self.body_store is not None:
+            resumed = [self.body_store.hydrate(article) for article in resumed]
+            
+        sink_class = JsonlSink if self.storage_format == 'jsonl' else ArticleSink
+        if sink_class.append_only:
+            if self.article_db is not None:
+                self.article_db.add_many(resumed, name)
+            return []
+            
+        for path in self._journal.files(name):
+            if path and os.path.exists(path):
+                os.remove(path)
+        return resumed
     
-    def run(self):
-        """运行新闻采集"""
+    def run(self, jobs=None):
+        """运行新闻采集
+        
+        Args:
+            jobs: 要执行的任务名称列表，默认执行全部任务
+            
+        Returns:
+            dict: 任务名称到任务统计的映射
+        """
         logger.info('开始新闻采集任务')
+        self.engine.reset_run()
+        self.seen_urls.expire()
+        self.redirects.expire()
+        self._run_contents = collections.OrderedDict()
+        self._journal = RunJournal()
+        results = {}
         
-        # 从RSS源采集
-        for source_name, source_info in self.news_sources.items():
-            if 'rss' in source_info:
-                articles = self.scrape_from_rss(source_name, source_info['rss'])
-                self.save_articles(articles, source_name)
-            else:
-                logger.warning(f'{source_name} 没有配置RSS源')
+        try:
+            for name in jobs if jobs is not None else self.job_names():
+                results[name] = self.run_job(name)
                 
-        # 从Google News采集热门新闻
-        articles = self.scrape_from_google_news()
-        self.save_articles(articles, 'google_news_top')
-        
-        # 可以添加更多自定义采集任务
-        # 例如，采集特定主题的新闻
-        topics = ['business', 'technology', 'health']
-        for topic in topics:
-            articles = self.scrape_from_google_news(topic=topic)
-            self.save_articles(articles, f'google_news_{topic}')
+            # 正常结束后清除本轮的运行日志，中途退出时保留以便下次恢复
+            self._journal.clear(results)
+        finally:
+            self._run_contents = None
+            self._journal.close()
+            self._journal = None
+            
+        if self.engine.timeouts:
+            logger.warning(f'本轮采集共有 {self.engine.timeouts} 篇文章超时')
             
+        # 等待时间最长的几个主机
+        host_stats = sorted(self.engine.scheduler.stats().items(), key=lambda item: -item[1]['avg_wait'])
+        for host, item in host_stats[:5]:
+            logger.info(f'主机 {host}: 请求 {item["requests"]} 次，平均等待 {item["avg_wait"]:.2f} 秒，'
+                        f'最长等待 {item["max_wait"]:.2f} 秒，排队 {item["queued"]} 个')
+            
+        stats = self.engine.session.connection_stats()
+        logger.info(f'HTTP请求 {stats["requests"]} 次，新建连接 {stats["connections"]} 个，'
+                    f'连接复用率 {stats["reuse_rate"]:.1%}')
         logger.info('新闻采集任务完成')
-
+        return results
 
 if __name__ == '__main__':
+    init()
     scraper = NewsScraperAutomation()
-    scraper.run()
+    try:
+        scraper.run()
+    finally:
+        scraper.close()
@@ -0,0 +1,205 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Parquet导出
+把data目录中的文章按日期和来源分区导出为Parquet文件，供pandas等工具按列快速读取。
+需要安装pyarrow：pip install pyarrow
+"""
+
+import os
+import sys
+import json
+import time
+import logging
+import argparse
+
+from storage import iter_partitions, iter_source_dir
+from body_store import BodyStore
+
+try:
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+    ds = None
+    pq = None
+
+logger = logging.getLogger(__name__)
+
+# 正文和摘要使用压缩率更高的zstd，其余列使用解压更快的snappy
+COLUMN_COMPRESSION = {
+    'link': 'snappy',
+    'title': 'snappy',
+    'published': 'snappy',
+    'source': 'snappy',
+    'summary': 'zstd',
+    'text': 'zstd',
+    'authors': 'snappy',
+    'top_image': 'snappy',
+    'error': 'snappy'
+}
+
+
+def _schema():
+    return pa.schema([
+        ('link', pa.string()),
+        ('title', pa.string()),
+        ('published', pa.string()),
+        ('source', pa.dictionary(pa.int32(), pa.string())),
+        ('summary', pa.string()),
+        ('text', pa.string()),
+        ('authors', pa.list_(pa.string())),
+        ('top_image', pa.string()),
+        ('error', pa.string())
+    ])
+
+
+def _require_pyarrow():
+    if pa is None:
+        logger.error('导出Parquet需要安装pyarrow')
+        raise ImportError('导出Parquet需要安装pyarrow: pip install pyarrow')
+
+
+def _signature(source_dir):
+    """来源目录中数据文件的名称、大小和修改时间，用于判断分区是否需要重新导出"""
+    signature = []
+    for filename in sorted(os.listdir(source_dir)):
+        if filename.endswith(('.jsonl', '.json')):
+            stat = os.stat(os.path.join(source_dir, filename))
+            signature.append([filename, stat.st_size, stat.st_mtime_ns])
+    return signature
+
+
+class ParquetExporter:
+    """按日期和来源分区的增量Parquet导出器
+
+    输出目录结构为 <out_dir>/date=<日期>/source_name=<来源>/part-0.parquet，
+    可以直接用 pyarrow.dataset 或 pandas.read_parquet 按Hive分区读取。
+    每次导出只重写数据文件有变化的分区，同一分区内按链接去重。
+    """
+
+    def __init__(self, data_dir='data', out_dir=None, state_path=None):
+        """初始化导出器
+
+        Args:
+            data_dir: 数据根目录
+            out_dir: Parquet输出目录，默认使用PARQUET_DIR
+            state_path: 记录已导出分区的状态文件，默认保存在STATE_DIR目录下
+        """
+        _require_pyarrow()
+        self.data_dir = data_dir
+        self.bodies = BodyStore(os.path.join(data_dir, 'bodies'))
+        self.out_dir = out_dir or os.getenv('PARQUET_DIR') or 'parquet'
+        self.state_path = state_path or os.path.join(os.getenv('STATE_DIR', 'state'), 'parquet_export.json')
+        self._state = {}
+
+        if os.path.exists(self.state_path):
+            try:
+                with open(self.state_path, 'r', encoding='utf-8') as f:
+                    self._state = json.load(f)
+            except Exception as e:
+                logger.warning(f'读取Parquet导出状态失败: {self.state_path}, 错误: {str(e)}')
+
+    def _partition_path(self, day, source_name):
+        return os.path.join(self.out_dir, f'date={day}', f'source_name={source_name}', 'part-0.parquet')
+
+    def export(self):
+        """导出有变化的分区
+
+        Returns:
+            int: 重新导出的分区数
+        """
+        exported = 0
+        for day, source_name, source_dir in iter_partitions(self.data_dir):
+            key = f'{day}/{source_name}'
+            signature = _signature(source_dir)
+            path = self._partition_path(day, source_name)
+            if not signature or (self._state.get(key) == signature and os.path.exists(path)):
+                continue
+
+            count = self._write_partition(source_name, source_dir, path)
+            self._state[key] = signature
+            exported += 1
+            logger.info(f'已导出 {key} 的 {count} 篇文章到 {path}')
+
+        if exported:
+            self._save()
+        logger.info(f'Parquet导出完成，更新了 {exported} 个分区')
+        return exported
+
+    def _write_partition(self, source_name, source_dir, path):
+        # 同一篇文章出现多次时保留最后写入的一条
+        articles = {}
+        for article in iter_source_dir(source_dir, source_name, self.bodies):
+            articles[article.get('link')] = article
+
+        rows = [
+            {
+                'link': article.get('link'),
+                'title': article.get('title'),
+                'published': article.get('published'),
+                'source': article.get('source'),
+                'summary': article.get('summary'),
+                'text': article.get('text'),
+                'authors': article.get('authors') or [],
+                'top_image': article.get('top_image'),
+                'error': article.get('error')
+            }
+            for article in articles.values()
+        ]
+        table = pa.Table.from_pylist(rows, schema=_schema())
+
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f'{path}.tmp'
+        pq.write_table(table, tmp_path, compression=COLUMN_COMPRESSION, use_dictionary=['source'])
+        os.replace(tmp_path, path)
+        return len(rows)
+
+    def _save(self):
+        os.makedirs(os.path.dirname(self.state_path) or '.', exist_ok=True)
+        tmp_path = f'{self.state_path}.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self._state, f, ensure_ascii=False, indent=4)
+        os.replace(tmp_path, self.state_path)
+
+
+def read_corpus(out_dir=None, columns=None, filter=None):
+    """按列读取导出的Parquet文章库
+
+    Args:
+        out_dir: Parquet目录，默认使用PARQUET_DIR
+        columns: 要读取的列，例如 ['title', 'published', 'source']，默认读取全部列
+        filter: pyarrow.dataset的过滤表达式，例如 pyarrow.dataset.field('date') == '2025-04-22'
+
+    Returns:
+        pandas.DataFrame: 文章表，包含分区列date和source_name
+    """
+    _require_pyarrow()
+    dataset = ds.dataset(out_dir or os.getenv('PARQUET_DIR') or 'parquet', format='parquet', partitioning='hive')
+    return dataset.to_table(columns=columns, filter=filter).to_pandas()
+
+
+def main():
+    """命令行入口"""
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+
+    parser = argparse.ArgumentParser(description='把采集的文章导出为Parquet')
+    parser.add_argument('--data-dir', default='data', help='数据根目录')
+    parser.add_argument('--out', default=None, help='Parquet输出目录，默认使用PARQUET_DIR')
+    parser.add_argument('--read', metavar='COLUMNS', help='读取指定的列（逗号分隔）并输出行数和耗时，不导出')
+    args = parser.parse_args()
+
+    if args.read:
+        start = time.perf_counter()
+        frame = read_corpus(args.out, columns=args.read.split(','))
+        print(f'读取 {len(frame)} 行 {len(frame.columns)} 列，耗时 {(time.perf_counter() - start) * 1000:.1f} 毫秒')
+        return 0
+
+    ParquetExporter(args.data_dir, args.out).export()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,181 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+按主机限速的请求调度器
+用令牌桶控制每个主机的请求速率和突发量，并限制同时连接数
+"""
+
+import os
+import time
+import asyncio
+import logging
+import threading
+from contextlib import contextmanager
+from urllib.parse import urlparse
+
+logger = logging.getLogger(__name__)
+
+# 因连接数已满而等待时的轮询间隔（秒）
+POLL_INTERVAL = 0.05
+
+
+def host_of(url):
+    """返回URL的主机名（含端口），用作调度键"""
+    return urlparse(url).netloc.lower()
+
+
+class _HostState:
+    """单个主机的令牌桶和统计信息"""
+
+    __slots__ = ('tokens', 'updated', 'active', 'waiting', 'requests', 'total_wait', 'max_wait')
+
+    def __init__(self, burst):
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+        self.active = 0
+        self.waiting = 0
+        self.requests = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+
+class HostScheduler:
+    """按主机限速的请求调度器
+
+    每个主机有独立的令牌桶（每秒rate个令牌，最多burst个）和最大连接数。
+    同步代码通过 slot() 在请求前排队；异步代码通过 acquire_async() 排队，
+    并用 admitted() 告诉同一线程中随后的请求已经获得许可。
+    """
+
+    def __init__(self, rate=None, burst=None, max_connections=None):
+        """初始化调度器
+
+        Args:
+            rate: 每个主机每秒允许的请求数
+            burst: 每个主机允许的突发请求数
+            max_connections: 每个主机的最大同时连接数
+        """
+        self.rate = rate or float(os.getenv('HOST_RATE', '1'))
+        self.burst = burst or float(os.getenv('HOST_BURST', '5'))
+        self.max_connections = max_connections or int(os.getenv('FETCH_PER_HOST', '2'))
+
+        self._hosts = {}
+        self._cond = threading.Condition()
+        self._local = threading.local()
+
+    def _state(self, host):
+        state = self._hosts.get(host)
+        if state is None:
+            state = self._hosts[host] = _HostState(self.burst)
+        return state
+
+    def _try_take(self, state):
+        """尝试占用一个连接和一个令牌，调用时需持有锁
+
+        Returns:
+            float: 0表示成功，否则为建议的等待秒数
+        """
+        now = time.monotonic()
+        state.tokens = min(self.burst, state.tokens + (now - state.updated) * self.rate)
+        state.updated = now
+
+        if state.active >= self.max_connections:
+            return POLL_INTERVAL
+        if state.tokens < 1:
+            return (1 - state.tokens) / self.rate
+
+        state.tokens -= 1
+        state.active += 1
+        state.requests += 1
+        return 0
+
+    def _record_wait(self, state, waited):
+        state.total_wait += waited
+        state.max_wait = max(state.max_wait, waited)
+
+    def acquire(self, host):
+        """阻塞直到获得该主机的请求许可"""
+        start = time.monotonic()
+        with self._cond:
+            state = self._state(host)
+            wait = self._try_take(state)
+            if wait:
+                state.waiting += 1
+                while wait:
+                    self._cond.wait(wait)
+                    wait = self._try_take(state)
+                state.waiting -= 1
+            self._record_wait(state, time.monotonic() - start)
+
+    async def acquire_async(self, host):
+        """在事件循环中等待该主机的请求许可，不占用线程"""
+        start = time.monotonic()
+        queued = False
+        try:
+            while True:
+                with self._cond:
+                    state = self._state(host)
+                    wait = self._try_take(state)
+                    if not wait:
+                        self._record_wait(state, time.monotonic() - start)
+                        return
+                    if not queued:
+                        state.waiting += 1
+                        queued = True
+                await asyncio.sleep(wait)
+        finally:
+            if queued:
+                with self._cond:
+                    self._state(host).waiting -= 1
+
+    def release(self, host):
+        """归还该主机的连接"""
+        with self._cond:
+            self._state(host).active -= 1
+            self._cond.notify_all()
+
+    @contextmanager
+    def slot(self, host):
+        """在同步请求期间占用该主机的许可
+
+        如果当前线程已经通过 admitted() 获得了该主机的许可，则直接放行。
+        """
+        if host in getattr(self._local, 'hosts', ()):
+            yield
+            return
+        self.acquire(host)
+        try:
+            yield
+        finally:
+            self.release(host)
+
+    @contextmanager
+    def admitted(self, host):
+        """标记当前线程已获得该主机的许可，期间的请求不再重复排队"""
+        hosts = getattr(self._local, 'hosts', None)
+        if hosts is None:
+            hosts = self._local.hosts = set()
+        hosts.add(host)
+        try:
+            yield
+        finally:
+            hosts.discard(host)
+
+    def stats(self):
+        """各主机的排队和等待统计
+
+        Returns:
+            dict: 主机名到统计信息的映射，包括排队数、活动连接数、请求数、平均和最长等待秒数
+        """
+        with self._cond:
+            return {
+                host: {
+                    'queued': state.waiting,
+                    'active': state.active,
+                    'requests': state.requests,
+                    'avg_wait': state.total_wait / state.requests if state.requests else 0.0,
+                    'max_wait': state.max_wait
+                }
+                for host, state in self._hosts.items()
+            }
@@ -0,0 +1,106 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+自适应采集频率
+根据每个来源的发布频率安排下一次采集时间
+"""
+
+import os
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class AdaptivePollSchedule:
+    """按来源自适应的采集计划
+
+    每次采集后，根据条目的发布时间戳和本次新增条目数估计来源每小时的发布量，
+    用指数滑动平均平滑后，安排在预计积累 POLL_TARGET_ITEMS 条新内容时再次采集，
+    间隔限制在 POLL_MIN_MINUTES 和 POLL_MAX_MINUTES 之间。
+    """
+
+    def __init__(self, min_minutes=None, max_minutes=None, target_items=None, smoothing=None):
+        """初始化采集计划
+
+        各来源的状态由调用方保存，见 plan()。
+
+        Args:
+            min_minutes: 最短采集间隔（分钟）
+            max_minutes: 最长采集间隔（分钟），默认读取POLL_MAX_MINUTES，未设置时为SCRAPE_INTERVAL小时
+            target_items: 每次采集期望获得的新条目数
+            smoothing: 新观测值在滑动平均中的权重
+        """
+        self.min_interval = 60 * (min_minutes or float(os.getenv('POLL_MIN_MINUTES', '15')))
+        default_max = 60 * float(os.getenv('SCRAPE_INTERVAL') or '6')
+        self.max_interval = 60 * (max_minutes or float(os.getenv('POLL_MAX_MINUTES') or default_max))
+        self.target_items = target_items or float(os.getenv('POLL_TARGET_ITEMS', '5'))
+        self.smoothing = smoothing or 0.5
+
+    def plan(self, name, state, new_items, entry_times, now=None):
+        """根据一次采集结果更新来源的状态，并计算下一次采集的间隔
+
+        状态保存在调用方提供的字典中，便于与共享的任务队列一起存储。
+
+        Args:
+            name: 来源名称，仅用于日志
+            state: 来源的状态字典，会被原地更新
+            new_items: 本次采集发现的新条目数
+            entry_times: 源中条目的发布时间戳列表
+            now: 采集完成的时间戳，默认为当前时间
+
+        Returns:
+            float: 下一次采集前的间隔秒数
+        """
+        now = now or time.time()
+        observed = self._observed_rate(state, new_items, entry_times, now)
+
+        if observed is not None:
+            previous = state.get('rate')
+            state['rate'] = observed if previous is None else (
+                self.smoothing * observed + (1 - self.smoothing) * previous
+            )
+
+        rate = state.get('rate') or 0
+        interval = self.target_items / rate * 3600 if rate > 0 else self.max_interval
+        interval = min(max(interval, self.min_interval), self.max_interval)
+
+        state['last_poll'] = now
+        state['interval'] = interval
+        state['next_due'] = now + interval
+
+        logger.info(f'{name} 估计每小时发布 {rate:.2f} 篇，{interval / 60:.0f} 分钟后再次采集')
+        return interval
+
+    def retry(self, name, state, now=None):
+        """采集失败时按最短间隔重新安排，不更新发布频率和上次采集时间
+
+        Args:
+            name: 来源名称，仅用于日志
+            state: 来源的状态字典，会被原地更新
+            now: 当前时间戳，默认为当前时间
+
+        Returns:
+            float: 下一次采集前的间隔秒数
+        """
+        now = now or time.time()
+        state['next_due'] = now + self.min_interval
+        logger.warning(f'{name} 采集失败，{self.min_interval / 60:.0f} 分钟后重试')
+        return self.min_interval
+
+    def _observed_rate(self, state, new_items, entry_times, now):
+        """估计来源每小时的发布量，取时间戳和新条目数两种估计中较大的一个"""
+        rates = []
+
+        # 源中条目发布时间的跨度，只看最近一天内的条目
+        recent = sorted(t for t in entry_times if now - 86400 <= t <= now)
+        if len(recent) >= 2 and recent[-1] > recent[0]:
+            rates.append((len(recent) - 1) / (recent[-1] - recent[0]) * 3600)
+
+        # 距上次采集的时间内出现的新条目
+        last_poll = state.get('last_poll')
+        if last_poll and now > last_poll:
+            rates.append(new_items / (now - last_poll) * 3600)
+
+        return max(rates) if rates else None
@@ -0,0 +1,166 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+GitHub API限流
+根据响应中的 X-RateLimit-* 和 Retry-After 头调整并发数，遇到限流时所有线程一起暂停
+"""
+
+import os
+import time
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+# 连续成功多少次后把并发数加一
+RAISE_AFTER = 20
+
+# 触发次级限流但没有 Retry-After 头时的等待秒数（GitHub建议至少一分钟）
+SECONDARY_DELAY = 60
+
+
+class RateLimitExceeded(Exception):
+    """需要等待的时间超过上限，应当停止本次同步，下次再继续"""
+
+    def __init__(self, wait):
+        super().__init__(f'GitHub API限流，需要等待 {wait:.0f} 秒')
+        self.wait = wait
+
+
+class GitHubRateLimiter:
+    """自适应并发的GitHub API请求限流器
+
+    同时进行的请求数不超过当前并发上限。触发次级限流（403/429）时并发上限减半，
+    并按 Retry-After 暂停所有请求；连续成功一段时间后并发上限逐步恢复。
+    主限流的剩余次数不足时暂停到 X-RateLimit-Reset 指定的时间。
+    需要等待的时间超过 max_wait 时抛出 RateLimitExceeded。
+    """
+
+    def __init__(self, max_concurrency=None, min_concurrency=1, max_wait=None, max_retries=5):
+        """初始化限流器
+
+        Args:
+            max_concurrency: 最大并发请求数，默认使用GITHUB_SYNC_WORKERS
+            min_concurrency: 限流后最小的并发请求数
+            max_wait: 单次限流最多等待的秒数，默认使用GITHUB_MAX_WAIT
+            max_retries: 单个请求被限流后的最大重试次数
+        """
+        self.max_concurrency = max_concurrency or int(os.getenv('GITHUB_SYNC_WORKERS', '8'))
+        self.min_concurrency = min(min_concurrency, self.max_concurrency)
+        self.max_wait = max_wait if max_wait is not None else float(os.getenv('GITHUB_MAX_WAIT', '900'))
+        self.max_retries = max_retries
+
+        self.limit = self.max_concurrency
+        self.remaining = None
+        self.reset_at = None
+
+        self._cond = threading.Condition()
+        self._active = 0
+        self._paused_until = 0.0
+        self._successes = 0
+        self.throttled = 0
+
+    def _acquire(self):
+        with self._cond:
+            while True:
+                wait = self._paused_until - time.monotonic()
+                if wait > self.max_wait:
+                    raise RateLimitExceeded(wait)
+                if wait > 0:
+                    self._cond.wait(wait)
+                elif self._active < self.limit:
+                    self._active += 1
+                    return
+                else:
+                    self._cond.wait()
+
+    def _release(self):
+        with self._cond:
+            self._active -= 1
+            self._cond.notify_all()
+
+    def _pause(self, delay):
+        """暂停所有请求，调用时需持有锁"""
+        self._paused_until = max(self._paused_until, time.monotonic() + delay)
+        self._cond.notify_all()
+
+    def _observe(self, response):
+        """根据响应头更新限流状态
+
+        Returns:
+            float: 请求被限流时建议的等待秒数，否则为None
+        """
+        headers = response.headers
+        remaining = headers.get('X-RateLimit-Remaining')
+        reset = headers.get('X-RateLimit-Reset')
+        retry_after = headers.get('Retry-After')
+
+        with self._cond:
+            if remaining is not None:
+                self.remaining = int(remaining)
+            if reset is not None:
+                self.reset_at = float(reset)
+            until_reset = max(self.reset_at - time.time(), 0) + 1 if self.reset_at else SECONDARY_DELAY
+
+            throttled = response.status_code in (403, 429) and (
+                retry_after is not None or remaining == '0' or 'rate limit' in response.text.lower()
+            )
+            if throttled:
+                self.throttled += 1
+                if retry_after is not None:
+                    delay = float(retry_after)
+                elif remaining == '0':
+                    delay = until_reset
+                else:
+                    delay = SECONDARY_DELAY
+
+                # 次级限流说明并发过高，主限流耗尽时降低并发没有意义
+                if remaining != '0':
+                    self.limit = max(self.min_concurrency, self.limit // 2)
+                self._successes = 0
+                if self._paused_until <= time.monotonic():
+                    logger.warning(f'GitHub API限流，暂停 {delay:.0f} 秒，并发数调整为 {self.limit}')
+                self._pause(delay)
+                return delay
+
+            # 剩余次数不够正在进行的请求使用时提前暂停到重置时间
+            if self.remaining is not None and self.remaining <= self._active:
+                if self._paused_until <= time.monotonic():
+                    logger.warning(f'GitHub API剩余请求次数 {self.remaining}，暂停 {until_reset:.0f} 秒等待重置')
+                self._pause(until_reset)
+            elif self.limit < self.max_concurrency:
+                self._successes += 1
+                if self._successes >= RAISE_AFTER:
+                    self.limit += 1
+                    self._successes = 0
+                    self._cond.notify_all()
+            return None
+
+    def request(self, session, method, url, **kwargs):
+        """发送请求，被限流时等待后重试
+
+        Args:
+            session: requests.Session
+            method: HTTP方法
+            url: 请求地址
+            **kwargs: 传给 session.request 的参数，data是文件对象时重试前回到开头
+
+        Returns:
+            requests.Response: 最后一次请求的响应
+
+        Raises:
+            RateLimitExceeded: 需要等待的时间超过 max_wait
+        """
+        body = kwargs.get('data')
+        for attempt in range(self.max_retries + 1):
+            if attempt and hasattr(body, 'seek'):
+                body.seek(0)
+            self._acquire()
+            try:
+                response = session.request(method, url, **kwargs)
+            finally:
+                self._release()
+            if self._observe(response) is None or attempt == self.max_retries:
+                return response
+        return response
@@ -0,0 +1,150 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+采集运行日志
+记录每篇已保存的文章和每个已完成的来源，进程中途退出后，下一次运行从日志恢复，不再重复抓取
+"""
+
+import os
+import json
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class RunJournal:
+    """追加写入的运行日志（JSON Lines）
+
+    每个来源一个日志文件 <目录>/<来源>.jsonl，每条记录一行：
+    - files: 来源本次写入的数据文件
+    - article: 一篇已保存的文章
+    - done: 来源已完成及其统计
+
+    多个采集进程通过任务队列领取不同的来源，持有租约的进程是来源日志唯一的写入者，
+    进程之间不会互相改写或替换对方的日志文件。
+    每条记录写入后立即flush，进程被杀死时已写入的记录仍在系统缓存中；
+    来源完成时额外fsync，保证主机断电后已完成的来源不会丢失。
+    run() 正常结束时删除本轮涉及的来源的日志，目录中只留下未完成的来源。
+    完成记录超过 max_age 秒的日志来自更早的运行（例如进程在清理日志之前退出），
+    读取时整体丢弃，来源重新采集而不是被跳过一次。
+    """
+
+    def __init__(self, directory=None, max_age=None):
+        """初始化运行日志
+
+        Args:
+            directory: 日志目录，默认为STATE_DIR下的journal目录
+            max_age: 完成记录的有效期（秒），默认读取RUN_JOURNAL_MAX_AGE_MINUTES
+        """
+        self.directory = directory or os.path.join(os.getenv('STATE_DIR', 'state'), 'journal')
+        if max_age is None:
+            max_age = float(os.getenv('RUN_JOURNAL_MAX_AGE_MINUTES', '60')) * 60
+        self.max_age = max_age
+        self._jobs = {}
+        self._files = {}
+
+    def _path(self, name):
+        return os.path.join(self.directory, f'{name}.jsonl')
+
+    def _job(self, name):
+        """返回来源的记录，第一次访问时从日志文件读取上次未完成的记录"""
+        job = self._jobs.get(name)
+        if job is None:
+            job = self._jobs[name] = self._load(name)
+        return job
+
+    def _load(self, name):
+        job = {'files': [], 'articles': {}, 'stats': None}
+        path = self._path(name)
+        if not os.path.exists(path):
+            return job
+
+        with open(path, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    # 进程在写入过程中退出时，最后一行可能不完整
+                    logger.warning(f'{name} 的运行日志中有不完整的记录，已忽略')
+                    continue
+
+                if record['type'] == 'files':
+                    job['files'] = record['files']
+                elif record['type'] == 'article':
+                    job['articles'][record['article']['link']] = record['article']
+                elif record['type'] == 'done':
+                    job['stats'] = record['stats']
+                    job['finished_at'] = record.get('time', 0)
+
+        finished_at = job.pop('finished_at', None)
+        if finished_at is not None and time.time() - finished_at > self.max_age:
+            # 已完成但没有被清理的旧日志，数据文件已经写完，丢弃日志即可，不删除任何文件
+            logger.info(f'{name} 的运行日志已于 {time.ctime(finished_at)} 完成，视为过期并丢弃')
+            os.remove(path)
+            return {'files': [], 'articles': {}, 'stats': None}
+
+        logger.info(f'发现 {name} 未完成的运行日志')
+        return job
+
+    def _append(self, name, record, sync=False):
+        file = self._files.get(name)
+        if file is None:
+            os.makedirs(self.directory, exist_ok=True)
+            file = self._files[name] = open(self._path(name), 'a', encoding='utf-8')
+
+        record['time'] = time.time()
+        file.write(json.dumps(record, ensure_ascii=False) + '\n')
+        file.flush()
+        if sync:
+            os.fsync(file.fileno())
+
+    def finished(self, name):
+        """返回来源在上次中断前已完成时的统计，未完成时为None"""
+        return self._job(name)['stats']
+
+    def articles(self, name):
+        """返回来源在上次中断前已保存的文章"""
+        return list(self._job(name)['articles'].values())
+
+    def files(self, name):
+        """返回来源在上次中断前写入的数据文件"""
+        return list(self._job(name)['files'])
+
+    def record_files(self, name, paths):
+        """记录来源本次写入的数据文件"""
+        self._job(name)['files'] = list(paths)
+        self._append(name, {'type': 'files', 'files': list(paths)})
+
+    def record_article(self, name, article):
+        """记录一篇已保存的文章"""
+        self._job(name)['articles'][article['link']] = article
+        self._append(name, {'type': 'article', 'article': article})
+
+    def finish(self, name, stats):
+        """记录来源已完成"""
+        self._job(name)['stats'] = stats
+        self._append(name, {'type': 'done', 'stats': stats}, sync=True)
+
+    def clear(self, names):
+        """删除已处理完的来源的日志
+
+        Args:
+            names: 来源名称列表
+        """
+        for name in names:
+            self._jobs.pop(name, None)
+            file = self._files.pop(name, None)
+            if file is not None:
+                file.close()
+            try:
+                os.remove(self._path(name))
+            except FileNotFoundError:
+                pass
+
+    def close(self):
+        """关闭日志文件"""
+        for file in self._files.values():
+            file.close()
+        self._files = {}
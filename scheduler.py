@@ -7,34 +7,55 @@
 """
 
 import os
-import time
-import schedule
 import logging
-import datetime
-import subprocess
-from dotenv import load_dotenv
-from news_scraper import NewsScraperAutomation
-
-# 配置日志
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler("scheduler.log"),
-        logging.StreamHandler()
-    ]
-)
+from news_scraper import NewsScraperAutomation, job_names, init as init_scraper
+from poll_schedule import AdaptivePollSchedule
+from job_runner import JobRunner
+from work_queue import SourceQueue
+from git_sync import GitSync
 
 logger = logging.getLogger(__name__)
 
-# 加载环境变量
-load_dotenv()
+# 以下配置和对象读取环境变量，由 init() 在加载.env之后设置
+
+# 检查是否有来源到期的间隔（秒）
+POLL_CHECK_SECONDS = None
+
+# 每次从任务队列领取的来源数
+WORK_CLAIM_BATCH = None
+
+# Parquet导出目录，未设置时不导出
+PARQUET_DIR = None
+
+# 按来源自适应的采集计划
+poll_schedule = None
+
+# 多个采集进程共享的来源任务队列
+source_queue = None
 
-# 获取采集频率配置（小时）
-SCRAPE_INTERVAL = int(os.getenv('SCRAPE_INTERVAL', '6'))
+# 用git增量提交采集写入的文件，GIT_SHARD_BY_MONTH=1时按月份分到不同的仓库
+git_sync = None
+
+def init():
+    """配置日志、加载环境变量，并创建采集计划、任务队列和同步工具
+    
+    导入本模块时不做这些事，main() 开始时调用；单独调用 run_scraper_job() 之前也需要先调用。
+    """
+    global POLL_CHECK_SECONDS, WORK_CLAIM_BATCH, PARQUET_DIR
+    global poll_schedule, source_queue, git_sync
+    
+    init_scraper(log_file='scheduler.log')
+    
+    POLL_CHECK_SECONDS = int(os.getenv('POLL_CHECK_SECONDS', '60'))
+    WORK_CLAIM_BATCH = int(os.getenv('WORK_CLAIM_BATCH', '5'))
+    PARQUET_DIR = os.getenv('PARQUET_DIR')
+    
+    poll_schedule = AdaptivePollSchedule()
+    source_queue = SourceQueue()
+    git_sync = GitSync()
 
 def sync_to_github():
-    """将采集结果同步到GitHub"""
+    """将本轮采集写入的文件同步到GitHub"""
     try:
         # 获取GitHub配置
         github_token = os.getenv('GITHUB_TOKEN')
@@ -46,36 +67,67 @@ def sync_to_github():
             
         logger.info('开始同步数据到GitHub')
         
-        # 获取当前时间作为提交信息
-        commit_message = f'自动更新: {datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")}'
+        # 只暂存采集写入记录中的文件，不扫描整个data目录
+        count = git_sync.sync_pending()
         
-        # 执行Git命令
-        commands = [
-            'git add data/*',
-            f'git commit -m "{commit_message}"',
-            'git push origin main'
-        ]
-        
-        for cmd in commands:
-            process = subprocess.run(cmd, shell=True, capture_output=True, text=True)
-            if process.returncode != 0 and 'nothing to commit' not in process.stderr:
-                logger.error(f'Git命令失败: {cmd}
-{process.stderr}')
-                return
-                
-        logger.info('成功同步数据到GitHub')
+        logger.info(f'成功同步 {count} 个文件到GitHub')
         
     except Exception as e:
         logger.error(f'同步到GitHub失败: {str(e)}')
 
 def run_scraper_job():
-    """运行采集任务并同步到GitHub"""
+    """从任务队列领取到期的来源并采集，完成后同步到GitHub
+    
+    每隔POLL_CHECK_SECONDS调用一次，大多数时候没有到期的来源，
+    因此只在领取到来源后才创建采集器（抓取引擎、进程池和数据库连接）。
+    """
     try:
-        logger.info('开始定时采集任务')
-        
-        # 运行采集器
-        scraper = NewsScraperAutomation()
-        scraper.run()
+        scraper = None
+        completed = 0
+        try:
+            source_queue.ensure(job_names())
+            
+            # 每次领取一小批，采集期间定期续租，直到没有到期的来源
+            while True:
+                claimed = source_queue.claim(WORK_CLAIM_BATCH)
+                if not claimed:
+                    break
+                    
+                if scraper is None:
+                    scraper = NewsScraperAutomation()
+                logger.info(f'开始定时采集任务: {", ".join(claimed)}')
+                try:
+                    with source_queue.keep_alive(list(claimed)):
+                        results = scraper.run(list(claimed))
+                except Exception:
+                    source_queue.release(list(claimed))
+                    raise
+                
+                # 根据结果安排各来源的下一次采集
+                for name, stats in results.items():
+                    state = claimed[name]
+                    if stats.get('error'):
+                        # 抓取失败不代表来源没有更新，不参与发布频率的估计
+                        poll_schedule.retry(name, state)
+                    else:
+                        poll_schedule.plan(name, state, stats['new_items'], stats['entry_times'])
+                    if source_queue.complete(name, state['next_due'], state):
+                        completed += 1
+        finally:
+            if scraper is not None:
+                scraper.close()
+            
+        if not completed:
+            return
+            
+        # 增量更新Parquet分区
+        if PARQUET_DIR:
+            try:
+                # pyarrow较重，只在需要导出时导入
+                from parquet_export import ParquetExporter
+                ParquetExporter(out_dir=PARQUET_DIR).export()
+            except Exception as e:
+                logger.error(f'导出Parquet失败: {str(e)}')
         
         # 同步到GitHub
         sync_to_github()
@@ -87,18 +139,21 @@ def run_scraper_job():
 
 def main():
     """主函数"""
-    logger.info(f'启动定时任务调度器，采集频率: {SCRAPE_INTERVAL}小时')
+    init()
     
-    # 立即运行一次
-    run_scraper_job()
+    logger.info(f'启动定时任务调度器，各来源采集间隔在 {poll_schedule.min_interval / 60:.0f} 分钟'
+                f'到 {poll_schedule.max_interval / 60:.0f} 分钟之间自适应调整')
     
-    # 设置定时任务
-    schedule.every(SCRAPE_INTERVAL).hours.do(run_scraper_job)
+    # 采集任务在后台线程中运行，结束后再过POLL_CHECK_SECONDS检查下一批到期来源
+    runner = JobRunner()
+    runner.add('scrape', run_scraper_job, POLL_CHECK_SECONDS)
     
     # 运行调度器
-    while True:
-        schedule.run_pending()
-        time.sleep(60)
+    try:
+        runner.run_forever()
+    except KeyboardInterrupt:
+        logger.info('收到退出信号，等待正在运行的任务结束')
+        runner.stop()
 
 if __name__ == '__main__':
     main()
@@ -0,0 +1,354 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+文章存储
+按日期和来源写入文件，支持边抓取边写入：
+- jsonl: 每天每个来源一个追加写入的JSON Lines文件，超过大小上限时轮转
+- json: 每次运行一个格式化的JSON数组文件和一个CSV文件
+"""
+
+import os
+import re
+import csv
+import json
+import time
+import datetime
+import logging
+
+from body_store import BodyStore
+
+logger = logging.getLogger(__name__)
+
+# 数据目录下按日期命名的子目录
+_DAY_RE = re.compile(r'\d{4}-\d{2}-\d{2}')
+
+# CSV中保留的主要字段
+CSV_FIELDS = ['title', 'published', 'source', 'link', 'summary']
+
+
+class ArticleSink:
+    """流式文章写入器
+
+    每写入一篇文章就追加到 data/<日期>/<来源>/ 下的JSON数组和CSV文件中，
+    内存中不保留已写入的文章。文件在第一次写入时才创建。
+    """
+
+    # 中途退出时留下的是不完整的JSON数组，恢复时需要删除后重写
+    append_only = False
+
+    def __init__(self, data_dir, source_name, on_open=None):
+        """初始化写入器
+
+        Args:
+            data_dir: 数据根目录
+            source_name: 来源名称
+            on_open: 创建文件前调用的函数，参数为JSON和CSV文件路径
+        """
+        self.data_dir = data_dir
+        self.source_name = source_name
+        self.on_open = on_open
+        self.count = 0
+        self.json_path = None
+        self.csv_path = None
+        self.paths = []
+        self._json_file = None
+        self._csv_file = None
+        self._csv_writer = None
+
+    def _open(self):
+        # 创建按日期和来源的目录
+        today = datetime.datetime.now().strftime('%Y-%m-%d')
+        source_dir = os.path.join(self.data_dir, today, self.source_name)
+        os.makedirs(source_dir, exist_ok=True)
+
+        timestamp = int(time.time())
+        self.json_path = os.path.join(source_dir, f'{self.source_name}_{timestamp}.json')
+        self.csv_path = os.path.join(source_dir, f'{self.source_name}_{timestamp}.csv')
+        if self.on_open is not None:
+            self.on_open(self.json_path, self.csv_path)
+        self.paths = [self.json_path, self.csv_path]
+
+        self._json_file = open(self.json_path, 'w', encoding='utf-8')
+        self._json_file.write('[')
+
+        try:
+            self._csv_file = open(self.csv_path, 'w', encoding='utf-8', newline='')
+            self._csv_writer = csv.DictWriter(self._csv_file, fieldnames=CSV_FIELDS, lineterminator='\n')
+            self._csv_writer.writeheader()
+        except Exception as e:
+            logger.error(f'创建CSV失败: {str(e)}')
+
+    def write(self, article):
+        """追加一篇文章
+
+        Args:
+            article: 文章字典
+        """
+        if self._json_file is None:
+            self._open()
+
+        # 与json.dump(indent=4)的数组格式保持一致
+        body = json.dumps(article, ensure_ascii=False, indent=4).replace('\n', '\n    ')
+        self._json_file.write((',\n    ' if self.count else '\n    ') + body)
+        self.count += 1
+
+        if self._csv_writer is not None:
+            summary = article.get('summary', '')
+            self._csv_writer.writerow({
+                'title': article.get('title', ''),
+                'published': article.get('published', ''),
+                'source': article.get('source', ''),
+                'link': article.get('link', ''),
+                'summary': summary[:100] + '...' if summary else ''
+            })
+
+    def close(self):
+        """结束写入并关闭文件"""
+        if self._json_file is None:
+            logger.warning(f'没有从 {self.source_name} 抓取到文章')
+            return
+
+        self._json_file.write('\n]' if self.count else ']')
+        self._json_file.close()
+        self._json_file = None
+        logger.info(f'已保存 {self.count} 篇文章到 {self.json_path}')
+
+        if self._csv_file is not None:
+            self._csv_file.close()
+            self._csv_file = None
+            logger.info(f'已保存CSV格式到 {self.csv_path}')
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+class JsonlSink:
+    """追加写入的JSON Lines文章存储
+
+    每篇文章压缩成一行追加到 data/<日期>/<来源>/<来源>.jsonl，写入量只与新文章数成正比。
+    当前文件超过 JSONL_MAX_MB 时轮转到 <来源>.1.jsonl、<来源>.2.jsonl ……
+    每次写入后flush，每 JSONL_FSYNC_EVERY 篇文章和关闭时fsync一次。
+    """
+
+    # 已写入的文章直接留在文件中，中途退出后不需要重写
+    append_only = True
+
+    def __init__(self, data_dir, source_name, max_bytes=None, fsync_every=None, on_open=None):
+        """初始化写入器
+
+        Args:
+            data_dir: 数据根目录
+            source_name: 来源名称
+            max_bytes: 单个文件的大小上限（字节）
+            fsync_every: 每写入多少篇文章fsync一次
+            on_open: 打开每个分段文件前调用的函数，参数为文件路径
+        """
+        self.data_dir = data_dir
+        self.source_name = source_name
+        self.on_open = on_open
+        self.max_bytes = max_bytes or int(float(os.getenv('JSONL_MAX_MB', '64')) * 1024 * 1024)
+        self.fsync_every = fsync_every or int(os.getenv('JSONL_FSYNC_EVERY', '50'))
+        self.count = 0
+        self.path = None
+        self.paths = []
+        self._file = None
+        self._size = 0
+        self._unsynced = 0
+
+    def _open(self):
+        # 创建按日期和来源的目录
+        today = datetime.datetime.now().strftime('%Y-%m-%d')
+        source_dir = os.path.join(self.data_dir, today, self.source_name)
+        os.makedirs(source_dir, exist_ok=True)
+
+        # 继续写入当天最新的分段
+        segments = jsonl_segments(source_dir, self.source_name)
+        self._open_segment(segments[-1] if segments else os.path.join(source_dir, f'{self.source_name}.jsonl'))
+
+    def _open_segment(self, path):
+        if self.on_open is not None:
+            self.on_open(path)
+        self.path = path
+        self.paths.append(path)
+        self._file = open(path, 'ab')
+        self._size = self._file.tell()
+
+        # 上次写入时进程退出可能留下不完整的最后一行，先补上换行，读取时会跳过这一行
+        if self._size:
+            with open(path, 'rb') as f:
+                f.seek(-1, os.SEEK_END)
+                if f.read(1) != b'\n':
+                    self._file.write(b'\n')
+                    self._size += 1
+
+    def _rotate(self):
+        self._sync()
+        self._file.close()
+
+        source_dir = os.path.dirname(self.path)
+        index = _segment_index(os.path.basename(self.path), self.source_name) + 1
+        self._open_segment(os.path.join(source_dir, f'{self.source_name}.{index}.jsonl'))
+        logger.info(f'{self.source_name} 的文件超过 {self.max_bytes} 字节，轮转到 {self.path}')
+
+    def _sync(self):
+        if self._unsynced:
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            self._unsynced = 0
+
+    def write(self, article):
+        """追加一篇文章
+
+        Args:
+            article: 文章字典
+        """
+        if self._file is None:
+            self._open()
+
+        line = (json.dumps(article, ensure_ascii=False, separators=(',', ':')) + '\n').encode('utf-8')
+        if self._size and self._size + len(line) > self.max_bytes:
+            self._rotate()
+
+        self._file.write(line)
+        self._file.flush()
+        self._size += len(line)
+        self.count += 1
+
+        self._unsynced += 1
+        if self._unsynced >= self.fsync_every:
+            self._sync()
+
+    def close(self):
+        """结束写入并关闭文件"""
+        if self._file is None:
+            logger.warning(f'没有从 {self.source_name} 抓取到文章')
+            return
+
+        self._sync()
+        self._file.close()
+        self._file = None
+        logger.info(f'已追加 {self.count} 篇文章到 {self.path}')
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+def _segment_index(filename, source_name):
+    """返回分段文件的序号，<来源>.jsonl 为0，不是该来源的分段时为None"""
+    if filename == f'{source_name}.jsonl':
+        return 0
+    match = re.fullmatch(re.escape(source_name) + r'\.(\d+)\.jsonl', filename)
+    return int(match.group(1)) if match else None
+
+
+def jsonl_segments(source_dir, source_name):
+    """按写入顺序返回来源目录下的JSON Lines分段文件"""
+    if not os.path.isdir(source_dir):
+        return []
+    indexed = [
+        (_segment_index(filename, source_name), filename) for filename in os.listdir(source_dir)
+    ]
+    return [os.path.join(source_dir, filename) for index, filename in sorted(
+        item for item in indexed if item[0] is not None
+    )]
+
+
+def iter_jsonl(path):
+    """逐行读取JSON Lines文件中的文章，跳过不完整的行
+
+    Args:
+        path: 文件路径
+
+    Yields:
+        dict: 文章字典
+    """
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            if not line.strip():
+                continue
+            try:
+                yield json.loads(line)
+            except ValueError:
+                logger.warning(f'跳过不完整的记录: {path}')
+
+
+def iter_partitions(data_dir):
+    """按日期和来源遍历数据目录
+
+    Args:
+        data_dir: 数据根目录
+
+    Yields:
+        tuple: (日期, 来源名称, 来源目录)
+    """
+    if not os.path.isdir(data_dir):
+        return
+
+    for day in sorted(os.listdir(data_dir)):
+        day_dir = os.path.join(data_dir, day)
+        if not _DAY_RE.fullmatch(day) or not os.path.isdir(day_dir):
+            continue
+        for source_name in sorted(os.listdir(day_dir)):
+            source_dir = os.path.join(day_dir, source_name)
+            if os.path.isdir(source_dir):
+                yield day, source_name, source_dir
+
+
+def iter_source_dir(source_dir, source_name, bodies=None):
+    """流式读取一个来源目录中保存的文章
+
+    同时支持JSON Lines分段文件和每次运行一个的JSON数组文件。
+
+    Args:
+        source_dir: 来源目录
+        source_name: 来源名称
+        bodies: 正文存储，给出时根据 text_hash 恢复正文
+
+    Yields:
+        dict: 文章字典，按写入顺序产出
+    """
+    for article in _iter_source_files(source_dir, source_name):
+        yield bodies.hydrate(article) if bodies is not None else article
+
+
+def _iter_source_files(source_dir, source_name):
+    for path in jsonl_segments(source_dir, source_name):
+        yield from iter_jsonl(path)
+
+    for filename in sorted(os.listdir(source_dir)):
+        if not filename.endswith('.json'):
+            continue
+        path = os.path.join(source_dir, filename)
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                articles = json.load(f)
+        except ValueError:
+            logger.warning(f'跳过无法解析的文件: {path}')
+            continue
+        yield from articles
+
+
+def iter_articles(data_dir, date=None, source_name=None, hydrate=True):
+    """流式读取数据目录中保存的文章
+
+    Args:
+        data_dir: 数据根目录
+        date: 只读取某一天（YYYY-MM-DD）的文章
+        source_name: 只读取某个来源的文章
+        hydrate: 是否从 data/bodies 恢复只保存了 text_hash 的正文
+
+    Yields:
+        dict: 文章字典，按日期、来源和写入顺序产出
+    """
+    bodies = BodyStore(os.path.join(data_dir, 'bodies')) if hydrate else None
+    for day, name, source_dir in iter_partitions(data_dir):
+        if (date and day != date) or (source_name and name != source_name):
+            continue
+        yield from iter_source_dir(source_dir, name, bodies)
@@ -0,0 +1,143 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+GitHub同步清单
+在本地记录已上传到GitHub的每个文件的git blob SHA，下次同步时只上传内容有变化的文件
+"""
+
+import os
+import json
+import hashlib
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+
+def git_blob_sha(path):
+    """按git的方式计算文件的blob SHA1，与GitHub contents API返回的sha一致"""
+    digest = hashlib.sha1()
+    digest.update(f'blob {os.path.getsize(path)}\0'.encode('ascii'))
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class SyncManifest:
+    """仓库路径到已上传blob SHA的持久化清单
+
+    每条记录同时保存本地文件的大小和修改时间，文件没有变化时不需要重新计算SHA。
+    已创建blob但还没有提交的文件记录在 blob 字段中，中断后再次同步时不需要重新上传。
+    清单按仓库分开保存，换了GITHUB_REPO之后会重新上传。
+    """
+
+    def __init__(self, repo, path=None):
+        """初始化清单
+
+        Args:
+            repo: GitHub仓库，如 user/repo
+            path: JSON文件路径，默认保存在STATE_DIR目录下
+        """
+        self.repo = repo
+        self.path = path or os.path.join(os.getenv('STATE_DIR', 'state'), 'github_manifest.json')
+        self._lock = threading.Lock()
+        self._repos = {}
+        self._dirty = False
+
+        if os.path.exists(self.path):
+            try:
+                with open(self.path, 'r', encoding='utf-8') as f:
+                    self._repos = json.load(f)
+            except Exception as e:
+                logger.warning(f'读取同步清单失败: {self.path}, 错误: {str(e)}')
+        self._entries = self._repos.setdefault(repo, {})
+
+    def remote_sha(self, repo_path):
+        """返回上次上传后远端文件的SHA，未上传过时为None"""
+        with self._lock:
+            entry = self._entries.get(repo_path)
+        return entry.get('sha') if entry else None
+
+    def uploaded_sha(self, repo_path):
+        """返回已创建但还没有提交的blob SHA，没有时为None"""
+        with self._lock:
+            entry = self._entries.get(repo_path)
+        return entry.get('blob') if entry else None
+
+    def mark_uploaded(self, repo_path, sha):
+        """记录文件的blob已创建，提交后由 record() 清除"""
+        with self._lock:
+            entry = self._entries.setdefault(repo_path, {})
+            if entry.get('blob') != sha:
+                entry['blob'] = sha
+                self._dirty = True
+
+    def forget_uploaded(self):
+        """清除所有未提交的blob记录，远端已清理这些blob时使用"""
+        with self._lock:
+            for entry in self._entries.values():
+                if entry.pop('blob', None) is not None:
+                    self._dirty = True
+
+    def local_sha(self, local_path, repo_path):
+        """计算本地文件的blob SHA，大小和修改时间与清单记录一致时直接使用记录的SHA
+
+        Returns:
+            tuple: (blob SHA, 文件状态)，文件状态传给 record() 保存
+        """
+        stat = os.stat(local_path)
+        with self._lock:
+            entry = self._entries.get(repo_path)
+        if entry and 'sha' in entry and entry.get('size') == stat.st_size and entry.get('mtime') == stat.st_mtime_ns:
+            return entry['sha'], stat
+        return git_blob_sha(local_path), stat
+
+    def changed(self, local_path, repo_path):
+        """判断本地文件与上次上传的内容是否不同
+
+        Returns:
+            tuple: (是否需要上传, 本地blob SHA, 文件状态)
+        """
+        sha, stat = self.local_sha(local_path, repo_path)
+        return sha != self.remote_sha(repo_path), sha, stat
+
+    def record(self, repo_path, sha, stat=None):
+        """记录文件已上传
+
+        Args:
+            repo_path: 仓库中的路径
+            sha: 远端文件的blob SHA
+            stat: 本地文件状态，用于下次跳过SHA计算
+        """
+        entry = {'sha': sha}
+        if stat is not None:
+            entry['size'] = stat.st_size
+            entry['mtime'] = stat.st_mtime_ns
+        with self._lock:
+            if self._entries.get(repo_path) != entry:
+                self._entries[repo_path] = entry
+                self._dirty = True
+
+    def forget(self, repo_path):
+        """删除文件的记录，下次同步时重新检查远端"""
+        with self._lock:
+            if self._entries.pop(repo_path, None) is not None:
+                self._dirty = True
+
+    def __len__(self):
+        with self._lock:
+            return len(self._entries)
+
+    def save(self):
+        """有变化时写入磁盘"""
+        with self._lock:
+            if not self._dirty:
+                return
+            os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+            tmp_path = f'{self.path}.tmp'
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(self._repos, f, ensure_ascii=False, indent=1)
+            os.replace(tmp_path, self.path)
+            self._dirty = False
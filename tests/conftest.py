@@ -0,0 +1,18 @@
+# -*- coding: utf-8 -*-
+
+"""测试公共配置：让测试可以直接导入仓库根目录下的模块，状态文件写到临时目录"""
+
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture(autouse=True)
+def state_dir(tmp_path, monkeypatch):
+    """每个测试使用独立的工作目录和STATE_DIR"""
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setenv('STATE_DIR', str(tmp_path / 'state'))
+    return tmp_path / 'state'
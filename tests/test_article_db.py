@@ -0,0 +1,67 @@
+# -*- coding: utf-8 -*-
+
+import sqlite3
+
+import pytest
+
+from article_db import ArticleDatabase
+
+
+@pytest.fixture
+def db(tmp_path):
+    db = ArticleDatabase(str(tmp_path / 'articles.db'))
+    db.add({'link': 'http://x/1', 'title': '人工智能发展', 'summary': 'AI 新闻', 'text': '机器学习 正在改变世界, climate'}, 's')
+    db.add({'link': 'http://x/2', 'title': '经济新闻', 'summary': '', 'text': '股市上涨 market rally climate'}, 's')
+    yield db
+    db.close()
+
+
+def _urls(db, query):
+    return [row['url'] for row in db.search(query)]
+
+
+@pytest.mark.parametrize('query, expected', [
+    ('智能', ['http://x/1']),
+    ('AI', ['http://x/1']),
+    ('ai', ['http://x/1']),
+    ('机', ['http://x/1']),
+    ('学习 climate', ['http://x/1']),
+    ('上涨 rally', ['http://x/2']),
+    ('改变 股市', []),
+])
+def test_short_terms_use_bigram_index(db, query, expected):
+    assert _urls(db, query) == expected
+
+
+def test_fts_operators_are_not_rewritten(db):
+    """含有FTS5运算符的查询原样交给FTS5，不把运算符当作普通的词"""
+    assert sorted(_urls(db, 'climate OR ab')) == ['http://x/1', 'http://x/2']
+    assert sorted(_urls(db, 'climate NOT rally')) == ['http://x/1']
+    assert _urls(db, '"机器学习"') == ['http://x/1']
+
+
+def test_bigram_index_follows_updates(db):
+    db.add({'link': 'http://x/2', 'title': '经济新闻', 'summary': '', 'text': '股市下跌'}, 's')
+    assert _urls(db, '上涨') == []
+    assert _urls(db, '下跌') == ['http://x/2']
+
+
+def test_bigram_index_is_backfilled(db, tmp_path):
+    db.close()
+    conn = sqlite3.connect(str(tmp_path / 'articles.db'))
+    conn.executescript('''
+        DROP TRIGGER articles_bigram_ai; DROP TRIGGER articles_bigram_ad; DROP TRIGGER articles_bigram_au;
+        DROP TABLE articles_bigram;
+    ''')
+    conn.close()
+
+    reopened = ArticleDatabase(str(tmp_path / 'articles.db'))
+    try:
+        assert _urls(reopened, '上涨') == ['http://x/2']
+    finally:
+        reopened.close()
+
+
+def test_failed_fetch_does_not_overwrite_text(db):
+    db.add({'link': 'http://x/1', 'title': '人工智能发展', 'summary': 'AI 新闻', 'text': '', 'error': 'timeout'}, 's')
+    assert _urls(db, '机器学习') == ['http://x/1']
@@ -0,0 +1,65 @@
+# -*- coding: utf-8 -*-
+
+import pytest
+
+from body_store import BodyStore, NO_DICT
+
+SAMPLES = [
+    f'Reuters reported on Monday that the central bank kept rates unchanged. Story {i} adds local details.'
+    for i in range(30)
+]
+
+
+@pytest.mark.parametrize('codec', ['zlib', 'zstd'])
+def test_round_trip(tmp_path, codec):
+    if codec == 'zstd':
+        pytest.importorskip('zstandard')
+    store = BodyStore(str(tmp_path / 'bodies'), codec=codec)
+    digest = store.put('正文内容 body text')
+    assert store.get(digest) == '正文内容 body text'
+    assert store.put('正文内容 body text') == digest
+    assert store.hydrate(store.externalize({'text': '正文内容 body text'})) == {'text': '正文内容 body text'}
+
+
+def test_read_only_use_does_not_scan_bodies(tmp_path, monkeypatch):
+    store = BodyStore(str(tmp_path / 'bodies'), codec='zlib')
+    digest = store.put('already stored')
+
+    def scan():
+        raise AssertionError('只读使用时不应遍历正文目录')
+
+    monkeypatch.setattr(BodyStore, 'iter_bodies', lambda self: scan())
+    reader = BodyStore(str(tmp_path / 'bodies'), codec='zlib')
+    assert reader.get(digest) == 'already stored'
+
+
+def test_dictionary_is_trained_in_background(tmp_path, monkeypatch):
+    monkeypatch.setenv('BODY_DICT_MIN_SAMPLES', '20')
+    store = BodyStore(str(tmp_path / 'bodies'), codec='zlib')
+    digests = [store.put(sample) for sample in SAMPLES[:20]]
+    store.wait_training()
+    assert store._dict_id != NO_DICT
+
+    digest = store.put(SAMPLES[25])
+    assert len(store.files(digest)) == 2
+    assert [store.get(d) for d in digests] == SAMPLES[:20]
+
+
+def test_failed_training_backs_off(tmp_path, monkeypatch):
+    monkeypatch.setenv('BODY_DICT_MIN_SAMPLES', '5')
+    store = BodyStore(str(tmp_path / 'bodies'), codec='zlib')
+    calls = []
+
+    def fail(*args, **kwargs):
+        calls.append(1)
+        return None
+
+    monkeypatch.setattr(store, 'train_from_store', fail)
+    for i in range(9):
+        store.put(f'body {i}')
+        store.wait_training()
+    assert len(calls) == 1
+
+    store.put('body 9')
+    store.wait_training()
+    assert len(calls) == 2
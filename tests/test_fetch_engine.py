@@ -0,0 +1,131 @@
+# -*- coding: utf-8 -*-
+
+import os
+import sys
+import time
+import signal
+import threading
+import subprocess
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+import pytest
+import requests
+
+from fetch_engine import FetchEngine, extract_article
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+HTML = '''<html><head><title>Test article</title>
+</head>
+<body><article><h1>Test article</h1>
+<p>''' + 'This is a long enough paragraph so that the extractor can find the body of the article. ' * 20 + '''</p>
+<img src="http://images.invalid/inline.jpg"></article></body></html>'''
+
+
+def test_extract_article_does_not_fetch_images(monkeypatch):
+    # newspaper会吞掉请求中的异常，所以记录调用而不是抛出异常
+    calls = []
+
+    def no_network(*args, **kwargs):
+        calls.append(args)
+        raise requests.ConnectionError('解析阶段不应发起网络请求')
+
+    monkeypatch.setattr(requests, 'get', no_network)
+    monkeypatch.setattr(requests.Session, 'request', no_network)
+
+    article = extract_article('http://example.invalid/a', HTML)
+    assert calls == []
+    assert 'paragraph' in article['text']
+    assert article['top_image'] == 'http://images.invalid/inline.jpg'
+
+
+_CHILD = '''
+import sys
+sys.path.insert(0, {root!r})
+from fetch_engine import FetchEngine
+engine = FetchEngine()
+list(engine._parse_executor.map(len, ['a', 'b']))
+print(' '.join(str(pid) for pid in engine._parse_executor._processes), flush=True)
+import time
+time.sleep(60)
+'''
+
+
+def _alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    # 已退出但还没被回收的进程也算退出
+    try:
+        with open(f'/proc/{pid}/stat') as f:
+            return f.read().split(')')[-1].split()[0] != 'Z'
+    except FileNotFoundError:
+        return False
+
+
+@pytest.mark.skipif(sys.platform != 'linux', reason='依赖 /proc')
+def test_parse_workers_exit_with_parent():
+    child = subprocess.Popen(
+        [sys.executable, '-c', _CHILD.format(root=ROOT)], stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True
+    )
+    try:
+        pids = [int(pid) for pid in child.stdout.readline().split()]
+        assert pids
+        child.send_signal(signal.SIGKILL)
+        child.wait()
+
+        deadline = time.monotonic() + 10
+        while any(_alive(pid) for pid in pids) and time.monotonic() < deadline:
+            time.sleep(0.2)
+        assert not any(_alive(pid) for pid in pids)
+    finally:
+        child.kill()
+
+
+class _SlowHandler(BaseHTTPRequestHandler):
+    lock = threading.Lock()
+    active = 0
+    max_active = 0
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        cls = type(self)
+        with cls.lock:
+            cls.active += 1
+            cls.max_active = max(cls.max_active, cls.active)
+        try:
+            time.sleep(1)
+            body = b'<html><body><p>slow</p></body></html>'
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/html')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        except OSError:
+            pass
+        finally:
+            with cls.lock:
+                cls.active -= 1
+
+
+def test_timed_out_download_keeps_host_slot(monkeypatch):
+    """文章超时后，线程中的下载结束前同一主机不开始新的下载"""
+    monkeypatch.setenv('ARTICLE_BUDGET', '0.3')
+    monkeypatch.setenv('HOST_RATE', '100')
+    handler = type('Handler', (_SlowHandler,), {'lock': threading.Lock(), 'active': 0, 'max_active': 0})
+    server = ThreadingHTTPServer(('127.0.0.1', 0), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    engine = FetchEngine(per_host=1, parse_workers=1)
+    try:
+        urls = [f'http://127.0.0.1:{server.server_port}/{i}' for i in range(3)]
+        results = engine.fetch_articles(urls)
+        assert all(content['error'] == 'timeout' for content in results)
+        assert handler.max_active == 1
+    finally:
+        engine.close()
+        server.shutdown()
+        server.server_close()
@@ -0,0 +1,84 @@
+# -*- coding: utf-8 -*-
+
+import os
+import subprocess
+
+import pytest
+
+from git_sync import GitSync
+from write_log import WriteLog
+
+
+def _git(cwd, *args):
+    return subprocess.run(['git', *args], cwd=cwd, capture_output=True, text=True, check=True).stdout
+
+
+def _write(path, text='{}\n'):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(text)
+
+
+@pytest.fixture
+def work_tree(tmp_path, monkeypatch):
+    # 没有全局git身份的主机
+    monkeypatch.setenv('HOME', str(tmp_path / 'home'))
+    monkeypatch.setenv('GIT_CONFIG_NOSYSTEM', '1')
+    work = tmp_path / 'work'
+    work.mkdir()
+    _git(work, 'init', '-q', '-b', 'main')
+    _git(work, 'config', 'user.name', 'Bot')
+    _git(work, 'config', 'user.email', 'bot@example.com')
+    return work
+
+
+def test_sync_pending_commits_and_pushes(work_tree, tmp_path):
+    remote = tmp_path / 'remote.git'
+    _git(tmp_path, 'init', '-q', '--bare', str(remote))
+    _git(work_tree, 'remote', 'add', 'origin', str(remote))
+
+    _write(work_tree / 'data/2026-10-01/cnn/cnn.jsonl')
+    log = WriteLog(str(tmp_path / 'write_log.txt'))
+    log.add(work_tree / 'data/2026-10-01/cnn/cnn.jsonl')
+
+    assert GitSync(str(work_tree), branch='main').sync_pending(log) == 1
+    assert _git(remote, 'ls-tree', '-r', '--name-only', 'main').split() == ['data/2026-10-01/cnn/cnn.jsonl']
+    assert log.take()[1] == []
+
+
+def test_failed_push_raises_and_keeps_log(work_tree, tmp_path):
+    _git(work_tree, 'remote', 'add', 'origin', str(tmp_path / 'missing.git'))
+    _write(work_tree / 'data/2026-10-01/cnn/cnn.jsonl')
+    log = WriteLog(str(tmp_path / 'write_log.txt'))
+    log.add(work_tree / 'data/2026-10-01/cnn/cnn.jsonl')
+
+    with pytest.raises(RuntimeError):
+        GitSync(str(work_tree), branch='main').sync_pending(log)
+    assert log.take()[1] == [str(work_tree / 'data/2026-10-01/cnn/cnn.jsonl')]
+
+
+def test_month_shards_contain_referenced_bodies(work_tree, tmp_path):
+    for month in ('2026-09', '2026-10'):
+        _write(work_tree / f'data/{month}-01/cnn/cnn.jsonl')
+    _write(work_tree / 'data/bodies/ab/ab.body', 'body')
+    _write(work_tree / 'data/bodies/dict/0123456789abcdef.dict', 'dict')
+
+    log = WriteLog(str(tmp_path / 'write_log.txt'))
+    for month in ('2026-09', '2026-10'):
+        record = work_tree / f'data/{month}-01/cnn/cnn.jsonl'
+        log.add(record)
+        log.add_refs([
+            (work_tree / 'data/bodies/ab/ab.body', record),
+            (work_tree / 'data/bodies/dict/0123456789abcdef.dict', record),
+        ])
+
+    syncer = GitSync(str(work_tree), branch='main', shard_by_month=True, shard_dir=str(tmp_path / 'shards'), shard_remote='')
+    assert syncer.sync_pending(log) == 6
+
+    for month in ('2026-09', '2026-10'):
+        git_dir = f'--git-dir={tmp_path / "shards" / (month + ".git")}'
+        files = _git(work_tree, git_dir, 'ls-tree', '-r', '--name-only', 'HEAD').split()
+        assert sorted(files) == sorted([
+            'data/bodies/ab/ab.body', 'data/bodies/dict/0123456789abcdef.dict', f'data/{month}-01/cnn/cnn.jsonl'
+        ])
+        assert _git(work_tree, git_dir, 'log', '--format=%an <%ae>').strip() == 'Bot <bot@example.com>'
@@ -0,0 +1,112 @@
+# -*- coding: utf-8 -*-
+
+import threading
+
+import pytest
+
+import fake_github
+from github_sync import GitHubSync
+
+
+@pytest.fixture
+def github(monkeypatch):
+    """启动本地GitHub API替身，返回创建服务器的函数"""
+    servers = []
+
+    def start(**kwargs):
+        server = fake_github.serve(port=0, **kwargs)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        servers.append(server)
+        monkeypatch.setenv('GITHUB_API_URL', f'http://127.0.0.1:{server.server_address[1]}')
+        monkeypatch.setenv('GITHUB_TOKEN', 'test-token')
+        monkeypatch.setenv('GITHUB_REPO', 'user/news')
+        return server
+
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+
+@pytest.fixture
+def data(tmp_path):
+    root = tmp_path / 'data'
+    for i in range(5):
+        path = root / 'cnn' / f'2026-10-0{i + 1}.json'
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(f'[{{"title": "新闻 {i}"}}]', encoding='utf-8')
+    (root / 'bodies').mkdir()
+    (root / 'bodies' / 'ab.body').write_bytes(b'\x00\x01\xff')
+    (root / 'notes.txt').write_text('不同步', encoding='utf-8')
+    return root
+
+
+def _head_files(server):
+    repository = server.repository
+    with repository.lock:
+        files = repository.head_files('main')
+        return {path: repository.blobs[sha] for path, sha in files.items()}
+
+
+def test_batch_sync_makes_one_commit_and_skips_unchanged_files(github, data):
+    server = github()
+    syncer = GitHubSync()
+    assert syncer.sync_directory(str(data)) == 6
+
+    files = _head_files(server)
+    assert sorted(files) == sorted(['README.md', 'bodies/ab.body'] + [f'cnn/2026-10-0{i + 1}.json' for i in range(5)])
+    assert files['bodies/ab.body'] == b'\x00\x01\xff'
+    assert server.repository.calls['POST commits'] == 1
+    assert server.repository.calls['POST blobs'] == 6
+
+    # 清单保存在磁盘上，新的同步工具也不会重复上传
+    assert GitHubSync().sync_directory(str(data)) == 0
+    assert server.repository.calls['POST blobs'] == 6
+
+    (data / 'cnn' / '2026-10-01.json').write_text('[]', encoding='utf-8')
+    assert GitHubSync().sync_directory(str(data)) == 1
+    assert _head_files(server)['cnn/2026-10-01.json'] == b'[]'
+    assert server.repository.calls['POST blobs'] == 7
+
+
+def test_empty_repository_falls_back_to_contents_api(github, data):
+    server = github(empty=True)
+    assert GitHubSync().sync_directory(str(data)) == 6
+    assert len(_head_files(server)) == 6
+    assert server.repository.calls['PUT contents'] == 6
+
+
+def test_contents_mode_updates_existing_files(github, data, monkeypatch):
+    monkeypatch.setenv('GITHUB_SYNC_MODE', 'contents')
+    server = github()
+    assert GitHubSync().sync_directory(str(data)) == 6
+
+    (data / 'cnn' / '2026-10-02.json').write_text('[{"title": "更新"}]', encoding='utf-8')
+    assert GitHubSync().sync_directory(str(data)) == 1
+    assert _head_files(server)['cnn/2026-10-02.json'] == '[{"title": "更新"}]'.encode('utf-8')
+    assert server.repository.calls['PUT contents'] == 7
+
+
+def test_secondary_rate_limit_is_retried(github, data, monkeypatch):
+    monkeypatch.setenv('GITHUB_SYNC_WORKERS', '6')
+    server = github(latency=0.05, limits=fake_github.RateLimits(max_concurrent=2, retry_after=0.1))
+    syncer = GitHubSync()
+    assert syncer.sync_directory(str(data)) == 6
+    assert len(_head_files(server)) == 7
+    assert server.RequestHandlerClass.limits.rejected['secondary'] > 0
+    assert syncer.limiter.limit < 6
+
+
+def test_exhausted_rate_limit_resumes_with_uploaded_blobs(github, data, monkeypatch):
+    """主限流耗尽时停止同步，已创建的blob记录在清单中，下次同步不再上传"""
+    monkeypatch.setenv('GITHUB_SYNC_WORKERS', '1')
+    monkeypatch.setenv('GITHUB_MAX_WAIT', '0')
+    limits = fake_github.RateLimits(limit=4, window=3600)
+    server = github(limits=limits)
+    assert GitHubSync().sync_directory(str(data)) == 0
+    assert server.repository.calls['POST blobs'] == 4
+
+    limits.limit = 0
+    assert GitHubSync().sync_directory(str(data)) == 6
+    assert server.repository.calls['POST blobs'] == 6
+    assert len(_head_files(server)) == 7
@@ -0,0 +1,82 @@
+# -*- coding: utf-8 -*-
+
+import pytest
+
+import news_scraper
+
+
+@pytest.fixture
+def scraper(tmp_path, monkeypatch):
+    monkeypatch.setenv('NEWS_SOURCES', 'cnn')
+    monkeypatch.setenv('ARTICLE_DB_PATH', str(tmp_path / 'articles.db'))
+    monkeypatch.setattr(news_scraper, 'data_dir', str(tmp_path / 'data'))
+    scraper = news_scraper.NewsScraperAutomation()
+    yield scraper
+    scraper.close()
+
+
+def test_job_names_match_scraper(scraper):
+    assert news_scraper.job_names() == scraper.job_names()
+
+
+def test_feed_failure_is_reported_in_stats(scraper, monkeypatch):
+    def fail(*args, **kwargs):
+        raise ConnectionError('network down')
+
+    monkeypatch.setattr(scraper.engine, 'fetch_feed', fail)
+    stats = scraper.run_job('cnn')
+    assert stats['error'] == 'network down'
+    assert stats['saved'] == 0
+
+
+@pytest.mark.parametrize('storage_format', ['jsonl', 'json'])
+def test_resume_restores_articles_into_database(scraper, tmp_path, storage_format):
+    """上次中断前保存的文章从运行日志恢复，正文从正文存储取回后写入文章库"""
+    from run_journal import RunJournal
+
+    scraper.storage_format = storage_format
+    record = scraper.body_store.externalize({'link': 'http://x/a', 'title': 'T', 'summary': '', 'text': '恢复的正文内容'})
+    partial = tmp_path / 'partial.json'
+    partial.write_text('[', encoding='utf-8')
+
+    journal = RunJournal()
+    journal.record_files('cnn', [str(partial)])
+    journal.record_article('cnn', record)
+    journal.close()
+
+    scraper._journal = RunJournal()
+    try:
+        resumed = scraper._resume_job('cnn')
+    finally:
+        scraper._journal.close()
+
+    if storage_format == 'jsonl':
+        # 追加写入的文件中已经有这些文章，只需写入文章库
+        assert resumed == []
+        assert partial.exists()
+        assert [row['url'] for row in scraper.article_db.search('正文内容')] == ['http://x/a']
+    else:
+        # 写了一半的文件被删除，文章带着正文重新写入
+        assert not partial.exists()
+        assert resumed[0]['text'] == '恢复的正文内容'
+    assert scraper._resumed_urls == {'http://x/a'}
+
+
+@pytest.mark.parametrize('storage_format', ['jsonl', 'json'])
+def test_files_are_logged_when_opened(scraper, storage_format):
+    """数据文件和正文文件在写入时就进入写入记录，不依赖保存结束后的清理代码"""
+    scraper.storage_format = storage_format
+    logged = []
+
+    def articles():
+        yield {'link': 'http://x/a', 'title': 'T', 'summary': '', 'text': '第一篇正文'}
+        logged.extend(open(scraper.write_log.path, encoding='utf-8').read().splitlines())
+        raise KeyboardInterrupt
+
+    with pytest.raises(KeyboardInterrupt):
+        scraper.save_stream(articles(), 'cnn')
+
+    paths = [line for line in logged if '\t' not in line]
+    refs = [line.split('\t') for line in logged if '\t' in line]
+    assert any(path.endswith('.jsonl' if storage_format == 'jsonl' else '.json') for path in paths)
+    assert refs and all(ref in paths for _, ref in refs)
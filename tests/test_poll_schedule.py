@@ -0,0 +1,45 @@
+# -*- coding: utf-8 -*-
+
+from poll_schedule import AdaptivePollSchedule
+
+
+def _schedule():
+    return AdaptivePollSchedule(min_minutes=15, max_minutes=360, target_items=5)
+
+
+def test_busy_source_is_polled_sooner():
+    schedule = _schedule()
+    now = 1_000_000.0
+    busy, quiet = {}, {}
+    schedule.plan('busy', busy, 20, [now - 600 * i for i in range(20)], now)
+    schedule.plan('quiet', quiet, 1, [now - 3600 * 10 * i for i in range(3)], now)
+    assert busy['interval'] < quiet['interval']
+    assert schedule.min_interval <= busy['interval'] <= schedule.max_interval
+
+
+def test_source_without_information_uses_max_interval():
+    schedule = _schedule()
+    state = {}
+    assert schedule.plan('empty', state, 0, [], 1_000_000.0) == schedule.max_interval
+
+
+def test_retry_keeps_rate_and_last_poll():
+    schedule = _schedule()
+    now = 1_000_000.0
+    state = {}
+    schedule.plan('source', state, 20, [now - 600 * i for i in range(20)], now)
+    rate, last_poll = state['rate'], state['last_poll']
+
+    assert schedule.retry('source', state, now + 60) == schedule.min_interval
+    assert state['next_due'] == now + 60 + schedule.min_interval
+    assert state['rate'] == rate
+    assert state['last_poll'] == last_poll
+
+
+def test_max_interval_defaults_to_scrape_interval(monkeypatch):
+    monkeypatch.setenv('SCRAPE_INTERVAL', '2')
+    monkeypatch.setenv('POLL_MAX_MINUTES', '')
+    assert AdaptivePollSchedule().max_interval == 2 * 3600
+
+    monkeypatch.setenv('POLL_MAX_MINUTES', '30')
+    assert AdaptivePollSchedule().max_interval == 30 * 60
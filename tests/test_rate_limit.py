@@ -0,0 +1,93 @@
+# -*- coding: utf-8 -*-
+
+import time
+import threading
+
+import pytest
+
+import rate_limit
+from rate_limit import GitHubRateLimiter, RateLimitExceeded
+
+
+class _Response:
+    def __init__(self, status_code=200, headers=None, text=''):
+        self.status_code = status_code
+        self.headers = headers or {}
+        self.text = text
+
+
+class _Session:
+    """依次返回给定的响应，记录同时进行的请求数"""
+
+    def __init__(self, responses, delay=0.0):
+        self.responses = list(responses)
+        self.delay = delay
+        self.calls = 0
+        self.active = 0
+        self.max_active = 0
+        self.lock = threading.Lock()
+
+    def request(self, method, url, **kwargs):
+        with self.lock:
+            self.calls += 1
+            self.active += 1
+            self.max_active = max(self.max_active, self.active)
+            response = self.responses.pop(0) if self.responses else _Response()
+        time.sleep(self.delay)
+        with self.lock:
+            self.active -= 1
+        return response
+
+
+def test_secondary_limit_halves_concurrency_and_retries():
+    limiter = GitHubRateLimiter(max_concurrency=8, max_wait=5)
+    session = _Session([_Response(403, {'Retry-After': '0.2'}, 'secondary rate limit')])
+
+    started = time.monotonic()
+    response = limiter.request(session, 'GET', 'http://x')
+    assert response.status_code == 200
+    assert session.calls == 2
+    assert time.monotonic() - started >= 0.2
+    assert limiter.limit == 4
+    assert limiter.throttled == 1
+
+
+def test_concurrency_recovers_after_successes():
+    limiter = GitHubRateLimiter(max_concurrency=8, max_wait=5)
+    limiter.limit = 4
+    session = _Session([])
+    for _ in range(rate_limit.RAISE_AFTER):
+        limiter.request(session, 'GET', 'http://x')
+    assert limiter.limit == 5
+
+
+def test_concurrent_requests_stay_within_limit():
+    limiter = GitHubRateLimiter(max_concurrency=3, max_wait=5)
+    session = _Session([], delay=0.02)
+    threads = [threading.Thread(target=limiter.request, args=(session, 'GET', 'http://x')) for _ in range(12)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert session.calls == 12
+    assert session.max_active <= 3
+
+
+def test_exhausted_primary_limit_pauses_without_lowering_concurrency():
+    limiter = GitHubRateLimiter(max_concurrency=8, max_wait=60)
+    headers = {'X-RateLimit-Remaining': '0', 'X-RateLimit-Reset': str(time.time() + 3600)}
+    session = _Session([_Response(403, headers, 'API rate limit exceeded')])
+
+    with pytest.raises(RateLimitExceeded) as info:
+        limiter.request(session, 'GET', 'http://x')
+    assert info.value.wait > 60
+    assert limiter.limit == 8
+    assert session.calls == 1
+
+
+def test_forbidden_without_rate_limit_is_returned():
+    limiter = GitHubRateLimiter(max_concurrency=8, max_wait=5)
+    session = _Session([_Response(403, {}, 'Resource not accessible by integration')])
+    assert limiter.request(session, 'GET', 'http://x').status_code == 403
+    assert session.calls == 1
+    assert limiter.throttled == 0
@@ -0,0 +1,48 @@
+# -*- coding: utf-8 -*-
+
+import time
+
+from run_journal import RunJournal
+
+
+def test_recent_done_record_is_honoured(tmp_path):
+    journal = RunJournal(str(tmp_path))
+    journal.record_article('cnn', {'link': 'http://x/a'})
+    journal.finish('cnn', {'saved': 1})
+    journal.close()
+
+    resumed = RunJournal(str(tmp_path))
+    assert resumed.finished('cnn') == {'saved': 1}
+    assert [a['link'] for a in resumed.articles('cnn')] == ['http://x/a']
+
+
+def test_stale_done_record_is_discarded(tmp_path, monkeypatch):
+    """完成后没有被清理的旧日志不会让下一次运行跳过来源"""
+    data_file = tmp_path / 'cnn.json'
+    data_file.write_text('[]', encoding='utf-8')
+
+    journal = RunJournal(str(tmp_path / 'journal'))
+    journal.record_files('cnn', [str(data_file)])
+    journal.finish('cnn', {'saved': 1})
+    journal.close()
+
+    later = time.time() + 7200
+    monkeypatch.setattr(time, 'time', lambda: later)
+    resumed = RunJournal(str(tmp_path / 'journal'), max_age=3600)
+    assert resumed.finished('cnn') is None
+    assert resumed.articles('cnn') == []
+    assert resumed.files('cnn') == []
+    assert data_file.exists()
+    assert not (tmp_path / 'journal' / 'cnn.jsonl').exists()
+
+
+def test_unfinished_journal_is_kept_regardless_of_age(tmp_path, monkeypatch):
+    journal = RunJournal(str(tmp_path))
+    journal.record_article('cnn', {'link': 'http://x/a'})
+    journal.close()
+
+    later = time.time() + 7200
+    monkeypatch.setattr(time, 'time', lambda: later)
+    resumed = RunJournal(str(tmp_path), max_age=3600)
+    assert resumed.finished('cnn') is None
+    assert [a['link'] for a in resumed.articles('cnn')] == ['http://x/a']
@@ -0,0 +1,65 @@
+# -*- coding: utf-8 -*-
+
+import os
+import subprocess
+
+from sync_manifest import SyncManifest, git_blob_sha
+
+
+def test_blob_sha_matches_git(tmp_path):
+    path = tmp_path / 'a.json'
+    path.write_bytes(b'{"title": "\xe6\x96\xb0\xe9\x97\xbb"}\n')
+    expected = subprocess.run(['git', 'hash-object', str(path)], capture_output=True, text=True, check=True).stdout.strip()
+    assert git_blob_sha(str(path)) == expected
+
+
+def test_unchanged_file_is_skipped_after_reload(tmp_path):
+    path = tmp_path / 'a.json'
+    path.write_text('[]', encoding='utf-8')
+    manifest_path = str(tmp_path / 'manifest.json')
+
+    manifest = SyncManifest('user/repo', manifest_path)
+    changed, sha, stat = manifest.changed(str(path), 'a.json')
+    assert changed
+    manifest.record('a.json', sha, stat)
+    manifest.save()
+
+    reloaded = SyncManifest('user/repo', manifest_path)
+    assert reloaded.changed(str(path), 'a.json')[0] is False
+
+    path.write_text('[1]', encoding='utf-8')
+    assert reloaded.changed(str(path), 'a.json')[0] is True
+
+
+def test_manifest_is_per_repository(tmp_path):
+    manifest_path = str(tmp_path / 'manifest.json')
+    manifest = SyncManifest('user/repo', manifest_path)
+    manifest.record('a.json', 'abc')
+    manifest.save()
+
+    assert SyncManifest('user/other', manifest_path).remote_sha('a.json') is None
+    assert SyncManifest('user/repo', manifest_path).remote_sha('a.json') == 'abc'
+
+
+def test_uploaded_blobs_survive_restart_until_forgotten(tmp_path):
+    manifest_path = str(tmp_path / 'manifest.json')
+    manifest = SyncManifest('user/repo', manifest_path)
+    manifest.mark_uploaded('a.json', 'abc')
+    manifest.save()
+
+    reloaded = SyncManifest('user/repo', manifest_path)
+    assert reloaded.uploaded_sha('a.json') == 'abc'
+    reloaded.forget_uploaded()
+    assert reloaded.uploaded_sha('a.json') is None
+
+
+def test_save_without_changes_does_not_write(tmp_path):
+    manifest_path = str(tmp_path / 'manifest.json')
+    SyncManifest('user/repo', manifest_path).save()
+    assert not os.path.exists(manifest_path)
+
+
+def test_corrupt_manifest_starts_empty(tmp_path):
+    manifest_path = tmp_path / 'manifest.json'
+    manifest_path.write_text('{', encoding='utf-8')
+    assert len(SyncManifest('user/repo', str(manifest_path))) == 0
@@ -0,0 +1,70 @@
+# -*- coding: utf-8 -*-
+
+import pytest
+
+from work_queue import SourceQueue, demo
+
+
+@pytest.fixture
+def queues(tmp_path):
+    path = str(tmp_path / 'work_queue.db')
+    first = SourceQueue(path, lease_seconds=10, worker_id='a')
+    second = SourceQueue(path, lease_seconds=10, worker_id='b')
+    first.ensure(['cnn', 'bbc'], now=100)
+    yield first, second
+    first.close()
+    second.close()
+
+
+def test_claim_is_exclusive(queues):
+    first, second = queues
+    claimed_by_first = first.claim(limit=1, now=100)
+    claimed_by_second = second.claim(limit=5, now=100)
+    assert len(claimed_by_first) == len(claimed_by_second) == 1
+    assert set(claimed_by_first) | set(claimed_by_second) == {'cnn', 'bbc'}
+    assert second.claim(limit=5, now=100) == {}
+
+
+def test_expired_lease_can_be_taken_over(queues):
+    first, second = queues
+    first.claim(limit=2, now=100)
+    assert second.claim(limit=2, now=105) == {}
+    assert set(second.claim(limit=2, now=111)) == {'cnn', 'bbc'}
+
+    # 原持有者的租约已经失效，续租和完成都不生效
+    assert first.renew(['cnn', 'bbc'], now=112) == []
+    assert not first.complete('cnn', 1000)
+    assert second.complete('cnn', 1000, {'rate': 1.0})
+
+
+def test_complete_stores_state_and_next_due(queues):
+    first, _ = queues
+    first.claim(limit=2, now=100)
+    assert first.complete('cnn', 500, {'rate': 2.0})
+    assert first.complete('bbc', 10000)
+    assert first.claim(limit=5, now=400) == {}
+    assert first.claim(limit=5, now=500) == {'cnn': {'rate': 2.0}}
+
+
+def test_release_makes_source_claimable_again(queues):
+    first, second = queues
+    first.claim(limit=2, now=100)
+    first.release(['cnn'])
+    assert list(second.claim(limit=5, now=101)) == ['cnn']
+
+
+def test_renew_ignores_missing_source(queues):
+    first, _ = queues
+    first.claim(limit=2, now=100)
+    assert first.renew(['cnn', 'unknown'], now=105) == ['cnn']
+
+
+def test_unfinished_claims_are_reported(queues, caplog):
+    first, second = queues
+    first.claim(limit=2, now=100)
+    second.claim(limit=2, now=111)
+    assert '之前被领取了 1 次都没有完成' in caplog.text
+
+
+def test_processes_never_process_a_source_twice():
+    assert demo(workers=4, sources=40, lease_seconds=0.5, work_seconds=0.005, crash=True) == 0
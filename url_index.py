@@ -0,0 +1,228 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+已采集URL索引和跳转链接缓存
+在多次运行之间记录已经采集过的文章和跳转链接的目标地址，避免重复下载和解析
+"""
+
+import os
+import time
+import sqlite3
+import hashlib
+import logging
+import threading
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+
+logger = logging.getLogger(__name__)
+
+# 不影响文章内容的跟踪参数
+TRACKING_PARAMS = {'fbclid', 'gclid', 'ocid', 'cmpid', 'ns_mchannel', 'ns_source', 'ns_campaign', 'ref', 'at_medium', 'at_campaign'}
+
+DEFAULT_PORTS = {'http': 80, 'https': 443}
+
+
+def canonicalize_url(url):
+    """将文章URL规范化，用于去重
+
+    统一协议和主机名的大小写，去掉默认端口、锚点和跟踪参数，并对查询参数排序。
+
+    Args:
+        url: 原始URL
+
+    Returns:
+        str: 规范化后的URL
+    """
+    parts = urlsplit(url.strip())
+    scheme = parts.scheme.lower()
+    host = (parts.hostname or '').lower()
+    if parts.port and parts.port != DEFAULT_PORTS.get(scheme):
+        host = f'{host}:{parts.port}'
+
+    query = [
+        (key, value) for key, value in parse_qsl(parts.query, keep_blank_values=True)
+        if not key.lower().startswith('utm_') and key.lower() not in TRACKING_PARAMS
+    ]
+    path = parts.path or '/'
+    return urlunsplit((scheme, host, path, urlencode(sorted(query)), ''))
+
+
+def content_hash(text):
+    """计算文章正文的内容哈希"""
+    return hashlib.sha256((text or '').encode('utf-8')).hexdigest()
+
+
+def url_key(url):
+    """规范化URL的16字节哈希，用作索引主键"""
+    return hashlib.blake2b(canonicalize_url(url).encode('utf-8'), digest_size=16).digest()
+
+
+class SeenUrlIndex:
+    """基于SQLite的已采集URL索引
+
+    以规范化URL的哈希为主键，按采集时间建索引以支持按时间过期。
+    """
+
+    def __init__(self, path=None, ttl_days=None):
+        """初始化索引
+
+        Args:
+            path: 数据库文件路径，默认保存在STATE_DIR目录下
+            ttl_days: 记录保留天数，0表示永久保留
+        """
+        self.path = path or os.path.join(os.getenv('STATE_DIR', 'state'), 'seen_urls.db')
+        self.ttl_days = ttl_days if ttl_days is not None else float(os.getenv('SEEN_URL_TTL_DAYS', '30'))
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._conn.execute('''
+            CREATE TABLE IF NOT EXISTS seen_urls (
+                url_hash BLOB PRIMARY KEY,
+                url TEXT NOT NULL,
+                scraped_at REAL NOT NULL,
+                content_hash TEXT
+            ) WITHOUT ROWID
+        ''')
+        self._conn.execute('CREATE INDEX IF NOT EXISTS idx_seen_urls_scraped_at ON seen_urls(scraped_at)')
+        self._conn.commit()
+
+    def contains(self, url):
+        """判断URL是否已经采集过
+
+        Args:
+            url: 文章URL
+
+        Returns:
+            bool: 是否已采集
+        """
+        with self._lock:
+            row = self._conn.execute('SELECT 1 FROM seen_urls WHERE url_hash = ?', (url_key(url),)).fetchone()
+        return row is not None
+
+    def add_many(self, records):
+        """批量记录已采集的文章
+
+        Args:
+            records: (url, 正文内容哈希) 元组的可迭代对象
+        """
+        now = time.time()
+        rows = [(url_key(url), canonicalize_url(url), now, digest) for url, digest in records]
+        if not rows:
+            return
+        with self._lock, self._conn:
+            self._conn.executemany('INSERT OR REPLACE INTO seen_urls VALUES (?, ?, ?, ?)', rows)
+
+    def add(self, url, digest=None):
+        """记录一篇已采集的文章"""
+        self.add_many([(url, digest)])
+
+    def expire(self, max_age_days=None):
+        """删除超过保留期限的记录
+
+        Args:
+            max_age_days: 保留天数，默认使用ttl_days
+
+        Returns:
+            int: 删除的记录数
+        """
+        max_age_days = self.ttl_days if max_age_days is None else max_age_days
+        if not max_age_days:
+            return 0
+        cutoff = time.time() - max_age_days * 86400
+        with self._lock, self._conn:
+            deleted = self._conn.execute('DELETE FROM seen_urls WHERE scraped_at < ?', (cutoff,)).rowcount
+        if deleted:
+            logger.info(f'已清理 {deleted} 条过期的URL记录')
+        return deleted
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute('SELECT COUNT(*) FROM seen_urls').fetchone()[0]
+
+    def close(self):
+        """关闭数据库连接"""
+        with self._lock:
+            self._conn.close()
+
+
+class RedirectCache:
+    """基于SQLite的跳转链接解析缓存
+
+    记录Google News等跳转链接对应的发布方URL，超过有效期的记录视为未命中。
+    """
+
+    def __init__(self, path=None, ttl_days=None):
+        """初始化缓存
+
+        Args:
+            path: 数据库文件路径，默认保存在STATE_DIR目录下
+            ttl_days: 解析结果的有效天数
+        """
+        self.path = path or os.path.join(os.getenv('STATE_DIR', 'state'), 'redirects.db')
+        self.ttl_days = ttl_days if ttl_days is not None else float(os.getenv('REDIRECT_CACHE_TTL_DAYS', '30'))
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._conn.execute('''
+            CREATE TABLE IF NOT EXISTS redirects (
+                source_url TEXT PRIMARY KEY,
+                target_url TEXT NOT NULL,
+                resolved_at REAL NOT NULL
+            ) WITHOUT ROWID
+        ''')
+        self._conn.execute('CREATE INDEX IF NOT EXISTS idx_redirects_resolved_at ON redirects(resolved_at)')
+        self._conn.commit()
+
+    def get_many(self, urls):
+        """批量查询未过期的解析结果
+
+        Args:
+            urls: 跳转链接列表
+
+        Returns:
+            dict: 跳转链接到目标URL的映射，只包含命中的链接
+        """
+        cutoff = time.time() - self.ttl_days * 86400
+        found = {}
+        with self._lock:
+            for url in set(urls):
+                row = self._conn.execute(
+                    'SELECT target_url FROM redirects WHERE source_url = ? AND resolved_at >= ?', (url, cutoff)
+                ).fetchone()
+                if row:
+                    found[url] = row[0]
+        return found
+
+    def put_many(self, pairs):
+        """批量保存解析结果
+
+        Args:
+            pairs: (跳转链接, 目标URL) 元组的可迭代对象
+        """
+        now = time.time()
+        rows = [(source, target, now) for source, target in pairs]
+        if not rows:
+            return
+        with self._lock, self._conn:
+            self._conn.executemany('INSERT OR REPLACE INTO redirects VALUES (?, ?, ?)', rows)
+
+    def expire(self):
+        """删除过期的解析结果
+
+        Returns:
+            int: 删除的记录数
+        """
+        cutoff = time.time() - self.ttl_days * 86400
+        with self._lock, self._conn:
+            return self._conn.execute('DELETE FROM redirects WHERE resolved_at < ?', (cutoff,)).rowcount
+
+    def close(self):
+        """关闭数据库连接"""
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,300 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+基于租约的采集任务队列
+同一主机上的多个采集进程共享一个数据库文件，从队列中领取到期的来源，
+领取时获得有时限的租约，采集完成后写回下一次到期时间，避免同一来源被重复采集。
+SQLite的WAL模式依赖同一主机上的共享内存，数据库文件不能放在NFS等网络文件系统上供多台主机共用，
+跨主机时租约的互斥无法保证
+"""
+
+import os
+import sys
+import json
+import time
+import socket
+import sqlite3
+import logging
+import argparse
+import threading
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+
+def default_worker_id():
+    """当前进程的工作者ID：主机名:进程号"""
+    return f'{socket.gethostname()}:{os.getpid()}'
+
+
+class SourceQueue:
+    """基于SQLite的来源任务队列
+
+    每个来源一行，记录下一次到期时间、租约持有者和租约到期时间，以及来源的采集计划状态。
+    领取时在一个 IMMEDIATE 事务中选出到期且没有有效租约的来源并写入租约，
+    因此多个进程同时领取也不会拿到同一个来源。持有者崩溃后，租约到期即可被其他进程领取。
+    attempts 记录领取后还没有完成的次数，大于1说明之前的持有者没有完成就退出了，领取时记录警告。
+    """
+
+    def __init__(self, path=None, lease_seconds=None, worker_id=None):
+        """初始化队列
+
+        Args:
+            path: 数据库文件路径，默认使用WORK_QUEUE_PATH，未设置时保存在STATE_DIR目录下
+            lease_seconds: 租约时长（秒）
+            worker_id: 当前工作者ID，默认为 主机名:进程号
+        """
+        self.path = path or os.getenv('WORK_QUEUE_PATH') or os.path.join(os.getenv('STATE_DIR', 'state'), 'work_queue.db')
+        self.lease_seconds = lease_seconds or float(os.getenv('WORK_LEASE_SECONDS', '600'))
+        self.worker_id = worker_id or default_worker_id()
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, timeout=30, isolation_level=None, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._conn.execute('''
+            CREATE TABLE IF NOT EXISTS sources (
+                name TEXT PRIMARY KEY,
+                due_at REAL NOT NULL,
+                lease_owner TEXT,
+                lease_expires REAL,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                state TEXT NOT NULL DEFAULT '{}'
+            ) WITHOUT ROWID
+        ''')
+        self._conn.execute('CREATE INDEX IF NOT EXISTS idx_sources_due_at ON sources(due_at)')
+
+    @contextmanager
+    def _transaction(self):
+        # IMMEDIATE 事务在开始时就获取写锁，保证"查询-写入租约"在多个进程之间是原子的
+        with self._lock:
+            self._conn.execute('BEGIN IMMEDIATE')
+            try:
+                yield self._conn
+            except BaseException:
+                self._conn.execute('ROLLBACK')
+                raise
+            self._conn.execute('COMMIT')
+
+    def ensure(self, names, now=None):
+        """把来源加入队列，已存在的来源保持不变
+
+        Args:
+            names: 来源名称列表
+            now: 新来源的到期时间，默认为当前时间
+        """
+        now = now or time.time()
+        with self._transaction() as conn:
+            conn.executemany('INSERT OR IGNORE INTO sources (name, due_at) VALUES (?, ?)', [(name, now) for name in names])
+
+    def claim(self, limit=1, now=None):
+        """领取到期且没有有效租约的来源
+
+        Args:
+            limit: 最多领取的来源数
+            now: 当前时间戳，默认为当前时间
+
+        Returns:
+            dict: 来源名称到采集计划状态的映射，按到期时间先后排列
+        """
+        now = now or time.time()
+        with self._transaction() as conn:
+            rows = conn.execute('''
+                SELECT name, state, attempts FROM sources
+                WHERE due_at <= ? AND (lease_owner IS NULL OR lease_expires < ?)
+                ORDER BY due_at LIMIT ?
+            ''', (now, now, limit)).fetchall()
+            conn.executemany('''
+                UPDATE sources SET lease_owner = ?, lease_expires = ?, attempts = attempts + 1
+                WHERE name = ?
+            ''', [(self.worker_id, now + self.lease_seconds, name) for name, _, _ in rows])
+
+        for name, _, attempts in rows:
+            if attempts:
+                logger.warning(f'{name} 之前被领取了 {attempts} 次都没有完成，重新领取')
+        return {name: json.loads(state) for name, state, _ in rows}
+
+    def renew(self, names, now=None):
+        """延长自己持有的租约
+
+        Args:
+            names: 来源名称列表
+            now: 当前时间戳，默认为当前时间
+
+        Returns:
+            list: 续租成功的来源，已完成或租约已被他人领取的来源不在其中
+        """
+        now = now or time.time()
+        renewed = []
+        lost = []
+        with self._transaction() as conn:
+            for name in names:
+                updated = conn.execute(
+                    'UPDATE sources SET lease_expires = ? WHERE name = ? AND lease_owner = ?',
+                    (now + self.lease_seconds, name, self.worker_id)
+                ).rowcount
+                if updated:
+                    renewed.append(name)
+                    continue
+                # 来源已不在队列中时没有人持有租约
+                row = conn.execute('SELECT lease_owner IS NOT NULL FROM sources WHERE name = ?', (name,)).fetchone()
+                if row is not None and row[0]:
+                    lost.append(name)
+        if lost:
+            logger.warning(f'租约已被其他工作者领取: {", ".join(lost)}')
+        return renewed
+
+    def complete(self, name, next_due, state=None):
+        """完成来源的采集，写回下一次到期时间并释放租约
+
+        Args:
+            name: 来源名称
+            next_due: 下一次到期时间戳
+            state: 来源的采集计划状态，None表示不修改
+
+        Returns:
+            bool: 是否仍持有租约，租约已被他人领取时不会写入
+        """
+        with self._transaction() as conn:
+            if state is None:
+                updated = conn.execute('''
+                    UPDATE sources SET due_at = ?, lease_owner = NULL, lease_expires = NULL, attempts = 0
+                    WHERE name = ? AND lease_owner = ?
+                ''', (next_due, name, self.worker_id)).rowcount
+            else:
+                updated = conn.execute('''
+                    UPDATE sources SET due_at = ?, lease_owner = NULL, lease_expires = NULL, attempts = 0, state = ?
+                    WHERE name = ? AND lease_owner = ?
+                ''', (next_due, json.dumps(state, ensure_ascii=False), name, self.worker_id)).rowcount
+        if not updated:
+            logger.warning(f'完成 {name} 时租约已失效，结果未写回队列')
+        return bool(updated)
+
+    def release(self, names):
+        """放弃租约，来源保持原到期时间，可被立即重新领取
+
+        Args:
+            names: 来源名称列表
+        """
+        with self._transaction() as conn:
+            conn.executemany(
+                'UPDATE sources SET lease_owner = NULL, lease_expires = NULL WHERE name = ? AND lease_owner = ?',
+                [(name, self.worker_id) for name in names]
+            )
+
+    @contextmanager
+    def keep_alive(self, names, interval=None):
+        """在代码块执行期间定期续租
+
+        Args:
+            names: 来源名称列表
+            interval: 续租间隔（秒），默认为租约时长的三分之一
+        """
+        interval = interval or self.lease_seconds / 3
+        stopped = threading.Event()
+
+        def heartbeat():
+            while not stopped.wait(interval):
+                try:
+                    self.renew(names)
+                except Exception as e:
+                    logger.error(f'续租失败: {str(e)}')
+
+        thread = threading.Thread(target=heartbeat, name='lease-heartbeat', daemon=True)
+        thread.start()
+        try:
+            yield
+        finally:
+            stopped.set()
+            thread.join()
+
+    def stats(self, now=None):
+        """队列概况
+
+        Returns:
+            dict: 来源总数(total)、到期未领取数(due)和租约有效数(leased)
+        """
+        now = now or time.time()
+        with self._lock:
+            total, due, leased = self._conn.execute('''
+                SELECT COUNT(*),
+                       COALESCE(SUM(due_at <= ? AND (lease_owner IS NULL OR lease_expires < ?)), 0),
+                       COALESCE(SUM(lease_owner IS NOT NULL AND lease_expires >= ?), 0)
+                FROM sources
+            ''', (now, now, now)).fetchone()
+        return {'total': total, 'due': due, 'leased': leased}
+
+    def close(self):
+        """关闭数据库连接"""
+        with self._lock:
+            self._conn.close()
+
+
+def _demo_worker(path, log_path, lease_seconds, work_seconds, crash_after):
+    """演示用的工作者进程：反复领取来源，模拟采集后记录到日志文件并完成"""
+    queue = SourceQueue(path, lease_seconds=lease_seconds)
+    done = 0
+    while True:
+        claimed = queue.claim(limit=2)
+        if not claimed:
+            if not queue.stats()['due'] and not queue.stats()['leased']:
+                break
+            time.sleep(0.05)
+            continue
+        with queue.keep_alive(list(claimed), interval=lease_seconds / 3):
+            for name in claimed:
+                if crash_after and done >= crash_after:
+                    # 模拟进程崩溃：不释放租约直接退出，租约到期后由其他进程接手
+                    os._exit(1)
+                time.sleep(work_seconds)
+                if queue.complete(name, float('inf')):
+                    with open(log_path, 'a', encoding='utf-8') as f:
+                        f.write(f'{name}\t{queue.worker_id}\n')
+                done += 1
+    queue.close()
+
+
+def demo(workers, sources, lease_seconds, work_seconds, crash):
+    """用多个本地进程演示领取、续租和完成，并检查没有来源被重复采集"""
+    import tempfile
+    import multiprocessing
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'work_queue.db')
+        log_path = os.path.join(tmp, 'done.log')
+        queue = SourceQueue(path, lease_seconds=lease_seconds)
+        queue.ensure([f'source_{i:03d}' for i in range(sources)])
+
+        processes = [
+            multiprocessing.Process(
+                target=_demo_worker,
+                args=(path, log_path, lease_seconds, work_seconds, 3 if crash and i == 0 else 0)
+            )
+            for i in range(workers)
+        ]
+        start = time.time()
+        for process in processes:
+            process.start()
+        for process in processes:
+            process.join()
+
+        with open(log_path, 'r', encoding='utf-8') as f:
+            done = [line.split('\t')[0] for line in f]
+        queue.close()
+
+    duplicates = len(done) - len(set(done))
+    print(f'{workers} 个进程在 {time.time() - start:.1f} 秒内完成 {len(set(done))}/{sources} 个来源，重复 {duplicates} 个')
+    return 0 if duplicates == 0 and len(set(done)) == sources else 1
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='采集任务队列演示')
+    parser.add_argument('--workers', type=int, default=4, help='工作者进程数')
+    parser.add_argument('--sources', type=int, default=100, help='来源数')
+    parser.add_argument('--lease', type=float, default=1.0, help='租约时长（秒）')
+    parser.add_argument('--work', type=float, default=0.02, help='每个来源模拟的采集耗时（秒）')
+    parser.add_argument('--crash', action='store_true', help='让一个工作者中途崩溃，验证租约到期后被接手')
+    args = parser.parse_args()
+    sys.exit(demo(args.workers, args.sources, args.lease, args.work, args.crash))
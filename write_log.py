@@ -0,0 +1,99 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+文件写入记录
+采集过程中记录写入过的数据文件，同步时只提交这些文件，不需要扫描整个data目录
+"""
+
+import os
+import glob
+import uuid
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class WriteLog:
+    """待同步文件的追加记录
+
+    每行一个绝对路径，文件被其他数据文件引用时（例如正文和字典被文章记录引用）
+    在制表符后附上引用它的文件，按月分片同步时文件随引用方进入对应月份的仓库。
+    每次追加都重新打开文件并用一次写入完成，多个采集进程可以共享同一个记录。
+    同步时先用 take() 把当前记录改名为一个待处理批次，同步成功后用 done() 删除；
+    同步失败时批次文件保留，下次 take() 会一起取出。
+    """
+
+    def __init__(self, path=None):
+        """初始化写入记录
+
+        Args:
+            path: 记录文件路径，默认保存在STATE_DIR目录下
+        """
+        self.path = path or os.path.join(os.getenv('STATE_DIR', 'state'), 'write_log.txt')
+
+    def add(self, *paths):
+        """记录写入过的文件
+
+        Args:
+            *paths: 文件路径
+        """
+        self._append([os.path.abspath(path) for path in paths if path])
+
+    def add_refs(self, refs):
+        """批量记录被引用的文件
+
+        Args:
+            refs: (文件路径, 引用它的数据文件路径) 的可迭代对象
+        """
+        self._append([f'{os.path.abspath(path)}\t{os.path.abspath(ref)}' for path, ref in refs])
+
+    def _append(self, lines):
+        if not lines:
+            return
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        with open(self.path, 'a', encoding='utf-8') as f:
+            f.write(''.join(f'{line}\n' for line in lines))
+
+    def take(self):
+        """取出待同步的文件，包括之前同步失败留下的批次
+
+        Returns:
+            tuple: (批次, 按写入顺序去重的文件列表)，批次传给 done()；
+                没有引用方的文件为路径字符串，有引用方的为 (路径, 引用方路径)
+        """
+        if os.path.exists(self.path):
+            try:
+                os.replace(self.path, f'{self.path}.{uuid.uuid4().hex}.pending')
+            except OSError as e:
+                logger.warning(f'取出写入记录失败: {self.path}, 错误: {str(e)}')
+
+        batch = {}
+        paths = {}
+        for pending in sorted(glob.glob(f'{glob.escape(self.path)}.*.pending'), key=os.path.getmtime):
+            with open(pending, 'r', encoding='utf-8') as f:
+                data = f.read()
+            # 改名后仍可能有进程在写最后一行，只取完整的行
+            end = data.rfind('\n') + 1
+            batch[pending] = len(data[:end].encode('utf-8'))
+            for line in data[:end].splitlines():
+                if line:
+                    path, _, ref = line.partition('\t')
+                    paths[(path, ref) if ref else path] = None
+        return batch, list(paths)
+
+    def done(self, batch):
+        """删除已同步的批次
+
+        改名前已经打开记录文件的进程可能在取出之后又写入了几行，这些行放回当前记录。
+        """
+        for pending, size in batch.items():
+            try:
+                with open(pending, 'rb') as f:
+                    f.seek(size)
+                    rest = f.read().decode('utf-8')
+            except FileNotFoundError:
+                continue
+            if rest:
+                self._append([line for line in rest.splitlines() if line])
+            os.remove(pending)